@@ -0,0 +1,30 @@
+"""JSON rendering straight from domain values.
+
+Routes on hot paths return ``ORJSONResponse`` with plain dicts of UUID, datetime,
+Decimal and enum values. orjson writes those to bytes in one pass, with no float or
+str conversion by hand and no second validation against ``response_model`` (which
+then only documents the shape). Decimals are emitted as strings so money stays exact.
+"""
+
+from decimal import Decimal
+from typing import Any
+import uuid
+
+from fastapi.responses import ORJSONResponse as _ORJSONResponse
+import orjson
+
+
+def _default(value: Any) -> Any:
+    # orjson handles uuid.UUID itself but not subclasses such as asyncpg's UUID.
+    if isinstance(value, (Decimal, uuid.UUID)):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+
+
+class ORJSONResponse(_ORJSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -1,15 +1,15 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.dependencies import get_db
+from app.database import get_async_db
+from app.profiling import ProfiledRoute
 from app.schemas.auth import LoginRequest, Token
-from app.services.auth import authenticate_user
+from app.services.auth import authenticate_user_async
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 
 @router.post("/auth/login", response_model=Token)
-def login(payload: LoginRequest, db: Session = Depends(get_db)):
-    token = authenticate_user(db, payload.tenant_id, payload.email, payload.password)
-    db.commit()
+async def login(payload: LoginRequest, db: AsyncSession = Depends(get_async_db)):
+    token = await authenticate_user_async(db, payload.tenant_id, payload.email, payload.password)
     return Token(access_token=token)
@@ -0,0 +1,91 @@
+import asyncio
+from enum import Enum
+import os
+
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Response, status
+from fastapi.responses import PlainTextResponse
+
+from app.config import get_settings
+from app.dependencies import get_async_redis_client, require_tenant_admin
+from app.profiling import (
+    WORKER_FLUSH_GRACE_SECONDS,
+    SamplingProfiler,
+    collapsed,
+    load_request_profile_async,
+    sampling_lock,
+    start_worker_profile_async,
+    worker_profile_stacks_async,
+)
+
+router = APIRouter()
+settings = get_settings()
+
+
+class ProfileTarget(str, Enum):
+    api = "api"
+    worker = "worker"
+
+
+def require_profiling_enabled():
+    # Without the operator switch the profiling surface does not exist.
+    if not settings.profiling_enabled:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+
+def _attachment(filename: str) -> dict:
+    return {"Content-Disposition": f'attachment; filename="{filename}"'}
+
+
+@router.post("/tenants/{tenant_id}/debug/profile", dependencies=[Depends(require_profiling_enabled)])
+async def sample_profile(
+    tenant_id: str = Path(...),
+    seconds: int = Query(10, ge=1),
+    interval_ms: int | None = Query(None, ge=1, le=1000),
+    target: ProfileTarget = Query(ProfileTarget.api),
+    redis_client=Depends(get_async_redis_client),
+    admin=Depends(require_tenant_admin),
+):
+    """Sample this API process (or RQ work horses) for ``seconds``; returns collapsed stacks."""
+    if str(admin.tenant_id) != tenant_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Tenant mismatch")
+    if seconds > settings.profiling_max_seconds:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"seconds must be at most {settings.profiling_max_seconds}",
+        )
+    interval_ms = interval_ms or settings.profiling_interval_ms
+    if target == ProfileTarget.worker:
+        if redis_client is None:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Redis unavailable")
+        try:
+            session_id = await start_worker_profile_async(redis_client, seconds, interval_ms)
+        except ValueError as exc:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc))
+        await asyncio.sleep(seconds + WORKER_FLUSH_GRACE_SECONDS)
+        stacks = await worker_profile_stacks_async(redis_client, session_id)
+        filename = f"worker-{session_id}.collapsed"
+    else:
+        if not sampling_lock.acquire(blocking=False):
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A profile is already running")
+        try:
+            stacks = await asyncio.to_thread(SamplingProfiler(interval_ms / 1000).run, seconds)
+        finally:
+            sampling_lock.release()
+        filename = f"api-{os.getpid()}.collapsed"
+    return PlainTextResponse(collapsed(stacks), headers=_attachment(filename))
+
+
+@router.get("/tenants/{tenant_id}/debug/profiles/{profile_id}", dependencies=[Depends(require_profiling_enabled)])
+async def download_request_profile(
+    tenant_id: str = Path(...),
+    profile_id: str = Path(...),
+    redis_client=Depends(get_async_redis_client),
+    admin=Depends(require_tenant_admin),
+):
+    """pstats file of a request sent with ``X-Debug-Profile`` (see the ``X-Profile-ID`` header)."""
+    if str(admin.tenant_id) != tenant_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Tenant mismatch")
+    data = await load_request_profile_async(redis_client, tenant_id, profile_id) if redis_client else None
+    if data is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    return Response(content=data, media_type="application/octet-stream", headers=_attachment(f"{profile_id}.prof"))
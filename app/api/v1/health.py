@@ -1,4 +1,4 @@
-from prometheus_client import Counter, Summary, generate_latest
+from prometheus_client import Counter, Gauge, Histogram, Summary, generate_latest
 from fastapi import APIRouter, Response
 
 router = APIRouter()
@@ -6,6 +6,68 @@ router = APIRouter()
 usage_events_counter = Counter("usage_events_total", "Usage events ingested")
 invoice_generation_duration = Summary("invoice_generation_duration_seconds", "Invoice generation duration")
 webhook_retry_counter = Counter("webhook_retry_total", "Webhook delivery retries")
+usage_stream_dead_letters = Counter(
+    "usage_stream_dead_letters_total", "Buffered usage events moved to the dead-letter stream"
+)
+idempotency_filter_lookups = Counter(
+    "idempotency_filter_lookups_total", "Usage idempotency Bloom filter outcomes", ["result"]
+)
+idempotency_filter_fill_ratio = Histogram(
+    "idempotency_filter_fill_ratio",
+    "Keys in the active generation of a tenant's Bloom filter over its capacity; above 1 once all generations are full",
+    buckets=(0.1, 0.25, 0.5, 0.75, 0.9, 1.0, 1.5, 2.0, 5.0),
+)
+principal_cache_hits = Counter("principal_cache_hits_total", "Principal cache hits", ["layer"])
+principal_cache_misses = Counter("principal_cache_misses_total", "Principal cache misses")
+catalog_cache_lookups = Counter(
+    "catalog_cache_lookups_total", "Tenant catalog cache lookups (hit, miss, stale)", ["result"]
+)
+token_cache_hits = Counter("token_cache_hits_total", "Verified JWT claims cache hits")
+token_cache_misses = Counter("token_cache_misses_total", "Verified JWT claims cache misses")
+redis_pool_in_use = Gauge("redis_pool_in_use_connections", "Redis connections checked out of the shared pool")
+redis_pool_available = Gauge("redis_pool_available_connections", "Idle Redis connections in the shared pool")
+redis_pool_max = Gauge("redis_pool_max_connections", "Shared Redis pool size limit")
+db_pool_checkout_wait = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a database connection from the pool",
+    ["engine"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+db_pool_checked_out = Gauge("db_pool_checked_out_connections", "Database connections checked out of the pool", ["engine"])
+webhook_deliveries_inflight = Gauge("webhook_deliveries_inflight", "Webhook deliveries currently in flight")
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by route template and status class",
+    ["method", "route", "status_class"],
+    buckets=REQUEST_BUCKETS,
+)
+http_request_db_queries = Histogram(
+    "http_request_db_queries",
+    "Database statements executed per request",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 250, 1000),
+)
+http_request_db_seconds = Histogram(
+    "http_request_db_seconds", "Database time per request", ["route"], buckets=REQUEST_BUCKETS
+)
+http_request_redis_seconds = Histogram(
+    "http_request_redis_seconds", "Redis round-trip time per request", ["route"], buckets=QUERY_BUCKETS
+)
+# "tenant" is one of the top-K busiest tenants, "other" or "none" (see app/instrumentation.py).
+tenant_request_duration = Histogram(
+    "tenant_request_duration_seconds", "Request latency by tenant", ["tenant"], buckets=REQUEST_BUCKETS
+)
+tenant_request_db_seconds = Histogram(
+    "tenant_request_db_seconds", "Database time per request by tenant", ["tenant"], buckets=REQUEST_BUCKETS
+)
+db_query_duration = Histogram(
+    "db_query_duration_seconds", "Database statement latency", ["operation"], buckets=QUERY_BUCKETS
+)
+redis_command_duration = Histogram(
+    "redis_command_duration_seconds", "Redis command and pipeline round trips", ["command"], buckets=QUERY_BUCKETS
+)
 
 
 @router.get("/healthz")
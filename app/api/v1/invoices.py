@@ -1,43 +1,137 @@
-from fastapi import APIRouter, Depends, HTTPException, Path
+from datetime import datetime
+import uuid
+
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.dependencies import get_current_user, get_db
-from app.schemas.invoice import InvoiceOut
-from app.services.invoices import run_invoicing
+from app.api.responses import ORJSONResponse
+from app.database import get_async_read_db, session_scope
+from app.dependencies import get_current_user, get_current_user_async, get_db, require_tenant_admin
+from app.domain.models import Invoice, InvoiceStatus
+from app.profiling import ProfiledRoute
+from app.schemas.invoice import InvoiceExportFormat, InvoiceOut, InvoiceStatusUpdate
+from app.services.invoice_export import (
+    MEDIA_TYPES,
+    encode_invoices,
+    invoice_record,
+    iter_invoices_by_id,
+    iter_tenant_invoices,
+)
+from app.services.invoices import (
+    decode_invoice_cursor,
+    encode_invoice_cursor,
+    list_invoices_async,
+    run_invoicing_bulk,
+    update_invoice_status,
+)
+
+router = APIRouter(route_class=ProfiledRoute)
 
-router = APIRouter()
+
+@router.get("/tenants/{tenant_id}/invoices", response_model=list[InvoiceOut])
+async def list_invoices_endpoint(
+    tenant_id: str = Path(...),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: str | None = Query(None, description="X-Next-Cursor from the previous page"),
+    invoice_status: InvoiceStatus | None = Query(None, alias="status"),
+    subscription_id: uuid.UUID | None = Query(None),
+    period_from: datetime | None = Query(None, description="Only invoices whose period starts at or after this"),
+    period_to: datetime | None = Query(None, description="Only invoices whose period ends at or before this"),
+    db: AsyncSession = Depends(get_async_read_db),
+    user=Depends(get_current_user_async),
+):
+    if str(user.tenant_id) != tenant_id:
+        raise HTTPException(status_code=403, detail="Tenant mismatch")
+    try:
+        after = decode_invoice_cursor(cursor) if cursor else None
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    invoices = await list_invoices_async(
+        db,
+        tenant_id,
+        limit=limit + 1,
+        after=after,
+        status=invoice_status,
+        subscription_id=subscription_id,
+        period_from=period_from,
+        period_to=period_to,
+    )
+    headers = {}
+    if len(invoices) > limit:
+        invoices = invoices[:limit]
+        headers["X-Next-Cursor"] = encode_invoice_cursor(invoices[-1])
+    return ORJSONResponse([invoice_record(inv) for inv in invoices], headers=headers)
+
+
+@router.get("/tenants/{tenant_id}/invoices/export")
+def export_invoices_endpoint(
+    tenant_id: str = Path(...),
+    fmt: InvoiceExportFormat = Query(InvoiceExportFormat.ndjson, alias="format"),
+    invoice_status: InvoiceStatus | None = Query(None, alias="status"),
+    subscription_id: uuid.UUID | None = Query(None),
+    period_from: datetime | None = Query(None),
+    period_to: datetime | None = Query(None),
+    user=Depends(get_current_user),
+):
+    if str(user.tenant_id) != tenant_id:
+        raise HTTPException(status_code=403, detail="Tenant mismatch")
+
+    def _stream():
+        with session_scope(read_only=True) as db:
+            invoices = iter_tenant_invoices(
+                db,
+                tenant_id,
+                status=invoice_status,
+                subscription_id=subscription_id,
+                period_from=period_from,
+                period_to=period_to,
+            )
+            yield from encode_invoices(invoices, fmt)
+
+    return StreamingResponse(
+        _stream(),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="invoices-{tenant_id}.{fmt.value}"'},
+    )
 
 
 @router.post("/tenants/{tenant_id}/invoices/run", response_model=list[InvoiceOut])
 def run_invoices_endpoint(
     tenant_id: str = Path(...),
+    fmt: InvoiceExportFormat = Query(InvoiceExportFormat.json, alias="format"),
     db: Session = Depends(get_db),
     user=Depends(get_current_user),
 ):
     if str(user.tenant_id) != tenant_id:
         raise HTTPException(status_code=403, detail="Tenant mismatch")
-    invoices = run_invoicing(db, tenant_id)
+    invoice_ids = run_invoicing_bulk(db, tenant_id)
+    db.commit()
+
+    def _stream():
+        # Read back from the primary: a replica may not have the new invoices yet.
+        with session_scope() as stream_db:
+            yield from encode_invoices(iter_invoices_by_id(stream_db, invoice_ids), fmt)
+
+    return StreamingResponse(_stream(), media_type=MEDIA_TYPES[fmt])
+
+
+@router.patch("/tenants/{tenant_id}/invoices/{invoice_id}", response_model=InvoiceOut)
+def update_invoice_status_endpoint(
+    payload: InvoiceStatusUpdate,
+    tenant_id: str = Path(...),
+    invoice_id: str = Path(...),
+    db: Session = Depends(get_db),
+    admin=Depends(require_tenant_admin),
+):
+    if str(admin.tenant_id) != tenant_id:
+        raise HTTPException(status_code=403, detail="Tenant mismatch")
+    invoice = (
+        db.query(Invoice).filter(Invoice.id == invoice_id, Invoice.tenant_id == admin.tenant_id).first()
+    )
+    if invoice is None:
+        raise HTTPException(status_code=404, detail="Invoice not found")
+    update_invoice_status(db, invoice, payload.status)
     db.commit()
-    results: list[InvoiceOut] = []
-    for inv in invoices:
-        results.append(
-            {
-                "id": str(inv.id),
-                "total": float(inv.total),
-                "currency": inv.currency,
-                "period_start": inv.period_start,
-                "period_end": inv.period_end,
-                "status": inv.status,
-                "items": [
-                    {
-                        "id": str(item.id),
-                        "description": item.description,
-                        "quantity": item.quantity,
-                        "unit_amount": float(item.unit_amount),
-                        "amount": float(item.amount),
-                    }
-                    for item in inv.items
-                ],
-            }
-        )
-    return results
+    return ORJSONResponse(invoice_record(invoice))
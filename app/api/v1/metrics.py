@@ -1,29 +1,86 @@
-from fastapi import APIRouter, Depends, HTTPException, Path
-from sqlalchemy.orm import Session
+from datetime import date, datetime, timedelta, timezone
+from typing import List
 
-from app.dependencies import get_current_user, get_db
-from app.domain.models import TenantRevenueMV
-from app.schemas.metrics import MRRResponse
-from app.services.invoices import _refresh_revenue_mv
+from fastapi import APIRouter, Depends, HTTPException, Path, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 
-router = APIRouter()
+from app.api.responses import ORJSONResponse
+from app.database import get_async_read_db
+from app.dependencies import get_current_user_async
+from app.profiling import ProfiledRoute
+from app.schemas.metrics import MRRPoint, MRRResponse, PlanMRRBreakdown, ProductRevenue
+from app.services.revenue import load_revenue_async
+from app.services.revenue_snapshots import mrr_by_plan_async, mrr_series_async, revenue_by_product_async
+
+router = APIRouter(route_class=ProfiledRoute)
+
+DEFAULT_RANGE_DAYS = 30
 
 
 @router.get("/tenants/{tenant_id}/metrics/mrr", response_model=MRRResponse)
-def get_mrr(
+async def get_mrr(
     tenant_id: str = Path(...),
-    db: Session = Depends(get_db),
-    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_read_db),
+    user=Depends(get_current_user_async),
 ):
     if str(user.tenant_id) != tenant_id:
         raise HTTPException(status_code=403, detail="Tenant mismatch")
-    mv = db.query(TenantRevenueMV).filter(TenantRevenueMV.tenant_id == tenant_id).first()
-    if mv is None:
-        _refresh_revenue_mv(db, tenant_id)
-        mv = db.query(TenantRevenueMV).filter(TenantRevenueMV.tenant_id == tenant_id).first()
-    db.commit()
-    return MRRResponse(
-        tenant_id=str(mv.tenant_id),
-        monthly_recurring_revenue=float(mv.monthly_recurring_revenue),
-        annual_run_rate=float(mv.annual_run_rate),
+    mv = await load_revenue_async(db, user.tenant_id)
+    await db.commit()
+    return ORJSONResponse(
+        {
+            "tenant_id": mv.tenant_id,
+            "monthly_recurring_revenue": mv.monthly_recurring_revenue,
+            "annual_run_rate": mv.annual_run_rate,
+        }
     )
+
+
+def _date_range(start: date | None, end: date | None) -> tuple[date, date]:
+    end = end or datetime.now(timezone.utc).date()
+    start = start or end - timedelta(days=DEFAULT_RANGE_DAYS)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    return start, end
+
+
+@router.get("/tenants/{tenant_id}/metrics/mrr/history", response_model=List[MRRPoint])
+async def get_mrr_history(
+    tenant_id: str = Path(...),
+    start: date | None = Query(default=None),
+    end: date | None = Query(default=None),
+    db: AsyncSession = Depends(get_async_read_db),
+    user=Depends(get_current_user_async),
+):
+    if str(user.tenant_id) != tenant_id:
+        raise HTTPException(status_code=403, detail="Tenant mismatch")
+    start, end = _date_range(start, end)
+    return ORJSONResponse(await mrr_series_async(db, user.tenant_id, start, end))
+
+
+@router.get("/tenants/{tenant_id}/metrics/mrr/plans", response_model=List[PlanMRRBreakdown])
+async def get_mrr_by_plan(
+    tenant_id: str = Path(...),
+    start: date | None = Query(default=None),
+    end: date | None = Query(default=None),
+    db: AsyncSession = Depends(get_async_read_db),
+    user=Depends(get_current_user_async),
+):
+    if str(user.tenant_id) != tenant_id:
+        raise HTTPException(status_code=403, detail="Tenant mismatch")
+    start, end = _date_range(start, end)
+    return ORJSONResponse(await mrr_by_plan_async(db, user.tenant_id, start, end))
+
+
+@router.get("/tenants/{tenant_id}/metrics/revenue/products", response_model=List[ProductRevenue])
+async def get_revenue_by_product(
+    tenant_id: str = Path(...),
+    start: date | None = Query(default=None),
+    end: date | None = Query(default=None),
+    db: AsyncSession = Depends(get_async_read_db),
+    user=Depends(get_current_user_async),
+):
+    if str(user.tenant_id) != tenant_id:
+        raise HTTPException(status_code=403, detail="Tenant mismatch")
+    start, end = _date_range(start, end)
+    return ORJSONResponse(await revenue_by_product_async(db, user.tenant_id, start, end))
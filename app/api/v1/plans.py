@@ -2,10 +2,11 @@ from fastapi import APIRouter, Depends, HTTPException, Path, status
 from sqlalchemy.orm import Session
 
 from app.dependencies import get_db, require_tenant_admin
+from app.profiling import ProfiledRoute
 from app.schemas.plan import PlanCreate, PlanOut
 from app.services.plans import create_plan
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 
 @router.post("/tenants/{tenant_id}/plans", response_model=PlanOut, status_code=status.HTTP_201_CREATED)
@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.v1 import auth, health, invoices, metrics, plans, subscriptions, tenants, usage, webhooks
+from app.api.v1 import auth, debug, health, invoices, metrics, plans, subscriptions, tenants, usage, webhooks
 
 api_router = APIRouter(prefix="/v1")
 api_router.include_router(health.router)
@@ -12,3 +12,4 @@ api_router.include_router(usage.router)
 api_router.include_router(invoices.router)
 api_router.include_router(webhooks.router)
 api_router.include_router(metrics.router)
+api_router.include_router(debug.router)
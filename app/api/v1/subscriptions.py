@@ -1,11 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, Path, status
 from sqlalchemy.orm import Session
 
+from app.api.responses import ORJSONResponse
 from app.dependencies import get_current_user, get_db
+from app.profiling import ProfiledRoute
 from app.schemas.subscription import SubscriptionCreate, SubscriptionOut
 from app.services.subscriptions import create_subscription
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 
 @router.post("/tenants/{tenant_id}/subscriptions", response_model=SubscriptionOut, status_code=status.HTTP_201_CREATED)
@@ -28,13 +30,15 @@ def create_subscription_endpoint(
     except ValueError as exc:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
     db.commit()
-    # Convert UUID/Decimal fields to plain JSON-friendly types
-    return {
-        "id": str(sub.id),
-        "plan_id": str(sub.plan_id),
-        "status": sub.status,
-        "quantity": sub.quantity,
-        "current_period_start": sub.current_period_start,
-        "current_period_end": sub.current_period_end,
-        "trial_end": sub.trial_end,
-    }
+    return ORJSONResponse(
+        {
+            "id": sub.id,
+            "plan_id": sub.plan_id,
+            "status": sub.status,
+            "quantity": sub.quantity,
+            "current_period_start": sub.current_period_start,
+            "current_period_end": sub.current_period_end,
+            "trial_end": sub.trial_end,
+        },
+        status_code=status.HTTP_201_CREATED,
+    )
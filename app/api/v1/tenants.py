@@ -1,21 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException, Path, status
+from fastapi import APIRouter, Depends, HTTPException, Path, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from app.database import get_async_db
 from app.dependencies import get_db, require_tenant_admin
-from app.domain.models import Role
-from app.schemas.tenant import TenantBootstrapResponse, TenantCreate, TenantUserCreate
+from app.domain.models import Role, User
+from app.profiling import ProfiledRoute
+from app.schemas.tenant import TenantBootstrapResponse, TenantCreate, TenantUserCreate, TenantUserUpdate
 from app.schemas.user import UserOut
-from app.services.auth import create_tenant_with_admin, create_user
+from app.services.auth import create_tenant_with_admin, create_user, delete_user, update_user_role
+from app.services.passwords import hash_password_async
+from app.services.principals import principal_cache
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
+
+
+def _user_out(user: User) -> UserOut:
+    return UserOut(id=str(user.id), email=user.email, role=user.role)
 
 
 @router.post("/tenants", response_model=TenantBootstrapResponse, status_code=status.HTTP_201_CREATED)
-def create_tenant(payload: TenantCreate, db: Session = Depends(get_db)):
-    tenant, admin, token = create_tenant_with_admin(
-        db, name=payload.name, admin_email=payload.admin_email, admin_password=payload.admin_password, webhook_url=payload.webhook_url
+async def create_tenant(payload: TenantCreate, db: AsyncSession = Depends(get_async_db)):
+    # Hashing runs in the password pool; only the event loop waits for it.
+    password_hash = await hash_password_async(payload.admin_password)
+    tenant, admin, token = await db.run_sync(
+        create_tenant_with_admin,
+        name=payload.name,
+        admin_email=payload.admin_email,
+        admin_password_hash=password_hash,
+        webhook_url=payload.webhook_url,
     )
-    db.commit()
+    await db.commit()
     return {
         "tenant": {"id": str(tenant.id), "name": tenant.name, "webhook_url": tenant.webhook_url},
         "admin": {"id": str(admin.id), "email": admin.email, "role": admin.role},
@@ -24,15 +39,48 @@ def create_tenant(payload: TenantCreate, db: Session = Depends(get_db)):
 
 
 @router.post("/tenants/{tenant_id}/users", response_model=UserOut, status_code=status.HTTP_201_CREATED)
-def create_tenant_user(
+async def create_tenant_user(
     payload: TenantUserCreate,
     tenant_id: str = Path(..., alias="tenant_id"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     admin=Depends(require_tenant_admin),
 ):
     if str(admin.tenant_id) != tenant_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Tenant mismatch")
     role = Role(payload.role) if isinstance(payload.role, str) else payload.role
-    user = create_user(db, tenant_id=tenant_id, email=payload.email, password=payload.password, role=role)
+    password_hash = await hash_password_async(payload.password)
+    user = await db.run_sync(create_user, tenant_id=tenant_id, email=payload.email, password_hash=password_hash, role=role)
+    await db.commit()
+    return _user_out(user)
+
+
+@router.patch("/tenants/{tenant_id}/users/{user_id}", response_model=UserOut)
+def update_tenant_user(
+    payload: TenantUserUpdate,
+    tenant_id: str = Path(...),
+    user_id: str = Path(...),
+    db: Session = Depends(get_db),
+    admin=Depends(require_tenant_admin),
+):
+    if str(admin.tenant_id) != tenant_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Tenant mismatch")
+    user = update_user_role(db, tenant_id=tenant_id, user_id=user_id, role=payload.role)
+    db.commit()
+    # Invalidate after commit so a concurrent request cannot re-cache the old role.
+    principal_cache.invalidate(str(user.id))
+    return _user_out(user)
+
+
+@router.delete("/tenants/{tenant_id}/users/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_tenant_user(
+    tenant_id: str = Path(...),
+    user_id: str = Path(...),
+    db: Session = Depends(get_db),
+    admin=Depends(require_tenant_admin),
+):
+    if str(admin.tenant_id) != tenant_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Tenant mismatch")
+    delete_user(db, tenant_id=tenant_id, user_id=user_id)
     db.commit()
-    return UserOut.model_validate(user)
+    principal_cache.invalidate(user_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -1,27 +1,81 @@
-from fastapi import APIRouter, Depends, Header, HTTPException, Path, status
+from typing import Iterator
+
+import anyio
+from fastapi import APIRouter, Depends, Header, HTTPException, Path, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+import structlog
 
+from app.api.responses import ORJSONResponse
 from app.api.v1.health import usage_events_counter
-from app.dependencies import get_current_user, get_db, get_redis_client
-from app.schemas.usage import UsageEventCreate, UsageEventOut
-from app.services.usage import ingest_usage_event
+from app.config import get_settings
+from app.database import get_async_db
+from app.dependencies import (
+    get_async_redis_client,
+    get_current_user,
+    get_current_user_async,
+    get_db,
+    get_redis_client,
+)
+from app.profiling import ProfiledRoute
+from app.schemas.usage import (
+    UsageBatchRequest,
+    UsageBatchResponse,
+    UsageEventCreate,
+    UsageImportFormat,
+    UsageImportResult,
+    UsageIngestStatus,
+)
+from app.services.usage import ingest_usage_batch, ingest_usage_event_async
+from app.services.usage_import import ImportProgress, import_usage
+from app.services.usage_stream import buffer_usage_event_async
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
+logger = structlog.get_logger()
 
 
 @router.post("/tenants/{tenant_id}/usage", response_model=dict, status_code=status.HTTP_201_CREATED)
-def ingest_usage(
+async def ingest_usage(
     payload: UsageEventCreate,
     tenant_id: str = Path(...),
     idempotency_key: str | None = Header(default=None, alias="Idempotency-Key"),
-    db: Session = Depends(get_db),
-    user=Depends(get_current_user),
-    redis_client=Depends(get_redis_client),
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(get_current_user_async),
+    redis_client=Depends(get_async_redis_client),
 ):
     if str(user.tenant_id) != tenant_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Tenant mismatch")
-    event, duplicate = ingest_usage_event(
+    if get_settings().usage_write_behind and redis_client is not None:
+        buffered = await buffer_usage_event_async(
+            db=db,
+            tenant_id=tenant_id,
+            subscription_id=payload.subscription_id,
+            metric=payload.metric,
+            quantity=payload.quantity,
+            ts=payload.ts,
+            idempotency_key=idempotency_key or "",
+            redis_client=redis_client,
+        )
+        # None means the stream is unavailable; fall through to the synchronous write.
+        if buffered is not None:
+            row, buffered_duplicate = buffered
+            if buffered_duplicate or row is None:
+                return JSONResponse(content={"duplicate": True}, status_code=status.HTTP_200_OK)
+            usage_events_counter.inc()
+            return ORJSONResponse(
+                {
+                    "id": row["id"],
+                    "subscription_id": row["subscription_id"],
+                    "metric": row["metric"],
+                    "quantity": row["quantity"],
+                    "ts": row["ts"],
+                    "idempotency_key": row["idempotency_key"],
+                },
+                status_code=status.HTTP_202_ACCEPTED,
+            )
+    event, duplicate = await ingest_usage_event_async(
         db=db,
         tenant_id=tenant_id,
         subscription_id=payload.subscription_id,
@@ -31,15 +85,99 @@ def ingest_usage(
         idempotency_key=idempotency_key or "",
         redis_client=redis_client,
     )
-    db.commit()
-    if duplicate:
+    await db.commit()
+    if duplicate or event is None:
         return JSONResponse(content={"duplicate": True}, status_code=status.HTTP_200_OK)
     usage_events_counter.inc()
-    return {
-        "id": str(event.id),
-        "subscription_id": str(event.subscription_id),
-        "metric": event.metric,
-        "quantity": float(event.quantity),
-        "ts": event.ts,
-        "idempotency_key": event.idempotency_key,
-    }
+    return ORJSONResponse(
+        {
+            "id": event.id,
+            "subscription_id": event.subscription_id,
+            "metric": event.metric,
+            "quantity": event.quantity,
+            "ts": event.ts,
+            "idempotency_key": event.idempotency_key,
+        },
+        status_code=status.HTTP_201_CREATED,
+    )
+
+
+@router.post("/tenants/{tenant_id}/usage:batch", response_model=UsageBatchResponse)
+def ingest_usage_batch_endpoint(
+    payload: UsageBatchRequest,
+    tenant_id: str = Path(...),
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+    redis_client=Depends(get_redis_client),
+):
+    if str(user.tenant_id) != tenant_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Tenant mismatch")
+    max_events = get_settings().usage_batch_max_events
+    if len(payload.events) > max_events:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch exceeds {max_events} events",
+        )
+    results = ingest_usage_batch(db, tenant_id=tenant_id, events=payload.events, redis_client=redis_client)
+    db.commit()
+    accepted = sum(1 for r in results if r["status"] == UsageIngestStatus.accepted)
+    duplicates = sum(1 for r in results if r["status"] == UsageIngestStatus.duplicate)
+    usage_events_counter.inc(accepted)
+    return ORJSONResponse(
+        {
+            "accepted": accepted,
+            "duplicates": duplicates,
+            "rejected": len(results) - accepted - duplicates,
+            "results": results,
+        }
+    )
+
+
+def _iter_body_lines(request: Request) -> Iterator[str]:
+    # Runs in a worker thread: pull body chunks from the event loop one at a time.
+    stream = request.stream().__aiter__()
+
+    async def _next_chunk() -> bytes:
+        return await stream.__anext__()
+
+    pending = b""
+    while True:
+        try:
+            chunk = anyio.from_thread.run(_next_chunk)
+        except StopAsyncIteration:
+            break
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8") + "\n"
+    if pending:
+        yield pending.decode("utf-8")
+
+
+@router.post("/tenants/{tenant_id}/usage:import", response_model=UsageImportResult)
+async def import_usage_endpoint(
+    request: Request,
+    tenant_id: str = Path(...),
+    fmt: UsageImportFormat = Query(UsageImportFormat.ndjson, alias="format"),
+    offset: int = Query(0, ge=0, description="Records to skip; pass the last reported offset to resume"),
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    if str(user.tenant_id) != tenant_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Tenant mismatch")
+
+    def _log_progress(progress: ImportProgress) -> None:
+        logger.info("usage_import_progress", tenant_id=tenant_id, **vars(progress))
+
+    progress = await run_in_threadpool(
+        import_usage,
+        db,
+        tenant_id,
+        _iter_body_lines(request),
+        fmt,
+        get_settings().usage_import_chunk_size,
+        offset,
+        _log_progress,
+    )
+    usage_events_counter.inc(progress.accepted)
+    return vars(progress)
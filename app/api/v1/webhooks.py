@@ -1,21 +1,82 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime, timedelta, timezone
+
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, status
+from redis import Redis
 from sqlalchemy.orm import Session
 
-from app.dependencies import get_db
-from app.domain.models import Tenant
-from app.schemas.webhook import WebhookDeliveryOut, WebhookEventCreate
-from app.services.webhooks import create_webhook_event, deliver_webhook
+from app.config import get_settings
+from app.dependencies import get_db, get_read_db, get_redis_client, require_tenant_admin
+from app.domain.models import Tenant, WebhookDelivery
+from app.profiling import ProfiledRoute
+from app.schemas.webhook import WebhookDeliveryOut, WebhookEventCreate, WebhookReplayRequest, WebhookReplayResponse
+from app.services.webhooks import (
+    create_webhook_event,
+    enqueue_webhook_delivery,
+    list_dead_letters,
+    replay_dead_letters,
+)
+
+router = APIRouter(route_class=ProfiledRoute)
+settings = get_settings()
 
-router = APIRouter()
+
+def _delivery_out(delivery: WebhookDelivery) -> WebhookDeliveryOut:
+    return WebhookDeliveryOut(
+        id=str(delivery.id),
+        status=delivery.status,
+        attempts=delivery.attempts,
+        next_attempt_at=delivery.next_attempt_at,
+        last_error=delivery.last_error,
+    )
 
 
 @router.post("/webhooks/payment", response_model=WebhookDeliveryOut, status_code=status.HTTP_202_ACCEPTED)
-def handle_payment_webhook(payload: WebhookEventCreate, db: Session = Depends(get_db)):
+def handle_payment_webhook(
+    payload: WebhookEventCreate,
+    db: Session = Depends(get_db),
+    redis_client: Redis | None = Depends(get_redis_client),
+):
     tenant: Tenant | None = db.get(Tenant, payload.tenant_id)
     if tenant is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tenant not found")
     delivery = create_webhook_event(db, tenant_id=payload.tenant_id, event_type=payload.type, payload=payload.payload)
     if tenant.webhook_url:
-        delivery = deliver_webhook(db, str(delivery.id), tenant.webhook_url)
+        # The delivery engine gets it from the queue; the retry scheduler only takes over
+        # once the claim lease has passed, in case the queued message is lost.
+        delivery.next_attempt_at = datetime.now(timezone.utc) + timedelta(seconds=settings.webhook_claim_lease_seconds)
+    db.commit()
+    if tenant.webhook_url and not enqueue_webhook_delivery(
+        redis_client, str(delivery.id), tenant.webhook_url, delivery.next_attempt_at
+    ):
+        delivery.next_attempt_at = datetime.now(timezone.utc)
+        db.commit()
+    return _delivery_out(delivery)
+
+
+@router.get("/tenants/{tenant_id}/webhooks/dead-letters", response_model=list[WebhookDeliveryOut])
+def list_dead_letters_endpoint(
+    tenant_id: str = Path(...),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_read_db),
+    admin=Depends(require_tenant_admin),
+):
+    if str(admin.tenant_id) != tenant_id:
+        raise HTTPException(status_code=403, detail="Tenant mismatch")
+    return [_delivery_out(delivery) for delivery in list_dead_letters(db, tenant_id, limit=limit)]
+
+
+@router.post("/tenants/{tenant_id}/webhooks/dead-letters/replay", response_model=WebhookReplayResponse)
+def replay_dead_letters_endpoint(
+    payload: WebhookReplayRequest,
+    tenant_id: str = Path(...),
+    db: Session = Depends(get_db),
+    admin=Depends(require_tenant_admin),
+):
+    if str(admin.tenant_id) != tenant_id:
+        raise HTTPException(status_code=403, detail="Tenant mismatch")
+    try:
+        replayed = replay_dead_letters(db, tenant_id, payload.delivery_ids)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
     db.commit()
-    return WebhookDeliveryOut.model_validate(delivery)
+    return {"replayed": replayed}
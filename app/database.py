@@ -1,9 +1,16 @@
-from contextlib import contextmanager
-from typing import Generator
-from sqlalchemy import create_engine
-from sqlalchemy.orm import DeclarativeBase, sessionmaker
+from contextlib import asynccontextmanager, contextmanager
+import time
+from typing import AsyncGenerator, Generator
+from sqlalchemy import URL, Engine, create_engine, make_url
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import DeclarativeBase, Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.sql.dml import UpdateBase
 
+from app.api.v1.health import db_pool_checked_out, db_pool_checkout_wait
 from app.config import get_settings
+import app.instrumentation  # noqa: F401  (registers the per-statement timing hooks)
 
 
 class Base(DeclarativeBase):
@@ -11,13 +18,80 @@ class Base(DeclarativeBase):
 
 
 settings = get_settings()
-engine = create_engine(settings.database_url, echo=False, future=True)
-SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False, expire_on_commit=False)
+
+
+class _TimedCheckout:
+    # Pools are re-instantiated on dispose(), so the metric label lives on the class.
+    engine_label = "primary"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_checkout_wait.labels(self.engine_label).observe(time.perf_counter() - started)
+
+
+def _timed_pool(pool_class: type, label: str) -> type:
+    return type(f"Timed{pool_class.__name__}", (_TimedCheckout, pool_class), {"engine_label": label})
+
+
+def engine_options(url: str | URL, label: str = "primary") -> dict:
+    """Pool and connection options for an engine on ``url`` (sqlite keeps SQLAlchemy's defaults)."""
+    url = make_url(url)
+    options: dict = {"pool_pre_ping": settings.db_pool_pre_ping, "pool_recycle": settings.db_pool_recycle_seconds}
+    if url.get_backend_name() != "postgresql":
+        return options
+    is_async = url.get_driver_name() == "asyncpg"
+    options.update(
+        poolclass=_timed_pool(AsyncAdaptedQueuePool if is_async else QueuePool, label),
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout_seconds,
+    )
+    if settings.db_statement_timeout_ms:
+        timeout = str(settings.db_statement_timeout_ms)
+        if is_async:
+            options["connect_args"] = {"server_settings": {"statement_timeout": timeout}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+    return options
+
+
+def _export_pool_usage(db_engine: Engine, label: str) -> None:
+    pool = db_engine.pool
+    if isinstance(pool, QueuePool):
+        db_pool_checked_out.labels(label).set_function(pool.checkedout)
+
+
+def create_db_engine(url: str | URL, label: str = "primary") -> Engine:
+    db_engine = create_engine(url, echo=False, future=True, **engine_options(url, label))
+    _export_pool_usage(db_engine, label)
+    return db_engine
+
+
+class RoutingSession(Session):
+    """Session that reads from ``info["replica"]`` when set; flushes and DML always go to the primary."""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        replica = self.info.get("replica")
+        if replica is not None and not self._flushing and not isinstance(clause, UpdateBase):
+            return replica
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+
+engine = create_db_engine(settings.database_url)
+replica_engine = create_db_engine(settings.database_replica_url, "replica") if settings.database_replica_url else None
+SessionLocal = sessionmaker(
+    bind=engine, class_=RoutingSession, autocommit=False, autoflush=False, expire_on_commit=False
+)
 
 
 @contextmanager
-def session_scope() -> Generator:
-    session = SessionLocal()
+def session_scope(read_only: bool = False) -> Generator:
+    # Read-only sessions may lag behind the primary; don't use them to read back your own writes.
+    info = {"replica": replica_engine} if read_only and replica_engine is not None else {}
+    session = SessionLocal(info=info)
     try:
         yield session
         session.commit()
@@ -31,3 +105,81 @@ def session_scope() -> Generator:
 def get_db() -> Generator:
     with session_scope() as db:
         yield db
+
+
+def get_read_db() -> Generator:
+    with session_scope(read_only=True) as db:
+        yield db
+
+
+def async_database_url(url: str) -> URL:
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "postgresql":
+        return parsed.set(drivername="postgresql+asyncpg")
+    if parsed.get_backend_name() == "sqlite":
+        return parsed.set(drivername="sqlite+aiosqlite")
+    return parsed
+
+
+def create_async_db_engine(url: str | URL, label: str) -> AsyncEngine:
+    db_engine = create_async_engine(url, **engine_options(url, label))
+    _export_pool_usage(db_engine.sync_engine, label)
+    return db_engine
+
+
+# Created on first use so sync-only processes (workers, migrations) never import asyncpg.
+_async_engine: AsyncEngine | None = None
+_async_replica_engine: AsyncEngine | None = None
+_async_sessionmaker: async_sessionmaker[AsyncSession] | None = None
+
+
+def get_async_sessionmaker() -> async_sessionmaker[AsyncSession]:
+    global _async_engine, _async_replica_engine, _async_sessionmaker
+    if _async_sessionmaker is None:
+        _async_engine = create_async_db_engine(
+            settings.async_database_url or async_database_url(settings.database_url), "primary_async"
+        )
+        if settings.database_replica_url:
+            _async_replica_engine = create_async_db_engine(
+                async_database_url(settings.database_replica_url), "replica_async"
+            )
+        _async_sessionmaker = async_sessionmaker(
+            _async_engine, sync_session_class=RoutingSession, autoflush=False, expire_on_commit=False
+        )
+    return _async_sessionmaker
+
+
+async def dispose_async_engine() -> None:
+    for db_engine in (_async_engine, _async_replica_engine):
+        if db_engine is not None:
+            await db_engine.dispose()
+
+
+@asynccontextmanager
+async def async_session_scope(read_only: bool = False) -> AsyncGenerator[AsyncSession, None]:
+    maker = get_async_sessionmaker()
+    info = {"replica": _async_replica_engine.sync_engine} if read_only and _async_replica_engine is not None else {}
+    async with maker(info=info) as session:
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with async_session_scope() as session:
+        yield session
+
+
+async def get_async_read_db() -> AsyncGenerator[AsyncSession, None]:
+    async with async_session_scope(read_only=True) as session:
+        yield session
+
+
+def dialect_insert(db: Session, entity):
+    # INSERT ... ON CONFLICT is dialect specific; tests run on sqlite, prod on postgres.
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(entity)
+    return sqlite.insert(entity)
@@ -1,12 +1,18 @@
 from fastapi import Depends, HTTPException, Header, status
 from fastapi.security import OAuth2PasswordBearer
 from redis import Redis
+from redis import asyncio as aioredis
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.config import get_settings
-from app.database import get_db
-from app.domain.models import Role, Tenant, User
+from app.database import get_async_read_db, get_read_db
+from app.database import get_db as get_db  # re-exported for the routers
+from app.domain.models import Role, Tenant
+from app.instrumentation import tag_principal
+from app.redis_client import get_async_redis, get_redis
 from app.security import decode_token
+from app.services.principals import Principal, load_principal
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/v1/auth/login")
 
@@ -15,17 +21,21 @@ def get_settings_dep():
     return get_settings()
 
 
-def get_redis_client(settings=Depends(get_settings_dep)) -> Redis | None:
+def get_redis_client() -> Redis | None:
     try:
-        return Redis.from_url(settings.redis_url)
+        return get_redis()
     except Exception:
         return None
 
 
-def get_current_user(
-    db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme),
-) -> User:
+def get_async_redis_client() -> aioredis.Redis | None:
+    try:
+        return get_async_redis()
+    except Exception:
+        return None
+
+
+def _token_subject(token: str) -> tuple[str, str]:
     payload = decode_token(token)
     if payload is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
@@ -33,14 +43,48 @@ def get_current_user(
     sub = payload.get("sub")
     if tenant_id is None or sub is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
+    return sub, tenant_id
+
+
+def _load_principal(db: Session, sub: str, tenant_id: str) -> Principal | None:
+    principal = load_principal(db, sub, tenant_id)
+    replica = db.info.get("replica")
+    if principal is None and replica is not None:
+        # A user created moments ago may not have reached the replica yet; ask the primary.
+        del db.info["replica"]
+        try:
+            principal = load_principal(db, sub, tenant_id)
+        finally:
+            db.info["replica"] = replica
+    return principal
 
-    user = db.query(User).filter(User.id == sub, User.tenant_id == tenant_id).first()
-    if not user:
+
+def get_current_user(
+    db: Session = Depends(get_read_db),
+    token: str = Depends(oauth2_scheme),
+) -> Principal:
+    sub, tenant_id = _token_subject(token)
+    principal = _load_principal(db, sub, tenant_id)
+    if principal is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
-    return user
+    tag_principal(principal)
+    return principal
+
+
+async def get_current_user_async(
+    db: AsyncSession = Depends(get_async_read_db),
+    token: str = Depends(oauth2_scheme),
+) -> Principal:
+    sub, tenant_id = _token_subject(token)
+    # Cache hits never touch the database; misses reuse the sync loader on the async connection.
+    principal = await db.run_sync(_load_principal, sub, tenant_id)
+    if principal is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    tag_principal(principal)
+    return principal
 
 
-def require_tenant_admin(user: User = Depends(get_current_user)) -> User:
+def require_tenant_admin(user: Principal = Depends(get_current_user)) -> Principal:
     if user.role != Role.admin:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin required")
     return user
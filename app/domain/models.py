@@ -1,18 +1,24 @@
 import uuid
-from datetime import datetime
+from datetime import date, datetime, timezone
+from decimal import Decimal
 from enum import Enum
 
 from sqlalchemy import (
+    DDL,
     JSON,
     Boolean,
+    Date,
     DateTime,
     Enum as PgEnum,
     ForeignKey,
+    Index,
     Integer,
     Numeric,
     String,
     UniqueConstraint,
+    event,
     func,
+    text,
 )
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
@@ -57,6 +63,10 @@ def _uuid() -> uuid.UUID:
     return uuid.uuid4()
 
 
+def _current_month() -> date:
+    return datetime.now(timezone.utc).date().replace(day=1)
+
+
 class Tenant(Base):
     __tablename__ = "tenants"
 
@@ -119,16 +129,29 @@ class Plan(Base):
     name: Mapped[str] = mapped_column(String(255), nullable=False)
     pricing_model: Mapped[PricingModel] = mapped_column(PgEnum(PricingModel), nullable=False)
     currency: Mapped[str] = mapped_column(String(3), default="USD", nullable=False)
-    price: Mapped[Numeric] = mapped_column(Numeric(12, 2), nullable=False, default=0)
-    tiers: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+    price: Mapped[Decimal] = mapped_column(Numeric(12, 2), nullable=False, default=0)
+    tiers: Mapped[list[dict] | None] = mapped_column(JSON, nullable=True)
+    # Bumped by the ORM on every update; compiled price schedules are cached per version.
+    version: Mapped[int] = mapped_column(Integer, nullable=False, server_default="1")
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
+    __mapper_args__ = {"version_id_col": version}
+
     product: Mapped["Product"] = relationship("Product", back_populates="plans")
     subscriptions: Mapped[list["Subscription"]] = relationship("Subscription", back_populates="plan")
 
 
 class Subscription(Base):
     __tablename__ = "subscriptions"
+    # Period-close runs look for active subscriptions whose period has ended.
+    __table_args__ = (
+        Index(
+            "ix_subscriptions_due",
+            "current_period_end",
+            postgresql_where=text("status = 'active'"),
+            sqlite_where=text("status = 'active'"),
+        ),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=_uuid)
     tenant_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("tenants.id", ondelete="CASCADE"), nullable=False, index=True)
@@ -147,25 +170,81 @@ class Subscription(Base):
 
 
 class UsageEvent(Base):
+    # Range-partitioned by month on ts in PostgreSQL (see app/services/usage_partitions.py);
+    # primary keys must include the partition key, so idempotency lives in UsageIdempotencyKey.
     __tablename__ = "usage_events"
-    __table_args__ = (UniqueConstraint("idempotency_key", name="uq_usage_idempotency"),)
+    __table_args__ = (
+        Index("ix_usage_events_subscription_ts", "subscription_id", "ts"),
+        Index("ix_usage_events_tenant_ts", "tenant_id", "ts"),
+        {"postgresql_partition_by": "RANGE (ts)"},
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=_uuid)
-    tenant_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("tenants.id", ondelete="CASCADE"), nullable=False, index=True)
+    tenant_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("tenants.id", ondelete="CASCADE"), nullable=False)
     subscription_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("subscriptions.id", ondelete="CASCADE"), nullable=False)
     metric: Mapped[str] = mapped_column(String(255), nullable=False)
     quantity: Mapped[Numeric] = mapped_column(Numeric(18, 6), nullable=False)
-    ts: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=func.now(), index=True)
+    ts: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True, default=func.now())
     idempotency_key: Mapped[str] = mapped_column(String(255), nullable=False)
 
     subscription: Mapped["Subscription"] = relationship("Subscription", back_populates="usage_events")
 
 
+# Rows outside every monthly partition (backfills, clock skew) land here until the
+# partition maintenance job moves them into their month.
+event.listen(
+    UsageEvent.__table__,
+    "after_create",
+    DDL("CREATE TABLE IF NOT EXISTS usage_events_default PARTITION OF usage_events DEFAULT").execute_if(
+        dialect="postgresql"
+    ),
+)
+
+
+class UsageIdempotencyKey(Base):
+    # One row per accepted usage event. Range-partitioned by created_month in PostgreSQL so
+    # expired keys go with whole partitions; the primary key dedups within a month and
+    # app/services/usage.py checks the earlier months still in the idempotency window.
+    __tablename__ = "usage_idempotency_keys"
+    __table_args__ = ({"postgresql_partition_by": "RANGE (created_month)"},)
+
+    tenant_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("tenants.id", ondelete="CASCADE"), primary_key=True)
+    idempotency_key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    created_month: Mapped[date] = mapped_column(Date, primary_key=True, default=_current_month)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+
+event.listen(
+    UsageIdempotencyKey.__table__,
+    "after_create",
+    DDL(
+        "CREATE TABLE IF NOT EXISTS usage_idempotency_keys_default PARTITION OF usage_idempotency_keys DEFAULT"
+    ).execute_if(dialect="postgresql"),
+)
+
+
+class UsageRollup(Base):
+    # Hourly usage totals per subscription and metric, maintained on ingest.
+    __tablename__ = "usage_rollups"
+
+    tenant_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("tenants.id", ondelete="CASCADE"), primary_key=True)
+    subscription_id: Mapped[uuid.UUID] = mapped_column(
+        ForeignKey("subscriptions.id", ondelete="CASCADE"), primary_key=True
+    )
+    bucket_start: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    metric: Mapped[str] = mapped_column(String(255), primary_key=True)
+    quantity: Mapped[Decimal] = mapped_column(Numeric(24, 6), nullable=False, default=0)
+    event_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
 class Invoice(Base):
     __tablename__ = "invoices"
+    # Keyset pagination seeks to (tenant_id, created_at, id) and reads forward in list order.
+    # It also serves every other tenant_id lookup, so there is no separate tenant_id index.
+    __table_args__ = (Index("ix_invoices_tenant_created", "tenant_id", text("created_at DESC"), text("id DESC")),)
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=_uuid)
-    tenant_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("tenants.id", ondelete="CASCADE"), nullable=False, index=True)
+    tenant_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("tenants.id", ondelete="CASCADE"), nullable=False)
     subscription_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("subscriptions.id", ondelete="SET NULL"), nullable=True)
     total: Mapped[Numeric] = mapped_column(Numeric(12, 2), nullable=False, default=0)
     currency: Mapped[str] = mapped_column(String(3), default="USD", nullable=False)
@@ -182,7 +261,9 @@ class InvoiceItem(Base):
     __tablename__ = "invoice_items"
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=_uuid)
-    invoice_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("invoices.id", ondelete="CASCADE"), nullable=False)
+    invoice_id: Mapped[uuid.UUID] = mapped_column(
+        ForeignKey("invoices.id", ondelete="CASCADE"), nullable=False, index=True
+    )
     description: Mapped[str] = mapped_column(String(255), nullable=False)
     quantity: Mapped[int] = mapped_column(Integer, default=1)
     unit_amount: Mapped[Numeric] = mapped_column(Numeric(12, 2), nullable=False)
@@ -203,6 +284,16 @@ class WebhookEvent(Base):
 
 class WebhookDelivery(Base):
     __tablename__ = "webhook_deliveries"
+    # Only retryable rows are indexed, so polling for due deliveries stays cheap however many
+    # delivered/dead-lettered rows accumulate; keyed on next_attempt_at for an ordered scan.
+    __table_args__ = (
+        Index(
+            "ix_webhook_deliveries_due",
+            "next_attempt_at",
+            postgresql_where=text("status IN ('pending', 'failed')"),
+            sqlite_where=text("status IN ('pending', 'failed')"),
+        ),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=_uuid)
     event_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("webhook_events.id", ondelete="CASCADE"), nullable=False)
@@ -219,6 +310,36 @@ class TenantRevenueMV(Base):
     __tablename__ = "tenant_revenue_mv"
 
     tenant_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
-    monthly_recurring_revenue: Mapped[Numeric] = mapped_column(Numeric(12, 2), nullable=False, default=0)
-    annual_run_rate: Mapped[Numeric] = mapped_column(Numeric(12, 2), nullable=False, default=0)
+    monthly_recurring_revenue: Mapped[Decimal] = mapped_column(Numeric(12, 2), nullable=False, default=0)
+    annual_run_rate: Mapped[Decimal] = mapped_column(Numeric(12, 2), nullable=False, default=0)
+    invoiced_revenue: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=0, server_default="0")
     refreshed_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class RevenueSnapshot(Base):
+    # Daily MRR per tenant and plan, written by revenue_snapshot_job; analytics endpoints only read these.
+    # No foreign key to plans/products so history survives catalog deletions.
+    __tablename__ = "revenue_snapshots"
+
+    tenant_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("tenants.id", ondelete="CASCADE"), primary_key=True)
+    snapshot_date: Mapped[date] = mapped_column(Date, primary_key=True)
+    plan_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    product_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+    active_subscriptions: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    mrr: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    new_mrr: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    expansion_mrr: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    contraction_mrr: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    churned_mrr: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    invoiced_revenue: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+
+
+class SubscriptionRevenueState(Base):
+    # Each subscription's MRR as of the last snapshot; the next snapshot diffs against it.
+    __tablename__ = "subscription_revenue_state"
+
+    subscription_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    tenant_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("tenants.id", ondelete="CASCADE"), nullable=False, index=True)
+    plan_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+    product_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+    mrr: Mapped[Decimal] = mapped_column(Numeric(12, 2), nullable=False, default=0)
@@ -0,0 +1,210 @@
+"""Per-request latency, database and Redis timing.
+
+The HTTP middleware in ``app/main.py`` opens a ``RequestStats`` for each request. The
+SQLAlchemy hooks below and the timed Redis clients in ``app/redis_client.py`` add to
+whichever request is current. When the response body is finished, the request is
+recorded by route template and status class.
+
+Per-tenant metrics label only the ``BILLING_METRICS_TENANT_TOP_K`` busiest tenants of the
+previous window. Every other tenant is reported as "other", so the number of series
+stays bounded whatever the tenant count is.
+"""
+
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+import threading
+import time
+from typing import Callable
+import uuid
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import Scope
+import structlog
+
+from app.api.v1.health import (
+    db_query_duration,
+    http_request_db_queries,
+    http_request_db_seconds,
+    http_request_duration,
+    http_request_redis_seconds,
+    redis_command_duration,
+    tenant_request_db_seconds,
+    tenant_request_duration,
+)
+from app.config import get_settings
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+OTHER_TENANTS = "other"
+NO_TENANT = "none"
+UNMATCHED_ROUTE = "unmatched"
+SQL_OPERATIONS = frozenset({"SELECT", "INSERT", "UPDATE", "DELETE"})
+
+
+@dataclass
+class RequestStats:
+    path: str
+    tenant_id: str | None = None
+    role: str | None = None
+    started: float = field(default_factory=time.perf_counter)
+    db_queries: int = 0
+    db_seconds: float = 0.0
+    redis_commands: int = 0
+    redis_seconds: float = 0.0
+
+
+# Mutable, so sync routes on the threadpool (which run in a copy of the context) still add to it.
+current_request: ContextVar[RequestStats | None] = ContextVar("current_request", default=None)
+
+
+class TopTenants:
+    """Decides which tenants get their own metric label.
+
+    A tenant keeps its label while it is among the ``k`` busiest of the previous window.
+    While fewer than ``k`` tenants hold a label, any new tenant gets one straight away.
+    ``on_evict`` is called for each tenant that loses its label, so its series can be
+    removed.
+    """
+
+    def __init__(
+        self,
+        k: int,
+        window_seconds: float,
+        max_tracked: int = 10_000,
+        clock: Callable[[], float] = time.monotonic,
+        on_evict: Callable[[str], None] | None = None,
+    ):
+        self.k = k
+        self.window_seconds = window_seconds
+        self.max_tracked = max_tracked
+        self._clock = clock
+        self._on_evict = on_evict
+        self._counts: dict[str, int] = {}
+        self._labelled: set[str] = set()
+        self._window_started = clock()
+        self._lock = threading.Lock()
+
+    def label(self, tenant_id: str | None) -> str:
+        if not tenant_id:
+            return NO_TENANT
+        with self._lock:
+            now = self._clock()
+            if now - self._window_started >= self.window_seconds:
+                self._rotate(now)
+            if tenant_id in self._counts or len(self._counts) < self.max_tracked:
+                self._counts[tenant_id] = self._counts.get(tenant_id, 0) + 1
+            if tenant_id in self._labelled:
+                return tenant_id
+            if len(self._labelled) < self.k:
+                self._labelled.add(tenant_id)
+                return tenant_id
+        return OTHER_TENANTS
+
+    def labelled(self) -> set[str]:
+        with self._lock:
+            return set(self._labelled)
+
+    def _rotate(self, now: float) -> None:
+        busiest = sorted(self._counts, key=self._counts.__getitem__, reverse=True)[: self.k]
+        evicted = self._labelled.difference(busiest)
+        self._labelled = set(busiest)
+        self._counts = {}
+        self._window_started = now
+        if self._on_evict is not None:
+            for tenant_id in evicted:
+                self._on_evict(tenant_id)
+
+
+def _drop_tenant_series(tenant_id: str) -> None:
+    for metric in (tenant_request_duration, tenant_request_db_seconds):
+        metric.remove(tenant_id)
+
+
+top_tenants = TopTenants(
+    k=settings.metrics_tenant_top_k,
+    window_seconds=settings.metrics_tenant_window_seconds,
+    on_evict=_drop_tenant_series,
+)
+
+
+def _tenant_key(value) -> str | None:
+    # Only well-formed ids are counted; arbitrary header values must not become labels.
+    try:
+        return str(uuid.UUID(str(value)))
+    except ValueError:
+        return None
+
+
+def begin_request(path: str, tenant_id: str | None = None) -> RequestStats:
+    stats = RequestStats(path=path, tenant_id=_tenant_key(tenant_id) if tenant_id else None)
+    current_request.set(stats)
+    return stats
+
+
+def tag_principal(principal) -> None:
+    """Attribute the current request to the authenticated principal's tenant and role."""
+    stats = current_request.get()
+    if stats is not None:
+        stats.tenant_id = _tenant_key(principal.tenant_id)
+        stats.role = principal.role.value
+
+
+def route_template(scope: Scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+def record_request(stats: RequestStats, scope: Scope, method: str, status_code: int) -> float:
+    """Observe a finished request; returns its duration in seconds."""
+    duration = time.perf_counter() - stats.started
+    route = route_template(scope)
+    http_request_duration.labels(method, route, f"{status_code // 100}xx").observe(duration)
+    http_request_db_queries.labels(route).observe(stats.db_queries)
+    http_request_db_seconds.labels(route).observe(stats.db_seconds)
+    http_request_redis_seconds.labels(route).observe(stats.redis_seconds)
+    tenant = top_tenants.label(stats.tenant_id)
+    tenant_request_duration.labels(tenant).observe(duration)
+    tenant_request_db_seconds.labels(tenant).observe(stats.db_seconds)
+    return duration
+
+
+def record_redis(command: str, seconds: float) -> None:
+    redis_command_duration.labels(command).observe(seconds)
+    stats = current_request.get()
+    if stats is not None:
+        stats.redis_commands += 1
+        stats.redis_seconds += seconds
+
+
+def _operation(statement: str) -> str:
+    verb = statement.lstrip()[:6].upper()
+    return verb if verb in SQL_OPERATIONS else "OTHER"
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query_timer(_conn, _cursor, _statement, _parameters, context, _executemany) -> None:
+    # Kept on the execution context: a connection can be shared by threads (sqlite StaticPool).
+    if context is not None:
+        context.query_started = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _record_query(_conn, _cursor, statement, _parameters, context, _executemany) -> None:
+    started = getattr(context, "query_started", None)
+    if started is None:
+        return
+    seconds = time.perf_counter() - started
+    db_query_duration.labels(_operation(statement)).observe(seconds)
+    stats = current_request.get()
+    if stats is not None:
+        stats.db_queries += 1
+        stats.db_seconds += seconds
+    if settings.db_slow_query_log_ms and seconds * 1000 >= settings.db_slow_query_log_ms:
+        logger.warning(
+            "slow_query",
+            duration_ms=round(seconds * 1000, 1),
+            statement=statement[:1000],
+            path=stats.path if stats is not None else None,
+        )
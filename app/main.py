@@ -1,3 +1,5 @@
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 import uuid
 from contextvars import ContextVar
 
@@ -9,9 +11,14 @@ from fastapi.responses import FileResponse
 from fastapi.staticfiles import StaticFiles
 import structlog
 
+from app.api.responses import ORJSONResponse
 from app.api.v1.router import api_router
-from app.database import Base, engine
+from app.database import Base, dispose_async_engine, engine
+from app.instrumentation import begin_request, record_request
 from app.logging_config import setup_logging
+from app.profiling import PROFILE_ID_HEADER, begin_request_profile, store_request_profile_async
+from app.redis_client import close_async_redis_pool, close_redis_pool, get_async_redis, init_redis_pool
+from app.services.passwords import shutdown_password_pool
 
 setup_logging()
 logger = structlog.get_logger()
@@ -19,7 +26,23 @@ request_id_ctx = ContextVar("request_id", default=None)
 
 Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="Usage-Based Billing Service", version="0.1.0")
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
+    init_redis_pool()
+    yield
+    close_redis_pool()
+    await close_async_redis_pool()
+    shutdown_password_pool()
+    await dispose_async_engine()
+
+
+app = FastAPI(
+    title="Usage-Based Billing Service",
+    version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 static_dir = Path(__file__).parent / "static"
 
 app.add_middleware(
@@ -35,16 +58,44 @@ app.add_middleware(
 async def add_request_id(request: Request, call_next):
     rid = str(uuid.uuid4())
     request_id_ctx.set(rid)
-    response = await call_next(request)
+    stats = begin_request(request.url.path, request.headers.get("X-Tenant-ID"))
+    wants_profile = begin_request_profile(request.headers)
+    try:
+        response = await call_next(request)
+    except Exception:
+        record_request(stats, request.scope, request.method, 500)
+        raise
     response.headers["X-Request-ID"] = rid
-    logger.info(
-        "request_complete",
-        path=request.url.path,
-        method=request.method,
-        status=response.status_code,
-        tenant_id=request.headers.get("X-Tenant-ID"),
-        request_id=rid,
-    )
+    # ProfiledRoute only takes a profile for tenant admins.
+    if wants_profile is not None and wants_profile.profile is not None and stats.tenant_id is not None:
+        try:
+            await store_request_profile_async(get_async_redis(), stats.tenant_id, rid, wants_profile.profile)
+            response.headers[PROFILE_ID_HEADER] = rid
+        except Exception:
+            logger.warning("request_profile_not_stored", request_id=rid)
+    body = response.body_iterator
+
+    # Recorded once the body is sent, so streamed exports count their full duration and queries.
+    async def observed_body():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            duration = record_request(stats, request.scope, request.method, response.status_code)
+            logger.info(
+                "request_complete",
+                path=request.url.path,
+                method=request.method,
+                status=response.status_code,
+                tenant_id=stats.tenant_id,
+                request_id=rid,
+                duration_ms=round(duration * 1000, 1),
+                db_queries=stats.db_queries,
+                db_ms=round(stats.db_seconds * 1000, 1),
+                redis_ms=round(stats.redis_seconds * 1000, 1),
+            )
+
+    response.body_iterator = observed_body()
     return response
 
 
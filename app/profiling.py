@@ -0,0 +1,251 @@
+"""On-demand profiling of API and RQ worker processes.
+
+Everything here is inert unless ``BILLING_PROFILING_ENABLED`` is set. The admin endpoints are
+in ``app/api/v1/debug.py``.
+
+- ``SamplingProfiler`` records the Python stack of every thread (or one thread) every few
+  milliseconds. Output is in the collapsed format read by ``flamegraph.pl``, speedscope and
+  similar tools: one ``thread;module:function;... count`` line per distinct stack.
+- For RQ workers, the API sets ``profiling:worker:active`` for N seconds. While it is set,
+  ``BillingWorker`` work horses sample the job they run and add their stacks to a Redis hash
+  that the API reads back.
+- A tenant admin request carrying ``X-Debug-Profile`` runs its endpoint under ``cProfile``.
+  Routes declared with ``ProfiledRoute`` enable the profiler inside the thread that runs
+  the endpoint, once authentication has tagged the request as admin. One request is
+  profiled per process at a time; others run unprofiled. The response gets an
+  ``X-Profile-ID`` header; the pstats file is kept in Redis for
+  ``BILLING_PROFILING_RESULT_TTL_SECONDS``.
+"""
+
+from collections import Counter
+import cProfile
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+import functools
+import inspect
+import json
+import marshal
+import sys
+import threading
+import time
+from typing import Awaitable, Callable, Iterator, cast
+import uuid
+
+from fastapi.routing import APIRoute
+from redis import Redis
+from redis import asyncio as aioredis
+
+from app.config import get_settings
+from app.domain.models import Role
+from app.instrumentation import current_request
+
+settings = get_settings()
+
+PROFILE_HEADER = "X-Debug-Profile"
+PROFILE_ID_HEADER = "X-Profile-ID"
+WORKER_PROFILE_KEY = "profiling:worker:active"
+# Time allowed for work horses to write their stacks once a worker profile ends.
+WORKER_FLUSH_GRACE_SECONDS = 2.0
+
+
+
+@dataclass
+class RequestProfile:
+    """Set for requests that asked for a profile; ``profile`` is filled in if one was taken."""
+
+    profile: cProfile.Profile | None = None
+
+
+# Mutable, so sync routes on the threadpool (which run in a copy of the context) can fill it in.
+request_profile: ContextVar[RequestProfile | None] = ContextVar("request_profile", default=None)
+# One cProfile at a time per process: on 3.12+ a second enable() raises.
+request_profile_lock = threading.Lock()
+
+
+def _collapse(thread_name: str, frame) -> str:
+    names = []
+    while frame is not None:
+        names.append(f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_qualname}")
+        frame = frame.f_back
+    names.append(thread_name.replace(" ", "_"))
+    return ";".join(reversed(names))
+
+
+def collapsed(counts: dict[str, int]) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(counts.items()))
+
+
+class SamplingProfiler:
+    """Counts the stacks of other threads (or only ``thread_ids``) every ``interval`` seconds."""
+
+    def __init__(self, interval: float, thread_ids: set[int] | None = None):
+        self.interval = interval
+        self.thread_ids = thread_ids
+        self.counts: Counter[str] = Counter()
+        self.samples = 0
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def sample(self) -> None:
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own or (self.thread_ids is not None and thread_id not in self.thread_ids):
+                continue
+            self.counts[_collapse(names.get(thread_id, str(thread_id)), frame)] += 1
+        self.samples += 1
+
+    def run(self, seconds: float) -> Counter[str]:
+        """Sample on the calling thread until ``seconds`` pass or ``stop()`` is called."""
+        deadline = time.monotonic() + seconds
+        while not self._stopped.is_set() and time.monotonic() < deadline:
+            self.sample()
+            self._stopped.wait(self.interval)
+        return self.counts
+
+    def start(self, seconds: float, on_finish: Callable[[Counter[str]], None] | None = None) -> None:
+        def target():
+            counts = self.run(seconds)
+            if on_finish is not None:
+                on_finish(counts)
+
+        self._thread = threading.Thread(target=target, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+# One sampling profile at a time per process.
+sampling_lock = threading.Lock()
+
+
+def _worker_stacks_key(session_id: str) -> str:
+    return f"profiling:worker:{session_id}:stacks"
+
+
+async def start_worker_profile_async(redis_client: aioredis.Redis, seconds: int, interval_ms: int) -> str:
+    """Ask every work horse that starts a job in the next ``seconds`` to sample it; returns the session id."""
+    session_id = uuid.uuid4().hex
+    session = {"id": session_id, "until": time.time() + seconds, "interval_ms": interval_ms}
+    if not await redis_client.set(WORKER_PROFILE_KEY, json.dumps(session), ex=seconds, nx=True):
+        raise ValueError("A worker profile is already running")
+    return session_id
+
+
+async def worker_profile_stacks_async(redis_client: aioredis.Redis, session_id: str) -> dict[str, int]:
+    stacks = await cast("Awaitable[dict[bytes, bytes]]", redis_client.hgetall(_worker_stacks_key(session_id)))
+    return {stack.decode(): int(count) for stack, count in stacks.items()}
+
+
+def active_worker_profile(redis_client: Redis) -> dict | None:
+    try:
+        raw = cast("bytes | None", redis_client.get(WORKER_PROFILE_KEY))
+    except Exception:
+        return None
+    return json.loads(raw) if raw else None
+
+
+@contextmanager
+def profile_worker_job(redis_client: Redis, session: dict) -> Iterator[None]:
+    """Sample the calling thread until the block exits or the session ends, then store the stacks."""
+    key = _worker_stacks_key(session["id"])
+
+    def flush(counts: Counter[str]) -> None:
+        if not counts:
+            return
+        pipe = redis_client.pipeline(transaction=False)
+        for stack, count in counts.items():
+            pipe.hincrby(key, stack, count)
+        pipe.expire(key, settings.profiling_result_ttl_seconds)
+        pipe.execute()
+
+    profiler = SamplingProfiler(session["interval_ms"] / 1000, thread_ids={threading.get_ident()})
+    profiler.start(max(0.0, session["until"] - time.time()), on_finish=flush)
+    try:
+        yield
+    finally:
+        profiler.stop()
+
+
+def begin_request_profile(headers) -> RequestProfile | None:
+    """Mark the request as wanting a profile; ``ProfiledRoute`` decides whether it gets one."""
+    if not settings.profiling_enabled or PROFILE_HEADER not in headers:
+        return None
+    holder = RequestProfile()
+    request_profile.set(holder)
+    return holder
+
+
+def _request_profile_key(tenant_id: str, profile_id: str) -> str:
+    return f"profiling:request:{tenant_id}:{profile_id}"
+
+
+async def store_request_profile_async(
+    redis_client: aioredis.Redis, tenant_id: str, profile_id: str, profile: cProfile.Profile
+) -> None:
+    profile.create_stats()
+    # Same bytes as Profile.dump_stats(): loadable with pstats, snakeviz and friends.
+    await redis_client.set(
+        _request_profile_key(tenant_id, profile_id),
+        marshal.dumps(profile.stats),
+        ex=settings.profiling_result_ttl_seconds,
+    )
+
+
+async def load_request_profile_async(redis_client: aioredis.Redis, tenant_id: str, profile_id: str) -> bytes | None:
+    return await cast("Awaitable[bytes | None]", redis_client.get(_request_profile_key(tenant_id, profile_id)))
+
+
+@contextmanager
+def _profiling() -> Iterator[None]:
+    """Profile the block on this thread if an admin asked for it and no other profile is running."""
+    holder, stats = request_profile.get(), current_request.get()
+    wanted = stats is not None and stats.role == Role.admin.value
+    if holder is None or not wanted or not request_profile_lock.acquire(blocking=False):
+        yield
+        return
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        # Another profiling tool already owns this thread.
+        request_profile_lock.release()
+        yield
+        return
+    try:
+        yield
+    finally:
+        profile.disable()
+        request_profile_lock.release()
+        holder.profile = profile
+
+
+def _profiled(endpoint: Callable) -> Callable:
+    if inspect.iscoroutinefunction(endpoint):
+
+        @functools.wraps(endpoint)
+        async def profiled_async(*args, **kwargs):
+            # Other requests served by the event loop meanwhile show up in this profile too.
+            with _profiling():
+                return await endpoint(*args, **kwargs)
+
+        return profiled_async
+
+    @functools.wraps(endpoint)
+    def profiled(*args, **kwargs):
+        # cProfile only sees the thread it is enabled on, so enable it on the threadpool thread.
+        with _profiling():
+            return endpoint(*args, **kwargs)
+
+    return profiled
+
+
+class ProfiledRoute(APIRoute):
+    """Route whose endpoint runs under cProfile when an admin request asked for a profile."""
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, _profiled(endpoint), **kwargs)
@@ -0,0 +1,116 @@
+import time
+
+from redis import BlockingConnectionPool, Redis
+from redis import asyncio as aioredis
+from redis.client import Pipeline
+
+from app.api.v1.health import redis_pool_available, redis_pool_in_use, redis_pool_max
+from app.config import get_settings
+from app.instrumentation import record_redis
+
+settings = get_settings()
+_pool: BlockingConnectionPool | None = None
+_async_pool: aioredis.BlockingConnectionPool | None = None
+
+
+class TimedPipeline(Pipeline):
+    def execute(self, raise_on_error: bool = True):
+        started = time.perf_counter()
+        try:
+            return super().execute(raise_on_error)
+        finally:
+            record_redis("PIPELINE", time.perf_counter() - started)
+
+
+class TimedRedis(Redis):
+    """Records every command (and every pipeline as a single round trip) in the Redis metrics."""
+
+    def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            record_redis(str(args[0]).upper(), time.perf_counter() - started)
+
+    def pipeline(self, transaction=True, shard_hint=None) -> TimedPipeline:
+        return TimedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+class TimedAsyncPipeline(aioredis.client.Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        started = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        finally:
+            record_redis("PIPELINE", time.perf_counter() - started)
+
+
+class TimedAsyncRedis(aioredis.Redis):
+    async def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            record_redis(str(args[0]).upper(), time.perf_counter() - started)
+
+    def pipeline(self, transaction=True, shard_hint=None) -> TimedAsyncPipeline:
+        return TimedAsyncPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+def _pool_stats(pool: BlockingConnectionPool) -> tuple[int, int]:
+    # redis-py does not expose pool usage publicly. Its queue holds idle connections plus a
+    # None for every connection not opened yet; everything else it opened is checked out.
+    idle = sum(1 for connection in list(pool.pool.queue) if connection is not None)
+    return len(pool._connections) - idle, idle
+
+
+def init_redis_pool() -> BlockingConnectionPool:
+    """Create the process-wide pool; called from the app lifespan, lazily everywhere else.
+
+    When every connection is checked out, callers wait up to ``BILLING_REDIS_POOL_TIMEOUT_SECONDS``
+    for one to be returned instead of failing straight away.
+    """
+    global _pool
+    if _pool is None:
+        _pool = BlockingConnectionPool.from_url(
+            settings.redis_url,
+            max_connections=settings.redis_max_connections,
+            timeout=settings.redis_pool_timeout_seconds,
+            health_check_interval=settings.redis_health_check_interval_seconds,
+            socket_timeout=settings.redis_socket_timeout_seconds,
+            socket_connect_timeout=settings.redis_socket_timeout_seconds,
+        )
+        pool = _pool
+        redis_pool_in_use.set_function(lambda: _pool_stats(pool)[0])
+        redis_pool_available.set_function(lambda: _pool_stats(pool)[1])
+        redis_pool_max.set(settings.redis_max_connections)
+    return _pool
+
+
+def get_redis() -> Redis:
+    return TimedRedis(connection_pool=init_redis_pool())
+
+
+def close_redis_pool() -> None:
+    # The pool object stays usable (it reconnects on demand); this only drops the sockets.
+    if _pool is not None:
+        _pool.disconnect()
+
+
+def get_async_redis() -> aioredis.Redis:
+    global _async_pool
+    if _async_pool is None:
+        _async_pool = aioredis.BlockingConnectionPool.from_url(
+            settings.redis_url,
+            max_connections=settings.redis_max_connections,
+            timeout=settings.redis_pool_timeout_seconds,
+            health_check_interval=settings.redis_health_check_interval_seconds,
+            socket_timeout=settings.redis_socket_timeout_seconds,
+            socket_connect_timeout=settings.redis_socket_timeout_seconds,
+        )
+    return TimedAsyncRedis(connection_pool=_async_pool)
+
+
+async def close_async_redis_pool() -> None:
+    if _async_pool is not None:
+        await _async_pool.disconnect()
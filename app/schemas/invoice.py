@@ -1,4 +1,6 @@
 from datetime import datetime
+from decimal import Decimal
+from enum import Enum
 from typing import List
 
 from pydantic import BaseModel
@@ -12,17 +14,27 @@ class InvoiceItemOut(BaseModel):
     id: str
     description: str
     quantity: int
-    unit_amount: float
-    amount: float
+    unit_amount: Decimal
+    amount: Decimal
 
 
 class InvoiceOut(BaseModel):
     model_config = {"from_attributes": True}
 
     id: str
-    total: float
+    total: Decimal
     currency: str
     period_start: datetime
     period_end: datetime
     status: InvoiceStatus
     items: List[InvoiceItemOut] = []
+
+
+class InvoiceStatusUpdate(BaseModel):
+    status: InvoiceStatus
+
+
+class InvoiceExportFormat(str, Enum):
+    json = "json"
+    ndjson = "ndjson"
+    csv = "csv"
@@ -1,7 +1,40 @@
+from datetime import date
+from decimal import Decimal
+
 from pydantic import BaseModel
 
 
 class MRRResponse(BaseModel):
     tenant_id: str
-    monthly_recurring_revenue: float
-    annual_run_rate: float
+    monthly_recurring_revenue: Decimal
+    annual_run_rate: Decimal
+
+
+class MRRPoint(BaseModel):
+    date: date
+    mrr: Decimal
+    annual_run_rate: Decimal
+    active_subscriptions: int
+    new_mrr: Decimal
+    expansion_mrr: Decimal
+    contraction_mrr: Decimal
+    churned_mrr: Decimal
+    net_new_mrr: Decimal
+
+
+class PlanMRRBreakdown(BaseModel):
+    plan_id: str
+    plan_name: str | None
+    mrr: Decimal
+    active_subscriptions: int
+    new_mrr: Decimal
+    expansion_mrr: Decimal
+    contraction_mrr: Decimal
+    churned_mrr: Decimal
+
+
+class ProductRevenue(BaseModel):
+    product_id: str
+    product_name: str | None
+    invoiced_revenue: Decimal
+    mrr: Decimal
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, EmailStr
 
+from app.domain.models import Role
 from app.schemas.user import UserOut
 
 
@@ -24,6 +25,10 @@ class TenantUserCreate(BaseModel):
     role: str = "read_only"
 
 
+class TenantUserUpdate(BaseModel):
+    role: Role
+
+
 class TenantWithAdmin(BaseModel):
     tenant: TenantOut
     admin: UserOut
@@ -1,6 +1,8 @@
 from datetime import datetime
+from enum import Enum
+from typing import List
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class UsageEventCreate(BaseModel):
@@ -19,3 +21,43 @@ class UsageEventOut(BaseModel):
     quantity: float
     ts: datetime
     idempotency_key: str
+
+
+class UsageEventBatchItem(UsageEventCreate):
+    idempotency_key: str = Field(..., min_length=1, max_length=255)
+
+
+class UsageBatchRequest(BaseModel):
+    events: List[UsageEventBatchItem] = Field(..., min_length=1)
+
+
+class UsageIngestStatus(str, Enum):
+    accepted = "accepted"
+    duplicate = "duplicate"
+    rejected = "rejected"
+
+
+class UsageBatchItemResult(BaseModel):
+    idempotency_key: str
+    status: UsageIngestStatus
+    id: str | None = None
+    error: str | None = None
+
+
+class UsageBatchResponse(BaseModel):
+    accepted: int
+    duplicates: int
+    rejected: int
+    results: List[UsageBatchItemResult]
+
+
+class UsageImportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+class UsageImportResult(BaseModel):
+    offset: int
+    accepted: int
+    duplicates: int
+    rejected: int
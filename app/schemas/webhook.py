@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Any, Dict
+from typing import Any, Dict, List
 
 from pydantic import BaseModel
 
@@ -20,3 +20,12 @@ class WebhookDeliveryOut(BaseModel):
     attempts: int
     next_attempt_at: datetime | None = None
     last_error: str | None = None
+
+
+class WebhookReplayRequest(BaseModel):
+    # Omit to replay every dead-lettered delivery of the tenant.
+    delivery_ids: List[str] | None = None
+
+
+class WebhookReplayResponse(BaseModel):
+    replayed: int
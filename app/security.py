@@ -1,15 +1,40 @@
+import base64
+import binascii
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+import hashlib
+import hmac
+import threading
+import time
+from typing import Callable, Optional
 
 from jose import JWTError, jwt
+import orjson
 from passlib.context import CryptContext
 
+from app.api.v1.health import token_cache_hits, token_cache_misses
 from app.config import get_settings
 
-# pbkdf2 avoids bcrypt backend issues on constrained environments.
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 settings = get_settings()
 
+_HMAC_DIGESTS = {"HS256": hashlib.sha256, "HS384": hashlib.sha384, "HS512": hashlib.sha512}
+
+
+def build_password_context(scheme: str, rounds: int | None = None) -> CryptContext:
+    """Hashes with ``scheme``; hashes of any other scheme or round count verify but need an update."""
+    options = {}
+    rounds = rounds or getattr(CryptContext(schemes=[scheme]).handler(), "default_rounds", None)
+    if rounds is not None:
+        for option in ("default_rounds", "min_desired_rounds", "max_desired_rounds"):
+            options[f"{scheme}__{option}"] = rounds
+    # pbkdf2_sha256 stays listed so hashes from before a scheme change still verify.
+    schemes = [scheme] if scheme == "pbkdf2_sha256" else [scheme, "pbkdf2_sha256"]
+    return CryptContext(schemes=schemes, default=scheme, deprecated="auto", **options)
+
+
+# pbkdf2 avoids bcrypt backend issues on constrained environments.
+pwd_context = build_password_context(settings.password_hash_scheme, settings.password_hash_rounds)
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -19,15 +44,131 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    """Whether the password matches, and a new hash when the stored one uses outdated parameters."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
 def create_access_token(subject: str, tenant_id: str, expires_delta: Optional[timedelta] = None) -> str:
     expire = datetime.now(timezone.utc) + (expires_delta or timedelta(minutes=settings.access_token_expire_minutes))
     to_encode = {"sub": subject, "tenant_id": tenant_id, "exp": expire}
     return jwt.encode(to_encode, settings.jwt_secret_key, algorithm=settings.jwt_algorithm)
 
 
-def decode_token(token: str) -> Optional[dict]:
+def _b64decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def _decode_jose(token: str) -> Optional[dict]:
     try:
-        payload = jwt.decode(token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
-        return payload
+        return jwt.decode(token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
     except JWTError:
         return None
+
+
+def _decode_hmac(token: str) -> Optional[dict]:
+    """HS256/384/512 verification with the stdlib; checks the same claims jose does for our tokens."""
+    digest = _HMAC_DIGESTS[settings.jwt_algorithm]
+    try:
+        header_segment, payload_segment, signature_segment = token.split(".")
+        if orjson.loads(_b64decode(header_segment)).get("alg") != settings.jwt_algorithm:
+            return None
+        expected = hmac.new(
+            settings.jwt_secret_key.encode(), f"{header_segment}.{payload_segment}".encode(), digest
+        ).digest()
+        if not hmac.compare_digest(expected, _b64decode(signature_segment)):
+            return None
+        payload = orjson.loads(_b64decode(payload_segment))
+    except (ValueError, AttributeError, binascii.Error):
+        return None
+    if not isinstance(payload, dict):
+        return None
+    now = time.time()
+    for claim, valid in (("exp", lambda value: value > now), ("nbf", lambda value: value <= now)):
+        value = payload.get(claim)
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not valid(value):
+            return None
+    return payload
+
+
+_BACKENDS = {"jose": _decode_jose, "hmac": _decode_hmac}
+
+
+def _token_backend() -> Callable[[str], Optional[dict]]:
+    if settings.jwt_backend not in _BACKENDS:
+        raise ValueError(f"Unknown JWT backend: {settings.jwt_backend}")
+    if settings.jwt_backend == "hmac" and settings.jwt_algorithm not in _HMAC_DIGESTS:
+        raise ValueError(f"The hmac JWT backend does not support {settings.jwt_algorithm}")
+    return _BACKENDS[settings.jwt_backend]
+
+
+class TokenClaimsCache:
+    """LRU cache of verified claims keyed by a digest of the token.
+
+    An entry lives until the token's ``exp`` or ``ttl_seconds``, whichever comes first,
+    so a cached token is never accepted after it expires. Only valid tokens are cached;
+    raw tokens are never kept in memory. Returned claims are shared and must not be mutated.
+    """
+
+    def __init__(self, ttl_seconds: int, max_size: int, clock: Callable[[], float] = time.time):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._clock = clock
+        self._entries: "OrderedDict[bytes, tuple[dict, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.blake2b(token.encode(), digest_size=20).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                claims, expires_at = entry
+                if expires_at > self._clock():
+                    self._entries.move_to_end(key)
+                    token_cache_hits.inc()
+                    return claims
+                del self._entries[key]
+        token_cache_misses.inc()
+        return None
+
+    def put(self, token: str, claims: dict) -> None:
+        now = self._clock()
+        expires_at = now + self.ttl_seconds
+        exp = claims.get("exp")
+        if isinstance(exp, (int, float)):
+            expires_at = min(expires_at, exp)
+        if expires_at <= now:
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (claims, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_decode = _token_backend()
+token_cache = TokenClaimsCache(
+    ttl_seconds=settings.jwt_claims_cache_ttl_seconds, max_size=settings.jwt_claims_cache_max_size
+)
+
+
+def decode_token(token: str) -> Optional[dict]:
+    if settings.jwt_claims_cache_max_size <= 0:
+        return _decode(token)
+    claims = token_cache.get(token)
+    if claims is None:
+        claims = _decode(token)
+        if claims is not None:
+            token_cache.put(token, claims)
+    return claims
@@ -1,15 +1,18 @@
 import uuid
 
 from fastapi import HTTPException, status
+from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.domain.models import Role, Tenant, User
-from app.security import create_access_token, get_password_hash, verify_password
+from app.security import create_access_token
+from app.services.passwords import verify_password_async
 
 
 def create_tenant_with_admin(
-    db: Session, name: str, admin_email: str, admin_password: str, webhook_url: str | None = None
+    db: Session, name: str, admin_email: str, admin_password_hash: str, webhook_url: str | None = None
 ) -> tuple[Tenant, User, str]:
     # guard duplicate names early to avoid IntegrityError bubbling as 500
     existing = db.query(Tenant).filter(Tenant.name == name).first()
@@ -26,7 +29,7 @@ def create_tenant_with_admin(
     admin_user = User(
         tenant_id=tenant.id,
         email=admin_email,
-        hashed_password=get_password_hash(admin_password),
+        hashed_password=admin_password_hash,
         role=Role.admin,
     )
     db.add(admin_user)
@@ -39,12 +42,12 @@ def create_tenant_with_admin(
     return tenant, admin_user, token
 
 
-def create_user(db: Session, tenant_id: str, email: str, password: str, role: Role) -> User:
+def create_user(db: Session, tenant_id: str, email: str, password_hash: str, role: Role) -> User:
     tenant_uuid = uuid.UUID(str(tenant_id))
     user = User(
         tenant_id=tenant_uuid,
         email=email,
-        hashed_password=get_password_hash(password),
+        hashed_password=password_hash,
         role=role,
     )
     db.add(user)
@@ -52,15 +55,40 @@ def create_user(db: Session, tenant_id: str, email: str, password: str, role: Ro
     return user
 
 
-def authenticate_user(db: Session, tenant_id: str, email: str, password: str) -> str:
+async def authenticate_user_async(db: AsyncSession, tenant_id: str, email: str, password: str) -> str:
     tenant_uuid = uuid.UUID(str(tenant_id))
-    user: User | None = (
-        db.query(User)
-        .filter(User.tenant_id == tenant_uuid)
-        .filter(User.email == email)
-        .first()
-    )
-    if not user or not verify_password(password, user.hashed_password):
+    user: User | None = await db.scalar(select(User).where(User.tenant_id == tenant_uuid, User.email == email))
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect credentials")
+    # Password hashing is deliberately slow; keep it off the event loop and the threadpool.
+    valid, new_hash = await verify_password_async(password, user.hashed_password)
+    if not valid:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect credentials")
-    token = create_access_token(str(user.id), str(tenant_uuid))
-    return token
+    if new_hash is not None:
+        user.hashed_password = new_hash
+        await db.flush()
+    return create_access_token(str(user.id), str(tenant_uuid))
+
+
+def _get_tenant_user(db: Session, tenant_id: str, user_id: str) -> User:
+    try:
+        user_uuid = uuid.UUID(str(user_id))
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    user = db.query(User).filter(User.id == user_uuid, User.tenant_id == uuid.UUID(str(tenant_id))).first()
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return user
+
+
+def update_user_role(db: Session, tenant_id: str, user_id: str, role: Role) -> User:
+    user = _get_tenant_user(db, tenant_id, user_id)
+    user.role = role
+    db.flush()
+    return user
+
+
+def delete_user(db: Session, tenant_id: str, user_id: str) -> None:
+    user = _get_tenant_user(db, tenant_id, user_id)
+    db.delete(user)
+    db.flush()
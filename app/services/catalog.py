@@ -0,0 +1,242 @@
+"""Per-tenant cache of plans, products and their compiled price schedules.
+
+Every change to a plan or product bumps the tenant's version counter in Redis once its
+transaction commits (session hooks below). Each process checks that counter at most every
+``BILLING_CATALOG_CACHE_CHECK_SECONDS`` and reloads a tenant whose version moved. A plan
+or product id missing from the cached catalog also forces a reload, so a plan created in
+another process is usable immediately. Without Redis a tenant is simply reloaded on every
+check.
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from decimal import Decimal
+import threading
+import time
+from typing import Callable, cast
+import uuid
+
+from redis import Redis
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.api.v1.health import catalog_cache_lookups
+from app.config import get_settings
+from app.database import SessionLocal
+from app.domain.models import Plan, PricingModel, Product
+from app.redis_client import get_redis
+from app.services.pricing import PriceSchedule, schedule_for_plan
+
+settings = get_settings()
+
+
+@dataclass(frozen=True)
+class CatalogProduct:
+    id: uuid.UUID
+    tenant_id: uuid.UUID
+    name: str
+
+
+@dataclass(frozen=True)
+class CatalogPlan:
+    id: uuid.UUID
+    tenant_id: uuid.UUID
+    product_id: uuid.UUID
+    name: str
+    pricing_model: PricingModel
+    currency: str
+    price: Decimal
+    tiers: list | None
+    version: int
+    schedule: PriceSchedule = field(compare=False, repr=False)
+
+
+@dataclass
+class TenantCatalog:
+    version: int | None
+    plans: dict[uuid.UUID, CatalogPlan]
+    products: dict[uuid.UUID, CatalogProduct]
+    products_by_name: dict[str, CatalogProduct]
+
+
+def _catalog_plan(plan: Plan) -> CatalogPlan:
+    return CatalogPlan(
+        id=plan.id,
+        tenant_id=plan.tenant_id,
+        product_id=plan.product_id,
+        name=plan.name,
+        pricing_model=plan.pricing_model,
+        currency=plan.currency,
+        price=Decimal(str(plan.price)),
+        tiers=plan.tiers,
+        version=plan.version,
+        schedule=schedule_for_plan(plan),
+    )
+
+
+def _build(version: int | None, plans: list[Plan], products: list[Product]) -> TenantCatalog:
+    by_id = {
+        product.id: CatalogProduct(id=product.id, tenant_id=product.tenant_id, name=product.name) for product in products
+    }
+    return TenantCatalog(
+        version=version,
+        plans={plan.id: _catalog_plan(plan) for plan in plans},
+        products=by_id,
+        products_by_name={product.name: product for product in by_id.values()},
+    )
+
+
+class CatalogCache:
+    """LRU of tenant catalogs, kept coherent across processes by Redis version counters."""
+
+    def __init__(
+        self,
+        max_tenants: int,
+        check_seconds: float,
+        redis_client: Redis | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_tenants = max_tenants
+        self.check_seconds = check_seconds
+        self._redis = redis_client
+        self._clock = clock
+        self._entries: "OrderedDict[uuid.UUID, tuple[TenantCatalog, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _version_key(tenant_id: uuid.UUID) -> str:
+        return f"catalog:version:{tenant_id}"
+
+    def _version(self, tenant_id: uuid.UUID) -> int | None:
+        if self._redis is None:
+            return None
+        try:
+            return int(cast("bytes | None", self._redis.get(self._version_key(tenant_id))) or 0)
+        except Exception:
+            return None
+
+    def get(self, db: Session, tenant_id: uuid.UUID, refresh: bool = False) -> TenantCatalog:
+        tenant_id = uuid.UUID(str(tenant_id))
+        with self._lock:
+            entry = self._entries.get(tenant_id)
+            if entry is not None:
+                self._entries.move_to_end(tenant_id)
+        now = self._clock()
+        if entry is not None and not refresh:
+            catalog, checked_at = entry
+            if now - checked_at < self.check_seconds:
+                catalog_cache_lookups.labels(result="hit").inc()
+                return catalog
+            version = self._version(tenant_id)
+            if version is not None and version == catalog.version:
+                self._store(tenant_id, catalog, now)
+                catalog_cache_lookups.labels(result="hit").inc()
+                return catalog
+        catalog_cache_lookups.labels(result="miss" if entry is None else "stale").inc()
+        return self.load(db, tenant_id)
+
+    def load(self, db: Session, tenant_id: uuid.UUID) -> TenantCatalog:
+        tenant_id = uuid.UUID(str(tenant_id))
+        # Read the version before the rows: a change committed in between bumps it again.
+        version = self._version(tenant_id)
+        catalog = _build(
+            version,
+            list(db.scalars(select(Plan).where(Plan.tenant_id == tenant_id))),
+            list(db.scalars(select(Product).where(Product.tenant_id == tenant_id))),
+        )
+        self._store(tenant_id, catalog, self._clock())
+        return catalog
+
+    def plan(self, db: Session, tenant_id: uuid.UUID, plan_id: uuid.UUID) -> CatalogPlan | None:
+        try:
+            plan_id = uuid.UUID(str(plan_id))
+        except ValueError:
+            return None
+        plan = self.get(db, tenant_id).plans.get(plan_id)
+        if plan is None:
+            plan = self.get(db, tenant_id, refresh=True).plans.get(plan_id)
+        return plan
+
+    def product(self, db: Session, tenant_id: uuid.UUID, product_id: uuid.UUID) -> CatalogProduct | None:
+        try:
+            product_id = uuid.UUID(str(product_id))
+        except ValueError:
+            return None
+        product = self.get(db, tenant_id).products.get(product_id)
+        if product is None:
+            product = self.get(db, tenant_id, refresh=True).products.get(product_id)
+        return product
+
+    def product_by_name(self, db: Session, tenant_id: uuid.UUID, name: str) -> CatalogProduct | None:
+        product = self.get(db, tenant_id).products_by_name.get(name)
+        if product is None:
+            product = self.get(db, tenant_id, refresh=True).products_by_name.get(name)
+        return product
+
+    def invalidate(self, tenant_id: uuid.UUID) -> None:
+        """Drop the local entry and bump the shared version so other processes reload."""
+        tenant_id = uuid.UUID(str(tenant_id))
+        with self._lock:
+            self._entries.pop(tenant_id, None)
+        if self._redis is None:
+            return
+        try:
+            self._redis.incr(self._version_key(tenant_id))
+        except Exception:
+            pass
+
+    def warm(self, db: Session) -> int:
+        """Load the catalogs of up to ``max_tenants`` tenants in two queries; returns tenants loaded."""
+        plans: dict[uuid.UUID, list[Plan]] = {}
+        products: dict[uuid.UUID, list[Product]] = {}
+        for product in db.scalars(select(Product)):
+            products.setdefault(product.tenant_id, []).append(product)
+        for plan in db.scalars(select(Plan)):
+            plans.setdefault(plan.tenant_id, []).append(plan)
+        tenant_ids = list(products)[: self.max_tenants]
+        now = self._clock()
+        for tenant_id in tenant_ids:
+            catalog = _build(self._version(tenant_id), plans.get(tenant_id, []), products[tenant_id])
+            self._store(tenant_id, catalog, now)
+        return len(tenant_ids)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _store(self, tenant_id: uuid.UUID, catalog: TenantCatalog, checked_at: float) -> None:
+        with self._lock:
+            self._entries[tenant_id] = (catalog, checked_at)
+            self._entries.move_to_end(tenant_id)
+            while len(self._entries) > self.max_tenants:
+                self._entries.popitem(last=False)
+
+
+catalog_cache = CatalogCache(
+    max_tenants=settings.catalog_cache_max_tenants,
+    check_seconds=settings.catalog_cache_check_seconds,
+    redis_client=get_redis() if settings.catalog_cache_redis else None,
+)
+
+
+def warm_catalog_cache(session_factory=SessionLocal) -> int:
+    with session_factory() as db:
+        return catalog_cache.warm(db)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_catalog_changes(session: Session, _flush_context) -> None:
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, (Plan, Product)) and obj.tenant_id is not None:
+            session.info.setdefault("catalog_tenants", set()).add(obj.tenant_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_catalogs(session: Session) -> None:
+    for tenant_id in session.info.pop("catalog_tenants", ()):
+        catalog_cache.invalidate(tenant_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_catalog_changes(session: Session) -> None:
+    session.info.pop("catalog_tenants", None)
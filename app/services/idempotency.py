@@ -0,0 +1,172 @@
+"""Per-tenant Bloom filters in front of ``usage_idempotency_keys``.
+
+Each tenant gets one Redis bitmap per window of ``BILLING_IDEMPOTENCY_TTL_SECONDS``.
+Keys are checked against the current and previous window and added to the current
+one, so a key is remembered for at least one full window.
+
+The filters are scalable: a window starts with one generation sized for
+``BILLING_IDEMPOTENCY_BLOOM_CAPACITY`` keys. Once that many keys were added, new keys
+go to a generation twice as large with half the false-positive rate, laid out after
+the previous ones in the same bitmap. A quiet tenant costs a few KB; a busy one grows
+its filter instead of saturating it, and the overall false-positive rate stays below
+``BILLING_IDEMPOTENCY_BLOOM_ERROR_RATE``. A counter next to each bitmap records how many
+keys it holds. "Not seen" is definitive; "maybe seen" has to be confirmed against the
+database.
+"""
+
+from dataclasses import dataclass
+import hashlib
+from itertools import chain
+import math
+import time
+from typing import Callable, Sequence, cast
+import uuid
+
+from redis import Redis
+from redis import asyncio as aioredis
+
+from app.api.v1.health import idempotency_filter_fill_ratio, idempotency_filter_lookups
+from app.config import get_settings
+
+settings = get_settings()
+
+GROWTH = 2
+TIGHTENING = 0.5
+MAX_GENERATIONS = 12
+# Redis strings hold at most 512 MB, i.e. 2**32 bits.
+MAX_BITMAP_BITS = 2**32
+
+
+def bloom_parameters(capacity: int, error_rate: float) -> tuple[int, int]:
+    """Bitmap size and hash count for ``capacity`` keys at ``error_rate`` false positives."""
+    bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+    hashes = max(1, round(bits / capacity * math.log(2)))
+    return bits, hashes
+
+
+@dataclass(frozen=True)
+class Generation:
+    offset: int
+    bits: int
+    hashes: int
+    first_key: int
+    capacity: int
+
+
+class IdempotencyFilter:
+    def __init__(
+        self,
+        capacity: int,
+        error_rate: float,
+        window_seconds: int,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.window_seconds = window_seconds
+        self._clock = clock
+        self.generations: list[Generation] = []
+        offset = first_key = 0
+        for index in range(MAX_GENERATIONS):
+            size = capacity * GROWTH**index
+            bits, hashes = bloom_parameters(size, error_rate * TIGHTENING ** (index + 1))
+            if self.generations and offset + bits > MAX_BITMAP_BITS:
+                break
+            self.generations.append(Generation(offset, bits, hashes, first_key, size))
+            offset, first_key = offset + bits, first_key + size
+
+    def generation(self, count: int) -> int:
+        """Generation the ``count``-th key of a window is added to; the last one once all are full."""
+        for index, generation in enumerate(self.generations):
+            if count < generation.first_key + generation.capacity:
+                return index
+        return len(self.generations) - 1
+
+    def positions(self, idempotency_key: str, generation: int = 0) -> list[int]:
+        # Double hashing: k bit offsets derived from one 128-bit digest.
+        digest = hashlib.blake2b(idempotency_key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:], "big") | 1
+        layout = self.generations[generation]
+        return [layout.offset + (h1 + i * h2) % layout.bits for i in range(layout.hashes)]
+
+    def _filter_keys(self, tenant_id: uuid.UUID | str) -> tuple[str, str]:
+        window = int(self._clock() // self.window_seconds)
+        return f"idemp:bloom:{tenant_id}:{window}", f"idemp:bloom:{tenant_id}:{window - 1}"
+
+    @staticmethod
+    def _count_key(filter_key: str) -> str:
+        return f"{filter_key}:count"
+
+    def _queue(self, pipe, current: str, previous: str, counts: list, keys: Sequence[str]) -> list[tuple[int, int]]:
+        """Queue the lookups; returns, per key, the generations checked in the current and previous window."""
+        current_count, previous_count = (int(count or 0) for count in counts)
+        previous_generations = self.generation(max(previous_count - 1, 0))
+        checked = []
+        for i, key in enumerate(keys):
+            target = self.generation(current_count + i)
+            # Older generations are only read; SET returns the previous bit, so one command tests and adds.
+            ops: list[tuple[str | int, ...]] = [("GET", "u1", o) for g in range(target) for o in self.positions(key, g)]
+            ops += [("SET", "u1", o, 1) for o in self.positions(key, target)]
+            pipe.execute_command("BITFIELD", current, *chain.from_iterable(ops))
+            offsets = (o for g in range(previous_generations + 1) for o in self.positions(key, g))
+            pipe.execute_command("BITFIELD_RO", previous, *chain.from_iterable(("GET", "u1", o) for o in offsets))
+            checked.append((target, previous_generations))
+        pipe.incrby(self._count_key(current), len(keys))
+        pipe.expire(current, 2 * self.window_seconds)
+        pipe.expire(self._count_key(current), 2 * self.window_seconds)
+        target = self.generation(current_count + len(keys) - 1)
+        layout = self.generations[target]
+        idempotency_filter_fill_ratio.observe((current_count + len(keys) - layout.first_key) / layout.capacity)
+        return checked
+
+    def _seen_in(self, bits: list, last_generation: int) -> bool:
+        start = 0
+        for g in range(last_generation + 1):
+            hashes = self.generations[g].hashes
+            if all(bits[start : start + hashes]):
+                return True
+            start += hashes
+        return False
+
+    def _maybe_seen(self, replies: list, checked: list[tuple[int, int]]) -> list[bool]:
+        return [
+            self._seen_in(replies[2 * i], target) or self._seen_in(replies[2 * i + 1], previous)
+            for i, (target, previous) in enumerate(checked)
+        ]
+
+    def check_and_add(self, redis_client: Redis, tenant_id: uuid.UUID | str, keys: Sequence[str]) -> list[bool]:
+        """Add ``keys`` to the tenant's filter; returns True for each key that may have been seen before."""
+        if not keys:
+            return []
+        current, previous = self._filter_keys(tenant_id)
+        counts = cast(list, redis_client.mget(self._count_key(current), self._count_key(previous)))
+        pipe = redis_client.pipeline(transaction=False)
+        checked = self._queue(pipe, current, previous, counts, keys)
+        return self._maybe_seen(pipe.execute(), checked)
+
+    async def check_and_add_async(
+        self, redis_client: aioredis.Redis, tenant_id: uuid.UUID | str, keys: Sequence[str]
+    ) -> list[bool]:
+        if not keys:
+            return []
+        current, previous = self._filter_keys(tenant_id)
+        counts = await redis_client.mget(self._count_key(current), self._count_key(previous))
+        pipe = redis_client.pipeline(transaction=False)
+        checked = self._queue(pipe, current, previous, counts, keys)
+        return self._maybe_seen(await pipe.execute(), checked)
+
+
+def record_lookups(maybe_seen: int, duplicates: int, new: int) -> None:
+    """Export filter outcomes; ``maybe_seen - duplicates`` are false positives."""
+    if duplicates:
+        idempotency_filter_lookups.labels("duplicate").inc(duplicates)
+    if maybe_seen > duplicates:
+        idempotency_filter_lookups.labels("false_positive").inc(maybe_seen - duplicates)
+    if new:
+        idempotency_filter_lookups.labels("new").inc(new)
+
+
+idempotency_filter = IdempotencyFilter(
+    capacity=settings.idempotency_bloom_capacity,
+    error_rate=settings.idempotency_bloom_error_rate,
+    window_seconds=settings.idempotency_ttl_seconds,
+)
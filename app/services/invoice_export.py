@@ -0,0 +1,166 @@
+"""Constant-memory invoice streams for the invoice run and export endpoints.
+
+Invoices are read in batches (``yield_per``: a server-side cursor on PostgreSQL) with
+their items loaded by one ``selectinload`` query per batch. Each batch is expunged once
+written, and encoders yield buffered chunks of JSON, NDJSON or CSV, so neither the
+session nor the response holds more than one batch at a time.
+"""
+
+import csv
+import io
+from datetime import datetime
+from typing import Iterable, Iterator, Sequence
+import uuid
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
+
+from app.api.responses import dumps
+from app.config import get_settings
+from app.domain.models import Invoice, InvoiceStatus
+from app.schemas.invoice import InvoiceExportFormat
+
+settings = get_settings()
+
+CSV_COLUMNS = (
+    "invoice_id",
+    "subscription_id",
+    "status",
+    "currency",
+    "period_start",
+    "period_end",
+    "total",
+    "item_id",
+    "description",
+    "quantity",
+    "unit_amount",
+    "amount",
+)
+MEDIA_TYPES = {
+    InvoiceExportFormat.json: "application/json",
+    InvoiceExportFormat.ndjson: "application/x-ndjson",
+    InvoiceExportFormat.csv: "text/csv",
+}
+FLUSH_BYTES = 64 * 1024
+
+
+def invoice_record(inv: Invoice) -> dict:
+    return {
+        "id": inv.id,
+        "total": inv.total,
+        "currency": inv.currency,
+        "period_start": inv.period_start,
+        "period_end": inv.period_end,
+        "status": inv.status,
+        "items": [
+            {
+                "id": item.id,
+                "description": item.description,
+                "quantity": item.quantity,
+                "unit_amount": item.unit_amount,
+                "amount": item.amount,
+            }
+            for item in inv.items
+        ],
+    }
+
+
+def iter_invoices_by_id(
+    db: Session, invoice_ids: Sequence[uuid.UUID], batch_size: int | None = None
+) -> Iterator[Invoice]:
+    """Invoices in ``invoice_ids`` order, one batch in the session at a time."""
+    batch_size = batch_size or settings.invoice_chunk_size
+    for offset in range(0, len(invoice_ids), batch_size):
+        batch = invoice_ids[offset : offset + batch_size]
+        loaded = {
+            inv.id: inv
+            for inv in db.scalars(select(Invoice).options(selectinload(Invoice.items)).where(Invoice.id.in_(batch)))
+        }
+        yield from (loaded[invoice_id] for invoice_id in batch if invoice_id in loaded)
+        db.expunge_all()
+
+
+def iter_tenant_invoices(
+    db: Session,
+    tenant_id: str,
+    status: InvoiceStatus | None = None,
+    subscription_id: str | None = None,
+    period_from: datetime | None = None,
+    period_to: datetime | None = None,
+    batch_size: int | None = None,
+) -> Iterator[Invoice]:
+    """Every matching invoice of a tenant, newest first, streamed from a server-side cursor."""
+    query = select(Invoice).where(Invoice.tenant_id == uuid.UUID(str(tenant_id)))
+    if status is not None:
+        query = query.where(Invoice.status == status)
+    if subscription_id is not None:
+        query = query.where(Invoice.subscription_id == uuid.UUID(str(subscription_id)))
+    if period_from is not None:
+        query = query.where(Invoice.period_start >= period_from)
+    if period_to is not None:
+        query = query.where(Invoice.period_end <= period_to)
+    query = (
+        query.options(selectinload(Invoice.items))
+        .order_by(Invoice.created_at.desc(), Invoice.id.desc())
+        .execution_options(yield_per=batch_size or settings.invoice_chunk_size)
+    )
+    for partition in db.scalars(query).partitions():
+        yield from partition
+        # Per object: expunge_all() would swap out the identity map the open cursor still uses.
+        for inv in partition:
+            db.expunge(inv)
+
+
+def _buffered(pieces: Iterable[bytes]) -> Iterator[bytes]:
+    buffer = bytearray()
+    for piece in pieces:
+        buffer += piece
+        if len(buffer) >= FLUSH_BYTES:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def _json_array(invoices: Iterable[Invoice]) -> Iterator[bytes]:
+    separator = b"["
+    for inv in invoices:
+        yield separator + dumps(invoice_record(inv))
+        separator = b","
+    yield b"[]" if separator == b"[" else b"]"
+
+
+def _ndjson(invoices: Iterable[Invoice]) -> Iterator[bytes]:
+    for inv in invoices:
+        yield dumps(invoice_record(inv)) + b"\n"
+
+
+def _csv(invoices: Iterable[Invoice]) -> Iterator[bytes]:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(CSV_COLUMNS)
+    for inv in invoices:
+        head = [
+            inv.id,
+            inv.subscription_id or "",
+            inv.status.value,
+            inv.currency,
+            inv.period_start.isoformat(),
+            inv.period_end.isoformat(),
+            inv.total,
+        ]
+        # One row per line item; an invoice without items still gets a row.
+        tails = [[item.id, item.description, item.quantity, item.unit_amount, item.amount] for item in inv.items]
+        for tail in tails or [[""] * 5]:
+            writer.writerow(head + tail)
+        yield out.getvalue().encode()
+        out.seek(0)
+        out.truncate()
+
+
+def encode_invoices(invoices: Iterable[Invoice], fmt: InvoiceExportFormat) -> Iterator[bytes]:
+    if fmt == InvoiceExportFormat.csv:
+        return _buffered(_csv(invoices))
+    if fmt == InvoiceExportFormat.ndjson:
+        return _buffered(_ndjson(invoices))
+    return _buffered(_json_array(invoices))
@@ -0,0 +1,94 @@
+"""Progress tracking for fanned-out invoice runs.
+
+A run is a Redis hash ``invoice_run:{run_id}`` plus the sets of chunks that reported and
+tenants it touched. The coordinator records how many chunk jobs it enqueued; every chunk
+job adds its id to the run's chunk set, and the first report that fills the set tells its
+job to enqueue the reducer. A chunk that reports again (a retried or re-run job) changes
+nothing, so counters stay exact and the reducer is enqueued once.
+"""
+
+from datetime import datetime, timezone
+from typing import cast
+import uuid
+
+from redis import Redis
+
+RUN_TTL_SECONDS = 7 * 24 * 60 * 60
+
+
+def run_key(run_id: str) -> str:
+    return f"invoice_run:{run_id}"
+
+
+def _tenants_key(run_id: str) -> str:
+    return f"invoice_run:{run_id}:tenants"
+
+
+def _chunks_key(run_id: str) -> str:
+    return f"invoice_run:{run_id}:chunks"
+
+
+def start_run(redis_client: Redis, cutoff: datetime, chunks: int, subscriptions: int) -> str:
+    run_id = uuid.uuid4().hex
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.hset(
+        run_key(run_id),
+        mapping={
+            "status": "running" if chunks else "finished",
+            "cutoff": cutoff.isoformat(),
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "chunks_total": chunks,
+            "chunks_done": 0,
+            "chunks_failed": 0,
+            "subscriptions_due": subscriptions,
+            "invoices": 0,
+        },
+    )
+    pipe.expire(run_key(run_id), RUN_TTL_SECONDS)
+    pipe.execute()
+    return run_id
+
+
+def record_chunk(redis_client: Redis, run_id: str, chunk_id: str, tenant_id: str, invoices: int | None) -> bool:
+    """Record chunk ``chunk_id`` as finished (``invoices`` None if it failed).
+
+    Only the first report of a chunk counts. True if that report completed the run.
+    """
+    key = run_key(run_id)
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.sadd(_chunks_key(run_id), chunk_id)
+    pipe.expire(_chunks_key(run_id), RUN_TTL_SECONDS)
+    pipe.scard(_chunks_key(run_id))
+    pipe.hget(key, "chunks_total")
+    added, _, finished, total = pipe.execute()
+    if not added:
+        return False
+    pipe = redis_client.pipeline(transaction=True)
+    if invoices is None:
+        pipe.hincrby(key, "chunks_failed", 1)
+    else:
+        pipe.hincrby(key, "chunks_done", 1)
+        pipe.hincrby(key, "invoices", invoices)
+        pipe.sadd(_tenants_key(run_id), str(tenant_id))
+        pipe.expire(_tenants_key(run_id), RUN_TTL_SECONDS)
+    pipe.execute()
+    return finished == int(total or 0)
+
+
+def run_tenants(redis_client: Redis, run_id: str) -> list[str]:
+    members = cast(set, redis_client.smembers(_tenants_key(run_id)))
+    return sorted(member.decode() if isinstance(member, bytes) else member for member in members)
+
+
+def finish_run(redis_client: Redis, run_id: str) -> None:
+    redis_client.hset(
+        run_key(run_id), mapping={"status": "finished", "finished_at": datetime.now(timezone.utc).isoformat()}
+    )
+
+
+def run_progress(redis_client: Redis, run_id: str) -> dict[str, str]:
+    raw = cast(dict, redis_client.hgetall(run_key(run_id)))
+    return {
+        (name.decode() if isinstance(name, bytes) else name): (value.decode() if isinstance(value, bytes) else value)
+        for name, value in raw.items()
+    }
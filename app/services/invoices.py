@@ -1,10 +1,16 @@
-from datetime import timedelta
+import base64
+import binascii
+from datetime import datetime, timedelta
 from decimal import Decimal
-from typing import List
+from typing import List, Sequence
+import uuid
 
-from sqlalchemy import func
-from sqlalchemy.orm import Session
+import structlog
+from sqlalchemy import func, insert, literal, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
 
+from app.config import get_settings
 from app.domain.models import (
     Invoice,
     InvoiceItem,
@@ -12,29 +18,31 @@ from app.domain.models import (
     PricingModel,
     Subscription,
     SubscriptionStatus,
-    TenantRevenueMV,
-    UsageEvent,
 )
-from app.services.pricing import calculate_flat, calculate_tiered, calculate_volume
+from app.services.catalog import CatalogPlan, catalog_cache
+from app.services.revenue import apply_revenue_delta, counts_as_revenue
+from app.services.rollups import usage_totals
 from app.api.v1.health import invoice_generation_duration
 
+settings = get_settings()
+logger = structlog.get_logger()
 
-def _invoice_amount(plan, subscription: Subscription, usage_quantity: Decimal) -> Decimal:
+
+def _invoice_amount(plan: CatalogPlan, subscription: Subscription, usage_quantity: Decimal) -> Decimal:
     if plan.pricing_model == PricingModel.flat:
-        return calculate_flat(plan.price, subscription.quantity)
-    if plan.pricing_model == PricingModel.tiered:
-        return calculate_tiered(plan.tiers or [], usage_quantity)
-    return calculate_volume(plan.tiers or [], usage_quantity)
+        return plan.schedule.price(subscription.quantity)
+    return plan.schedule.price(usage_quantity)
 
 
 def generate_invoice_for_subscription(db: Session, subscription: Subscription) -> Invoice:
-    plan = subscription.plan
-    usage_quantity = db.query(func.coalesce(func.sum(UsageEvent.quantity), 0)).filter(
-        UsageEvent.subscription_id == subscription.id,
-        UsageEvent.ts >= subscription.current_period_start,
-        UsageEvent.ts < subscription.current_period_end,
-    ).scalar()
-    usage_quantity = Decimal(str(usage_quantity or 0))
+    plan = catalog_cache.plan(db, subscription.tenant_id, subscription.plan_id)
+    if plan is None:
+        raise ValueError("Plan not found for tenant")
+    usage_quantity = usage_totals(
+        db,
+        subscription.tenant_id,
+        [(subscription.id, subscription.current_period_start, subscription.current_period_end)],
+    ).get(subscription.id, Decimal("0"))
     amount = _invoice_amount(plan, subscription, usage_quantity)
 
     invoice = Invoice(
@@ -61,40 +69,237 @@ def generate_invoice_for_subscription(db: Session, subscription: Subscription) -
     subscription.current_period_end = subscription.current_period_end + timedelta(days=30)
     subscription.needs_proration = False
     db.add(subscription)
-    _refresh_revenue_mv(db, subscription.tenant_id)
+    apply_revenue_delta(db, subscription.tenant_id, invoiced_delta=amount)
     return invoice
 
 
-def run_invoicing(db: Session, tenant_id: str) -> List[Invoice]:
+def _invoice_subscriptions(
+    db: Session, tenant_uuid: uuid.UUID, subscriptions: Sequence[Subscription], chunk_size: int
+) -> tuple[List[uuid.UUID], Decimal]:
+    invoice_ids: List[uuid.UUID] = []
+    invoiced = Decimal("0")
+    plans = catalog_cache.get(db, tenant_uuid).plans
+    for offset in range(0, len(subscriptions), chunk_size):
+        chunk = subscriptions[offset : offset + chunk_size]
+        usage = usage_totals(
+            db, tenant_uuid, [(sub.id, sub.current_period_start, sub.current_period_end) for sub in chunk]
+        )
+        invoice_rows: list[dict] = []
+        item_rows: list[dict] = []
+        for sub in chunk:
+            plan = plans.get(sub.plan_id) or catalog_cache.plan(db, tenant_uuid, sub.plan_id)
+            if plan is None:
+                # Left due, so the next run picks it up once the plan is back.
+                logger.warning("invoice_plan_missing", subscription_id=str(sub.id), plan_id=str(sub.plan_id))
+                continue
+            amount = _invoice_amount(plan, sub, usage.get(sub.id, Decimal("0")))
+            invoice_id = uuid.uuid4()
+            invoice_rows.append(
+                {
+                    "id": invoice_id,
+                    "tenant_id": sub.tenant_id,
+                    "subscription_id": sub.id,
+                    "currency": plan.currency,
+                    "period_start": sub.current_period_start,
+                    "period_end": sub.current_period_end,
+                    "total": amount,
+                    "status": InvoiceStatus.sent,
+                }
+            )
+            item_rows.append(
+                {
+                    "id": uuid.uuid4(),
+                    "invoice_id": invoice_id,
+                    "description": f"{plan.name} ({plan.pricing_model})",
+                    "quantity": int(sub.quantity),
+                    "unit_amount": plan.price,
+                    "amount": amount,
+                }
+            )
+            invoice_ids.append(invoice_id)
+            invoiced += amount
+            sub.current_period_start = sub.current_period_end
+            sub.current_period_end = sub.current_period_end + timedelta(days=30)
+            sub.needs_proration = False
+        if invoice_rows:
+            db.execute(insert(Invoice), invoice_rows)
+            db.execute(insert(InvoiceItem), item_rows)
+        # Flushes the rolled-forward subscriptions as one batched UPDATE.
+        db.flush()
+    return invoice_ids, invoiced
+
+
+def run_invoicing_bulk(db: Session, tenant_id: str, chunk_size: int | None = None) -> List[uuid.UUID]:
+    """Invoice every active subscription of a tenant with set-based queries.
+
+    Subscriptions are fetched in one query and plans come from the catalog cache; per
+    chunk, usage is summed with one grouped query, priced in memory and written with
+    bulk inserts. Produces the same invoices as calling generate_invoice_for_subscription
+    per subscription.
+    """
+    tenant_uuid = uuid.UUID(str(tenant_id))
     with invoice_generation_duration.time():
-        active_subs = (
-            db.query(Subscription)
-            .filter(Subscription.tenant_id == tenant_id)
-            .filter(Subscription.status == SubscriptionStatus.active)
+        subscriptions = (
+            db.execute(
+                select(Subscription)
+                .where(Subscription.tenant_id == tenant_uuid, Subscription.status == SubscriptionStatus.active)
+                .order_by(Subscription.id)
+            )
+            .scalars()
             .all()
         )
-        invoices: List[Invoice] = []
-        for sub in active_subs:
-            invoices.append(generate_invoice_for_subscription(db, sub))
-        return invoices
+        invoice_ids, invoiced = _invoice_subscriptions(
+            db, tenant_uuid, subscriptions, chunk_size or settings.invoice_chunk_size
+        )
+        apply_revenue_delta(db, tenant_uuid, invoiced_delta=invoiced)
+    return invoice_ids
 
 
-def _refresh_revenue_mv(db: Session, tenant_id: str) -> None:
-    total_mrr = (
-        db.query(func.coalesce(func.sum(Invoice.total), 0))
-        .filter(Invoice.tenant_id == tenant_id, Invoice.status.in_([InvoiceStatus.sent, InvoiceStatus.paid]))
-        .scalar()
+def due_subscription_ranges(
+    db: Session, cutoff: datetime, chunk_size: int
+) -> List[tuple[uuid.UUID, uuid.UUID, uuid.UUID | None, int]]:
+    """Split active subscriptions whose period ended by ``cutoff`` into per-tenant id ranges.
+
+    Returns ``(tenant_id, first_id, end_id, count)``: ids in ``[first_id, end_id)`` (``end_id``
+    None for a tenant's last range), at most ``chunk_size`` subscriptions per range.
+    Ranges never span tenants.
+    """
+    position = func.row_number().over(partition_by=Subscription.tenant_id, order_by=Subscription.id)
+    due = (
+        select(
+            Subscription.tenant_id,
+            Subscription.id,
+            position.label("position"),
+            func.count().over(partition_by=Subscription.tenant_id).label("due"),
+        )
+        .where(Subscription.status == SubscriptionStatus.active, Subscription.current_period_end <= cutoff)
+        .subquery()
     )
-    annual = Decimal(str(total_mrr)) * Decimal("12")
-    mv = db.query(TenantRevenueMV).filter(TenantRevenueMV.tenant_id == tenant_id).first()
-    if mv is None:
-        mv = TenantRevenueMV(
-            tenant_id=tenant_id,
-            monthly_recurring_revenue=total_mrr,
-            annual_run_rate=annual,
+    starts = db.execute(
+        select(due.c.tenant_id, due.c.id, due.c.position, due.c.due)
+        .where((due.c.position - 1) % chunk_size == 0)
+        .order_by(due.c.tenant_id, due.c.id)
+    ).all()
+    ranges = []
+    for i, (tenant_id, first_id, position, due_count) in enumerate(starts):
+        last_of_tenant = i + 1 == len(starts) or starts[i + 1][0] != tenant_id
+        end_id = None if last_of_tenant else uuid.UUID(str(starts[i + 1][1]))
+        count = min(chunk_size, due_count - position + 1)
+        ranges.append((uuid.UUID(str(tenant_id)), uuid.UUID(str(first_id)), end_id, count))
+    return ranges
+
+
+def invoice_due_range(
+    db: Session,
+    tenant_id: str,
+    first_id: str,
+    end_id: str | None,
+    cutoff: datetime,
+    chunk_size: int | None = None,
+) -> List[uuid.UUID]:
+    """Invoice the due subscriptions of one tenant with ids in ``[first_id, end_id)``.
+
+    Rows are locked with ``SKIP LOCKED`` and re-checked against ``cutoff``, so running
+    a range twice (a retried job, overlapping runs) does not bill a period twice.
+    Revenue metrics are left to the caller.
+    """
+    tenant_uuid = uuid.UUID(str(tenant_id))
+    query = select(Subscription).where(
+        Subscription.tenant_id == tenant_uuid,
+        Subscription.id >= uuid.UUID(str(first_id)),
+        Subscription.status == SubscriptionStatus.active,
+        Subscription.current_period_end <= cutoff,
+    )
+    if end_id is not None:
+        query = query.where(Subscription.id < uuid.UUID(str(end_id)))
+    subscriptions = (
+        db.execute(
+            query.order_by(Subscription.id)
+            .with_for_update(skip_locked=True, of=Subscription)
+        )
+        .scalars()
+        .all()
+    )
+    invoice_ids, _ = _invoice_subscriptions(db, tenant_uuid, subscriptions, chunk_size or settings.invoice_chunk_size)
+    return invoice_ids
+
+
+def load_invoices(db: Session, invoice_ids: List[uuid.UUID]) -> List[Invoice]:
+    invoices: List[Invoice] = []
+    for offset in range(0, len(invoice_ids), settings.invoice_chunk_size):
+        invoices.extend(
+            db.execute(
+                select(Invoice)
+                .options(selectinload(Invoice.items))
+                .where(Invoice.id.in_(invoice_ids[offset : offset + settings.invoice_chunk_size]))
+            ).scalars()
         )
-    else:
-        mv.monthly_recurring_revenue = total_mrr
-        mv.annual_run_rate = annual
-    db.add(mv)
+    order = {invoice_id: position for position, invoice_id in enumerate(invoice_ids)}
+    return sorted(invoices, key=lambda inv: order[inv.id])
+
+
+def run_invoicing(db: Session, tenant_id: str) -> List[Invoice]:
+    return load_invoices(db, run_invoicing_bulk(db, tenant_id))
+
+
+def encode_invoice_cursor(invoice: Invoice) -> str:
+    raw = f"{invoice.created_at.isoformat()}|{invoice.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_invoice_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    """Inverse of encode_invoice_cursor; raises ValueError for anything it did not produce."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, invoice_id = raw.split("|")
+        return datetime.fromisoformat(created_at), uuid.UUID(invoice_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+async def list_invoices_async(
+    db: AsyncSession,
+    tenant_id: str,
+    limit: int = 50,
+    after: tuple[datetime, uuid.UUID] | None = None,
+    status: InvoiceStatus | None = None,
+    subscription_id: uuid.UUID | None = None,
+    period_from: datetime | None = None,
+    period_to: datetime | None = None,
+) -> List[Invoice]:
+    """Newest invoices first, continuing after the ``(created_at, id)`` of ``after``.
+
+    Seeks on ``ix_invoices_tenant_created`` instead of counting past an OFFSET, so every
+    page costs the same however deep it is.
+    """
+    query = select(Invoice).where(Invoice.tenant_id == uuid.UUID(str(tenant_id)))
+    if after is not None:
+        created_at, invoice_id = after
+        query = query.where(
+            tuple_(Invoice.created_at, Invoice.id)
+            < tuple_(literal(created_at, Invoice.created_at.type), literal(invoice_id, Invoice.id.type))
+        )
+    if status is not None:
+        query = query.where(Invoice.status == status)
+    if subscription_id is not None:
+        query = query.where(Invoice.subscription_id == subscription_id)
+    if period_from is not None:
+        query = query.where(Invoice.period_start >= period_from)
+    if period_to is not None:
+        query = query.where(Invoice.period_end <= period_to)
+    result = await db.scalars(
+        query.options(selectinload(Invoice.items)).order_by(Invoice.created_at.desc(), Invoice.id.desc()).limit(limit)
+    )
+    return list(result)
+
+
+def update_invoice_status(db: Session, invoice: Invoice, new_status: InvoiceStatus) -> Invoice:
+    was_revenue = counts_as_revenue(invoice.status)
+    is_revenue = counts_as_revenue(new_status)
+    invoice.status = new_status
+    db.add(invoice)
     db.flush()
+    if was_revenue != is_revenue:
+        delta = Decimal(str(invoice.total))
+        apply_revenue_delta(db, invoice.tenant_id, invoiced_delta=delta if is_revenue else -delta)
+    return invoice
@@ -0,0 +1,60 @@
+"""Password hashing off the request threads.
+
+Hashing is deliberately CPU-heavy. Run on the request threadpool, a burst of logins
+occupies every worker thread and stalls unrelated endpoints; here it goes to a bounded
+process pool instead, so at most ``password_hash_workers`` cores hash at once and the
+event loop only awaits a future. Endpoints that hash are async for that reason.
+"""
+
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor
+import multiprocessing
+import threading
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import get_settings
+from app.security import get_password_hash, verify_and_update_password
+
+settings = get_settings()
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def get_password_pool() -> Executor | None:
+    """The shared hashing pool, started on first use; None when hashing runs inline."""
+    global _pool
+    if settings.password_hash_workers <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a process with live connection pools and threads is unsafe.
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.password_hash_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+
+def shutdown_password_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+async def hash_password_async(password: str) -> str:
+    pool = get_password_pool()
+    if pool is None:
+        return await run_in_threadpool(get_password_hash, password)
+    return await asyncio.get_running_loop().run_in_executor(pool, get_password_hash, password)
+
+
+async def verify_password_async(password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    """``(matches, new_hash)``; ``new_hash`` is set when the stored hash uses outdated parameters."""
+    pool = get_password_pool()
+    if pool is None:
+        return await run_in_threadpool(verify_and_update_password, password, hashed_password)
+    return await asyncio.get_running_loop().run_in_executor(pool, verify_and_update_password, password, hashed_password)
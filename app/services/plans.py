@@ -1,18 +1,18 @@
+import uuid
+
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from app.domain.models import Plan, PricingModel, Product
+from app.services.catalog import CatalogProduct, catalog_cache
 
 
-def get_or_create_product(db: Session, tenant_id: str, name: str, description: str | None = None) -> Product:
-    product = (
-        db.query(Product)
-        .filter(Product.tenant_id == tenant_id)
-        .filter(Product.name == name)
-        .first()
-    )
-    if product:
-        return product
+def get_or_create_product(
+    db: Session, tenant_id: str, name: str, description: str | None = None
+) -> CatalogProduct | Product:
+    cached = catalog_cache.product_by_name(db, uuid.UUID(str(tenant_id)), name)
+    if cached:
+        return cached
     product = Product(tenant_id=tenant_id, name=name, description=description)
     db.add(product)
     db.flush()
@@ -30,12 +30,12 @@ def create_plan(
     product_id: str | None = None,
     product_name: str | None = None,
 ) -> Plan:
+    product: CatalogProduct | Product | None
     if product_id:
-        product = (
-            db.query(Product)
-            .filter(Product.id == product_id, Product.tenant_id == tenant_id)
-            .first()
-        )
+        try:
+            product = catalog_cache.product(db, uuid.UUID(str(tenant_id)), uuid.UUID(str(product_id)))
+        except ValueError:
+            product = None
     elif product_name:
         product = get_or_create_product(db, tenant_id=tenant_id, name=product_name)
     else:
@@ -1,5 +1,17 @@
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections import OrderedDict
 from decimal import Decimal, ROUND_HALF_UP
-from typing import List, Optional
+import threading
+from typing import Iterable, List, Optional
+import uuid
+
+from app.domain.models import Plan, PricingModel
+
+SCHEDULE_CACHE_SIZE = 1024
+
+_schedule_cache: "OrderedDict[tuple[uuid.UUID, int], PriceSchedule]" = OrderedDict()
+_schedule_cache_lock = threading.Lock()
 
 
 def _to_decimal(value) -> Decimal:
@@ -45,3 +57,158 @@ def calculate_volume(tiers: List[dict], quantity: int | float) -> Decimal:
         applicable = tiers[-1]
     total = qty * _to_decimal(applicable["unit_amount"])
     return _round_currency(total)
+
+
+def _sorted_tiers(tiers: List[dict]) -> List[dict]:
+    return sorted(tiers, key=lambda t: t.get("up_to") or float("inf"))
+
+
+class PriceSchedule(ABC):
+    """A plan's pricing compiled once: Decimal caps and unit amounts, sorted up front.
+
+    ``price`` matches ``calculate_flat``/``calculate_tiered``/``calculate_volume`` for
+    the same inputs, including their handling of uncapped and zero-capped tiers.
+    """
+
+    __slots__ = ()
+
+    @abstractmethod
+    def price(self, quantity: int | float | Decimal) -> Decimal:
+        """Amount billed for ``quantity`` units, rounded to the cent."""
+
+    def price_many(self, quantities: Iterable[int | float | Decimal]) -> List[Decimal]:
+        price = self.price
+        return [price(quantity) for quantity in quantities]
+
+
+class FlatSchedule(PriceSchedule):
+    __slots__ = ("_price",)
+
+    def __init__(self, price: float | Decimal):
+        self._price = _to_decimal(price)
+
+    def price(self, quantity: int | float | Decimal) -> Decimal:
+        return _round_currency(self._price * _to_decimal(quantity))
+
+
+class TieredSchedule(PriceSchedule):
+    # Each tier that can bill units is stored as the cumulative units where it starts and
+    # ends plus the amount billed by all tiers before it, so a total is one bisect away.
+    __slots__ = ("_starts", "_ends", "_unit_amounts", "_amounts_before", "_capped_units", "_capped_amount", "_overflow")
+
+    def __init__(self, tiers: List[dict]):
+        starts: List[Decimal] = []
+        ends: List[Decimal] = []
+        unit_amounts: List[Decimal] = []
+        amounts_before: List[Decimal] = []
+        consumed = Decimal("0")
+        total = Decimal("0")
+        previous_cap = Decimal("0")
+        overflow: Optional[Decimal] = None
+        for tier in _sorted_tiers(tiers):
+            if not tier.get("up_to"):
+                # The first uncapped tier bills everything past the caps; later ones never apply.
+                overflow = _to_decimal(tier["unit_amount"])
+                break
+            cap = _to_decimal(tier["up_to"])
+            width = cap - previous_cap
+            previous_cap = cap
+            if width <= 0:
+                continue
+            unit_amount = _to_decimal(tier["unit_amount"])
+            starts.append(consumed)
+            ends.append(consumed + width)
+            unit_amounts.append(unit_amount)
+            amounts_before.append(total)
+            total += width * unit_amount
+            consumed += width
+        self._starts = tuple(starts)
+        self._ends = tuple(ends)
+        self._unit_amounts = tuple(unit_amounts)
+        self._amounts_before = tuple(amounts_before)
+        self._capped_units = consumed
+        self._capped_amount = total
+        self._overflow = overflow
+
+    def price(self, quantity: int | float | Decimal) -> Decimal:
+        qty = _to_decimal(quantity)
+        if qty <= 0:
+            return _round_currency(Decimal("0"))
+        index = bisect_left(self._ends, qty)
+        if index < len(self._ends):
+            total = self._amounts_before[index] + (qty - self._starts[index]) * self._unit_amounts[index]
+        elif self._overflow is not None:
+            total = self._capped_amount + (qty - self._capped_units) * self._overflow
+        else:
+            total = self._capped_amount
+        return _round_currency(total)
+
+
+class VolumeSchedule(PriceSchedule):
+    __slots__ = ("_caps", "_unit_amounts", "_uncapped", "_first_tail", "_fallback")
+
+    def __init__(self, tiers: List[dict]):
+        caps: List[Decimal] = []
+        unit_amounts: List[Decimal] = []
+        tail: List[dict] = []
+        for tier in _sorted_tiers(tiers):
+            if tier.get("up_to"):
+                caps.append(_to_decimal(tier["up_to"]))
+                unit_amounts.append(_to_decimal(tier["unit_amount"]))
+            else:
+                tail.append(tier)
+        uncapped = next((t for t in tail if t.get("up_to") is None), None)
+        self._caps = tuple(caps)
+        self._unit_amounts = tuple(unit_amounts)
+        # Tiers without a truthy cap sort last: an uncapped one applies to any quantity,
+        # a zero cap only to quantities <= 0. With no match the unsorted last tier applies.
+        self._uncapped = _to_decimal(uncapped["unit_amount"]) if uncapped else None
+        self._first_tail = _to_decimal(tail[0]["unit_amount"]) if tail else None
+        self._fallback = _to_decimal(tiers[-1]["unit_amount"]) if tiers else None
+
+    def price(self, quantity: int | float | Decimal) -> Decimal:
+        qty = _to_decimal(quantity)
+        index = bisect_left(self._caps, qty)
+        if index < len(self._caps):
+            return _round_currency(qty * self._unit_amounts[index])
+        unit_amount = self._first_tail if qty <= 0 else self._uncapped
+        if unit_amount is None:
+            unit_amount = self._fallback
+        if unit_amount is None:
+            raise IndexError("Volume pricing requires at least one tier")
+        return _round_currency(qty * unit_amount)
+
+
+def compile_schedule(
+    pricing_model: PricingModel | str,
+    price: float | Decimal = 0,
+    tiers: List[dict] | None = None,
+) -> PriceSchedule:
+    if pricing_model == PricingModel.flat:
+        return FlatSchedule(price)
+    if pricing_model == PricingModel.tiered:
+        return TieredSchedule(tiers or [])
+    return VolumeSchedule(tiers or [])
+
+
+def schedule_for_plan(plan: Plan) -> PriceSchedule:
+    """Compiled schedule for ``plan``, cached per (plan id, version)."""
+    if plan.id is None or plan.version is None:
+        return compile_schedule(plan.pricing_model, plan.price, plan.tiers)
+    key = (plan.id, plan.version)
+    with _schedule_cache_lock:
+        schedule = _schedule_cache.get(key)
+        if schedule is not None:
+            _schedule_cache.move_to_end(key)
+            return schedule
+    schedule = compile_schedule(plan.pricing_model, plan.price, plan.tiers)
+    with _schedule_cache_lock:
+        _schedule_cache[key] = schedule
+        while len(_schedule_cache) > SCHEDULE_CACHE_SIZE:
+            _schedule_cache.popitem(last=False)
+    return schedule
+
+
+def clear_schedule_cache() -> None:
+    with _schedule_cache_lock:
+        _schedule_cache.clear()
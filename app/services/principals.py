@@ -0,0 +1,182 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+import json
+import threading
+import time
+from typing import Callable, cast
+import uuid
+
+from redis import Redis
+from sqlalchemy.orm import Session
+
+from app.api.v1.health import principal_cache_hits, principal_cache_misses
+from app.config import get_settings
+from app.domain.models import Role, User
+from app.redis_client import get_redis
+
+settings = get_settings()
+
+
+@dataclass(frozen=True)
+class Principal:
+    id: uuid.UUID
+    tenant_id: uuid.UUID
+    role: Role
+
+
+class PrincipalCache:
+    """TTL/LRU cache of principals by user id, kept coherent across processes by Redis.
+
+    ``invalidate`` bumps the user's version counter in Redis. A cached principal re-checks
+    that counter at most every ``check_seconds`` and is dropped once it moved, so a role
+    change reaches every process within that interval. With ``shared`` set, principals are
+    also stored in Redis for other processes, tagged with the version they were loaded at.
+    If Redis cannot be read, a cached principal is reloaded on every check.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: int,
+        max_size: int,
+        check_seconds: float,
+        redis_client: Redis | None = None,
+        shared: bool = False,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self.check_seconds = check_seconds
+        self._redis = redis_client
+        # Where principals are shared with other processes; None unless ``shared``.
+        self._shared = redis_client if shared else None
+        self._clock = clock
+        # user id -> (principal, version, expires_at, checked_at)
+        self._entries: "OrderedDict[str, tuple[Principal, int | None, float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _redis_key(user_id: str) -> str:
+        return f"principal:{user_id}"
+
+    @staticmethod
+    def _version_key(user_id: str) -> str:
+        return f"principal:version:{user_id}"
+
+    def version(self, user_id: str) -> int | None:
+        """Current version of a user's principal; read it before loading the user row."""
+        if self._redis is None:
+            return None
+        try:
+            return int(cast("bytes | None", self._redis.get(self._version_key(str(user_id)))) or 0)
+        except Exception:
+            return None
+
+    def get(self, user_id: str) -> Principal | None:
+        user_id = str(user_id)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                self._entries.move_to_end(user_id)
+        now = self._clock()
+        if entry is not None:
+            principal, version, expires_at, checked_at = entry
+            if expires_at > now:
+                if now - checked_at < self.check_seconds:
+                    principal_cache_hits.labels(layer="local").inc()
+                    return principal
+                current = self.version(user_id)
+                if current is not None and current == version:
+                    self._put_local(principal, version, expires_at, now)
+                    principal_cache_hits.labels(layer="local").inc()
+                    return principal
+            with self._lock:
+                self._entries.pop(user_id, None)
+        shared = self._get_shared(user_id)
+        if shared is not None:
+            principal, version = shared
+            principal_cache_hits.labels(layer="redis").inc()
+            self._put_local(principal, version, now + self.ttl_seconds, now)
+            return principal
+        principal_cache_misses.inc()
+        return None
+
+    def put(self, principal: Principal, version: int | None = None) -> None:
+        now = self._clock()
+        self._put_local(principal, version, now + self.ttl_seconds, now)
+        if self._shared is None or version is None:
+            return
+        value = json.dumps({"tenant_id": str(principal.tenant_id), "role": principal.role.value, "version": version})
+        try:
+            self._shared.set(self._redis_key(str(principal.id)), value, ex=self.ttl_seconds)
+        except Exception:
+            pass
+
+    def invalidate(self, user_id: str) -> None:
+        user_id = str(user_id)
+        with self._lock:
+            self._entries.pop(user_id, None)
+        if self._redis is None:
+            return
+        try:
+            pipe = self._redis.pipeline(transaction=False)
+            pipe.incr(self._version_key(user_id))
+            pipe.delete(self._redis_key(user_id))
+            pipe.execute()
+        except Exception:
+            pass
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _put_local(self, principal: Principal, version: int | None, expires_at: float, checked_at: float) -> None:
+        key = str(principal.id)
+        with self._lock:
+            self._entries[key] = (principal, version, expires_at, checked_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _get_shared(self, user_id: str) -> tuple[Principal, int] | None:
+        if self._shared is None:
+            return None
+        try:
+            raw, version = cast(list, self._shared.mget(self._redis_key(user_id), self._version_key(user_id)))
+        except Exception:
+            return None
+        if raw is None:
+            return None
+        data = json.loads(raw)
+        # A copy stored by a load that raced an invalidation carries the old version.
+        if data.get("version") != int(version or 0):
+            return None
+        principal = Principal(id=uuid.UUID(user_id), tenant_id=uuid.UUID(data["tenant_id"]), role=Role(data["role"]))
+        return principal, data["version"]
+
+
+principal_cache = PrincipalCache(
+    ttl_seconds=settings.principal_cache_ttl_seconds,
+    max_size=settings.principal_cache_max_size,
+    check_seconds=settings.principal_cache_check_seconds,
+    redis_client=get_redis(),
+    shared=settings.principal_cache_redis,
+)
+
+
+def load_principal(db: Session, user_id: str, tenant_id: str) -> Principal | None:
+    """Principal for a token's subject, from the cache or, on a miss, the users table."""
+    try:
+        user_uuid, tenant_uuid = uuid.UUID(str(user_id)), uuid.UUID(str(tenant_id))
+    except ValueError:
+        return None
+    principal = principal_cache.get(str(user_uuid))
+    if principal is None:
+        version = principal_cache.version(str(user_uuid))
+        user = db.query(User).filter(User.id == user_uuid, User.tenant_id == tenant_uuid).first()
+        if user is None:
+            return None
+        principal = Principal(id=user.id, tenant_id=user.tenant_id, role=user.role)
+        principal_cache.put(principal, version)
+    if principal.tenant_id != tenant_uuid:
+        return None
+    return principal
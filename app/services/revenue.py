@@ -0,0 +1,98 @@
+from decimal import Decimal
+import uuid
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.database import dialect_insert
+from app.domain.models import (
+    Invoice,
+    InvoiceStatus,
+    Plan,
+    Subscription,
+    SubscriptionStatus,
+    TenantRevenueMV,
+)
+from app.services.catalog import CatalogPlan
+from app.services.pricing import calculate_flat
+
+REVENUE_STATUSES = (InvoiceStatus.sent, InvoiceStatus.paid)
+
+
+def monthly_value(plan: CatalogPlan, quantity: int) -> Decimal:
+    # Billing periods are 30 days, so the recurring price per period is already monthly.
+    # Metered usage is not recurring revenue and is tracked as invoiced revenue instead.
+    return calculate_flat(plan.price, quantity)
+
+
+def counts_as_revenue(status: InvoiceStatus | None) -> bool:
+    return status in REVENUE_STATUSES
+
+
+def apply_revenue_delta(
+    db: Session,
+    tenant_id: uuid.UUID,
+    mrr_delta: Decimal = Decimal("0"),
+    invoiced_delta: Decimal = Decimal("0"),
+) -> None:
+    """Atomically add deltas to the tenant's revenue row, creating it on first use."""
+    if not mrr_delta and not invoiced_delta:
+        return
+    tenant_id = uuid.UUID(str(tenant_id))
+    stmt = dialect_insert(db, TenantRevenueMV).values(
+        tenant_id=tenant_id,
+        monthly_recurring_revenue=mrr_delta,
+        annual_run_rate=mrr_delta * 12,
+        invoiced_revenue=invoiced_delta,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["tenant_id"],
+        set_={
+            "monthly_recurring_revenue": TenantRevenueMV.monthly_recurring_revenue + stmt.excluded.monthly_recurring_revenue,
+            "annual_run_rate": TenantRevenueMV.annual_run_rate + stmt.excluded.annual_run_rate,
+            "invoiced_revenue": TenantRevenueMV.invoiced_revenue + stmt.excluded.invoiced_revenue,
+            "refreshed_at": func.now(),
+        },
+    )
+    db.execute(stmt)
+
+
+def rebuild_revenue_mv(db: Session, tenant_id: uuid.UUID) -> TenantRevenueMV:
+    """Recompute the tenant's revenue row from scratch to correct any drift in the deltas."""
+    tenant_id = uuid.UUID(str(tenant_id))
+    mrr = db.execute(
+        select(func.coalesce(func.sum(Plan.price * Subscription.quantity), 0))
+        .select_from(Subscription)
+        .join(Subscription.plan)
+        .where(Subscription.tenant_id == tenant_id, Subscription.status == SubscriptionStatus.active)
+    ).scalar_one()
+    invoiced = db.execute(
+        select(func.coalesce(func.sum(Invoice.total), 0)).where(
+            Invoice.tenant_id == tenant_id, Invoice.status.in_(REVENUE_STATUSES)
+        )
+    ).scalar_one()
+    mrr = Decimal(str(mrr))
+    mv = db.get(TenantRevenueMV, tenant_id)
+    if mv is None:
+        mv = TenantRevenueMV(tenant_id=tenant_id)
+        db.add(mv)
+    mv.monthly_recurring_revenue = mrr
+    mv.annual_run_rate = mrr * Decimal("12")
+    mv.invoiced_revenue = Decimal(str(invoiced))
+    mv.refreshed_at = func.now()
+    db.flush()
+    return mv
+
+
+async def load_revenue_async(db: AsyncSession, tenant_id: uuid.UUID) -> TenantRevenueMV:
+    tenant_id = uuid.UUID(str(tenant_id))
+    mv = await db.get(TenantRevenueMV, tenant_id)
+    if mv is None:
+        # Every revenue change upserts the row, so a tenant without one has no revenue yet.
+        # Rebuilding here would be a full scan on the request path (and a write on a replica).
+        zero = Decimal("0")
+        mv = TenantRevenueMV(
+            tenant_id=tenant_id, monthly_recurring_revenue=zero, annual_run_rate=zero, invoiced_revenue=zero
+        )
+    return mv
@@ -0,0 +1,280 @@
+"""Daily revenue snapshots and the analytics read from them.
+
+``take_revenue_snapshot`` writes one ``revenue_snapshots`` row per tenant, day and plan:
+MRR and active subscriptions at snapshot time, the day's invoiced revenue, and the MRR
+movement since the previous snapshot. Movement comes from diffing every subscription's
+MRR against ``subscription_revenue_state``:
+
+- new: from 0 (created, trial converted, reactivated)
+- expansion / contraction: quantity or price change; a plan change contracts the old
+  plan and expands the new one
+- churned: to 0 (canceled, past due, deleted)
+
+On a tenant's first snapshot only subscriptions created that day count as new; the rest
+are the baseline. Re-running a day refreshes MRR
+and adds any movement since the earlier run. The analytics queries only aggregate
+snapshot rows, so their cost depends on the date range, not on invoice volume.
+"""
+
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+import uuid
+
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.domain.models import (
+    Invoice,
+    Plan,
+    Product,
+    RevenueSnapshot,
+    Subscription,
+    SubscriptionRevenueState,
+    SubscriptionStatus,
+)
+from app.services.pricing import calculate_flat
+from app.services.revenue import REVENUE_STATUSES
+
+ZERO = Decimal("0")
+MOVEMENT_FIELDS = ("new_mrr", "expansion_mrr", "contraction_mrr", "churned_mrr")
+
+
+def _subscription_mrr(db: Session, tenant_id: uuid.UUID):
+    """``(subscription_id, plan_id, product_id, created_at, mrr)`` for every subscription of the tenant."""
+    rows = db.execute(
+        select(
+            Subscription.id,
+            Subscription.plan_id,
+            Plan.product_id,
+            Subscription.created_at,
+            Subscription.status,
+            Subscription.quantity,
+            Plan.price,
+        )
+        .join(Subscription.plan)
+        .where(Subscription.tenant_id == tenant_id)
+    )
+    for sub_id, plan_id, product_id, created_at, status, quantity, price in rows:
+        mrr = calculate_flat(price, quantity) if status == SubscriptionStatus.active else ZERO
+        yield sub_id, plan_id, product_id, created_at, mrr
+
+
+def _invoiced_by_plan(db: Session, tenant_id: uuid.UUID, day: date) -> dict[tuple[uuid.UUID, uuid.UUID], Decimal]:
+    start = datetime.combine(day, time.min, tzinfo=timezone.utc)
+    rows = db.execute(
+        select(Subscription.plan_id, Plan.product_id, func.sum(Invoice.total))
+        .join(Invoice.subscription)
+        .join(Subscription.plan)
+        .where(
+            Invoice.tenant_id == tenant_id,
+            Invoice.status.in_(REVENUE_STATUSES),
+            Invoice.created_at >= start,
+            Invoice.created_at < start + timedelta(days=1),
+        )
+        .group_by(Subscription.plan_id, Plan.product_id)
+    )
+    return {(plan_id, product_id): Decimal(str(total)) for plan_id, product_id, total in rows}
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes.
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def take_revenue_snapshot(db: Session, tenant_id: uuid.UUID, day: date) -> list[RevenueSnapshot]:
+    """Write (or refresh) the tenant's snapshot rows for ``day`` from current subscriptions."""
+    tenant_id = uuid.UUID(str(tenant_id))
+    rows = {
+        row.plan_id: row
+        for row in db.scalars(
+            select(RevenueSnapshot).where(RevenueSnapshot.tenant_id == tenant_id, RevenueSnapshot.snapshot_date == day)
+        )
+    }
+    for row in rows.values():
+        row.mrr, row.active_subscriptions, row.invoiced_revenue = ZERO, 0, ZERO
+
+    def row_for(plan_id: uuid.UUID, product_id: uuid.UUID) -> RevenueSnapshot:
+        if plan_id not in rows:
+            rows[plan_id] = RevenueSnapshot(
+                tenant_id=tenant_id,
+                snapshot_date=day,
+                plan_id=plan_id,
+                product_id=product_id,
+                active_subscriptions=0,
+                mrr=ZERO,
+                invoiced_revenue=ZERO,
+                **{field: ZERO for field in MOVEMENT_FIELDS},
+            )
+            db.add(rows[plan_id])
+        return rows[plan_id]
+
+    movement: dict[tuple[uuid.UUID, uuid.UUID], dict[str, Decimal]] = defaultdict(lambda: defaultdict(Decimal))
+    states = {
+        state.subscription_id: state
+        for state in db.scalars(select(SubscriptionRevenueState).where(SubscriptionRevenueState.tenant_id == tenant_id))
+    }
+    # No state yet means this is the tenant's first snapshot.
+    first_snapshot = not states
+    for sub_id, plan_id, product_id, created_at, mrr in list(_subscription_mrr(db, tenant_id)):
+        if mrr:
+            row = row_for(plan_id, product_id)
+            row.mrr += mrr
+            row.active_subscriptions += 1
+        state = states.pop(sub_id, None)
+        previous = Decimal(str(state.mrr)) if state is not None else ZERO
+        if state is None and first_snapshot and _as_utc(created_at).date() < day:
+            previous = mrr  # Baseline: predates snapshots, so it is not movement.
+        previous_key = (state.plan_id, state.product_id) if state is not None else (plan_id, product_id)
+        if previous_key[0] != plan_id and previous and mrr:
+            movement[previous_key]["contraction_mrr"] += previous
+            movement[(plan_id, product_id)]["expansion_mrr"] += mrr
+        elif not previous and mrr:
+            movement[(plan_id, product_id)]["new_mrr"] += mrr
+        elif previous and not mrr:
+            movement[previous_key]["churned_mrr"] += previous
+        elif mrr > previous:
+            movement[(plan_id, product_id)]["expansion_mrr"] += mrr - previous
+        elif mrr < previous:
+            movement[(plan_id, product_id)]["contraction_mrr"] += previous - mrr
+        if state is None:
+            db.add(
+                SubscriptionRevenueState(
+                    subscription_id=sub_id, tenant_id=tenant_id, plan_id=plan_id, product_id=product_id, mrr=mrr
+                )
+            )
+        elif (state.plan_id, state.product_id, previous) != (plan_id, product_id, mrr):
+            state.plan_id, state.product_id, state.mrr = plan_id, product_id, mrr
+    # Whatever is left belongs to deleted subscriptions.
+    for state in states.values():
+        if state.mrr:
+            movement[(state.plan_id, state.product_id)]["churned_mrr"] += Decimal(str(state.mrr))
+        db.delete(state)
+
+    for (plan_id, product_id), amounts in movement.items():
+        row = row_for(plan_id, product_id)
+        for field, amount in amounts.items():
+            setattr(row, field, Decimal(str(getattr(row, field))) + amount)
+    for (plan_id, product_id), total in _invoiced_by_plan(db, tenant_id, day).items():
+        row_for(plan_id, product_id).invoiced_revenue = total
+    db.flush()
+    return list(rows.values())
+
+
+def _movement_columns():
+    return [func.coalesce(func.sum(getattr(RevenueSnapshot, field)), 0).label(field) for field in MOVEMENT_FIELDS]
+
+
+def _last_snapshot_date(tenant_id: uuid.UUID, start: date, end: date):
+    return (
+        select(func.max(RevenueSnapshot.snapshot_date))
+        .where(
+            RevenueSnapshot.tenant_id == tenant_id,
+            RevenueSnapshot.snapshot_date >= start,
+            RevenueSnapshot.snapshot_date <= end,
+        )
+        .scalar_subquery()
+    )
+
+
+def _ending(column, tenant_id: uuid.UUID, start: date, end: date):
+    # The value on the last snapshot day of the range (plans without a row that day count 0).
+    last_day = _last_snapshot_date(tenant_id, start, end)
+    return func.coalesce(func.sum(case((RevenueSnapshot.snapshot_date == last_day, column), else_=0)), 0)
+
+
+async def mrr_series_async(db: AsyncSession, tenant_id: uuid.UUID, start: date, end: date) -> list[dict]:
+    """One point per snapshot day: MRR, ARR, active subscriptions and MRR movement."""
+    tenant_id = uuid.UUID(str(tenant_id))
+    rows = await db.execute(
+        select(
+            RevenueSnapshot.snapshot_date,
+            func.sum(RevenueSnapshot.mrr).label("mrr"),
+            func.sum(RevenueSnapshot.active_subscriptions).label("active_subscriptions"),
+            *_movement_columns(),
+        )
+        .where(
+            RevenueSnapshot.tenant_id == tenant_id,
+            RevenueSnapshot.snapshot_date >= start,
+            RevenueSnapshot.snapshot_date <= end,
+        )
+        .group_by(RevenueSnapshot.snapshot_date)
+        .order_by(RevenueSnapshot.snapshot_date)
+    )
+    series = []
+    for row in rows:
+        point = {field: Decimal(str(getattr(row, field))) for field in ("mrr", *MOVEMENT_FIELDS)}
+        gained = point["new_mrr"] + point["expansion_mrr"]
+        point["net_new_mrr"] = gained - point["contraction_mrr"] - point["churned_mrr"]
+        series.append(
+            {
+                "date": row.snapshot_date,
+                "annual_run_rate": point["mrr"] * 12,
+                "active_subscriptions": int(row.active_subscriptions),
+                **point,
+            }
+        )
+    return series
+
+
+async def mrr_by_plan_async(db: AsyncSession, tenant_id: uuid.UUID, start: date, end: date) -> list[dict]:
+    """MRR movement per plan over the range, with each plan's MRR on the last snapshot day."""
+    tenant_id = uuid.UUID(str(tenant_id))
+    rows = await db.execute(
+        select(
+            RevenueSnapshot.plan_id,
+            Plan.name,
+            _ending(RevenueSnapshot.mrr, tenant_id, start, end).label("mrr"),
+            _ending(RevenueSnapshot.active_subscriptions, tenant_id, start, end).label("active_subscriptions"),
+            *_movement_columns(),
+        )
+        .outerjoin(Plan, Plan.id == RevenueSnapshot.plan_id)
+        .where(
+            RevenueSnapshot.tenant_id == tenant_id,
+            RevenueSnapshot.snapshot_date >= start,
+            RevenueSnapshot.snapshot_date <= end,
+        )
+        .group_by(RevenueSnapshot.plan_id, Plan.name)
+        .order_by(RevenueSnapshot.plan_id)
+    )
+    return [
+        {
+            "plan_id": row.plan_id,
+            "plan_name": row.name,
+            "mrr": Decimal(str(row.mrr)),
+            "active_subscriptions": int(row.active_subscriptions),
+            **{field: Decimal(str(getattr(row, field))) for field in MOVEMENT_FIELDS},
+        }
+        for row in rows
+    ]
+
+
+async def revenue_by_product_async(db: AsyncSession, tenant_id: uuid.UUID, start: date, end: date) -> list[dict]:
+    """Invoiced revenue per product over the range, with its MRR on the last snapshot day."""
+    tenant_id = uuid.UUID(str(tenant_id))
+    rows = await db.execute(
+        select(
+            RevenueSnapshot.product_id,
+            Product.name,
+            func.coalesce(func.sum(RevenueSnapshot.invoiced_revenue), 0).label("invoiced_revenue"),
+            _ending(RevenueSnapshot.mrr, tenant_id, start, end).label("mrr"),
+        )
+        .outerjoin(Product, Product.id == RevenueSnapshot.product_id)
+        .where(
+            RevenueSnapshot.tenant_id == tenant_id,
+            RevenueSnapshot.snapshot_date >= start,
+            RevenueSnapshot.snapshot_date <= end,
+        )
+        .group_by(RevenueSnapshot.product_id, Product.name)
+        .order_by(RevenueSnapshot.product_id)
+    )
+    return [
+        {
+            "product_id": row.product_id,
+            "product_name": row.name,
+            "invoiced_revenue": Decimal(str(row.invoiced_revenue)),
+            "mrr": Decimal(str(row.mrr)),
+        }
+        for row in rows
+    ]
@@ -0,0 +1,201 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Iterable, Sequence
+import uuid
+
+from sqlalchemy import ColumnElement, and_, func, or_, select
+from sqlalchemy.orm import Session
+
+from app.database import dialect_insert
+from app.domain.models import UsageEvent, UsageRollup
+
+BUCKET = timedelta(hours=1)
+# Bounds the OR-ed range predicates per statement (SQLite caps expression depth at 1000).
+PERIODS_PER_QUERY = 100
+
+RollupKey = tuple[uuid.UUID, str, datetime]
+
+
+def hour_bucket(ts: datetime) -> datetime:
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc)
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def next_hour_bucket(ts: datetime) -> datetime:
+    floor = hour_bucket(ts)
+    return floor if floor == ts else floor + BUCKET
+
+
+def _to_decimal(value) -> Decimal:
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def apply_rollups(
+    db: Session,
+    tenant_id: uuid.UUID,
+    events: Iterable[tuple[uuid.UUID, str, datetime, object]],
+) -> None:
+    """Add ``(subscription_id, metric, ts, quantity)`` events to their hourly buckets."""
+    totals: dict[RollupKey, list] = defaultdict(lambda: [Decimal("0"), 0])
+    for subscription_id, metric, ts, quantity in events:
+        bucket = totals[(subscription_id, metric, hour_bucket(ts))]
+        bucket[0] += _to_decimal(quantity)
+        bucket[1] += 1
+    if not totals:
+        return
+    # Stable key order keeps concurrent upserts from deadlocking on each other's rows.
+    rows = [
+        {
+            "tenant_id": tenant_id,
+            "subscription_id": subscription_id,
+            "metric": metric,
+            "bucket_start": bucket_start,
+            "quantity": quantity,
+            "event_count": count,
+        }
+        for (subscription_id, metric, bucket_start), (quantity, count) in sorted(
+            totals.items(), key=lambda item: (str(item[0][0]), item[0][1], item[0][2])
+        )
+    ]
+    stmt = dialect_insert(db, UsageRollup).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["tenant_id", "subscription_id", "bucket_start", "metric"],
+        set_={
+            "quantity": UsageRollup.quantity + stmt.excluded.quantity,
+            "event_count": UsageRollup.event_count + stmt.excluded.event_count,
+        },
+    )
+    db.execute(stmt)
+
+
+def usage_totals(
+    db: Session,
+    tenant_id: uuid.UUID,
+    periods: Sequence[tuple[uuid.UUID, datetime, datetime]],
+) -> dict[uuid.UUID, Decimal]:
+    """Usage per subscription for ``[start, end)``, summed across metrics.
+
+    Whole hours come from usage_rollups; only the partial hours at either edge of a
+    period are read from usage_events, so cost no longer grows with raw event count.
+    """
+    totals: dict[uuid.UUID, Decimal] = defaultdict(lambda: Decimal("0"))
+    for offset in range(0, len(periods), PERIODS_PER_QUERY):
+        rollup_terms: list[ColumnElement[bool]] = []
+        raw_terms: list[ColumnElement[bool]] = []
+        for subscription_id, start, end in periods[offset : offset + PERIODS_PER_QUERY]:
+            full_start, full_end = next_hour_bucket(start), hour_bucket(end)
+            if full_start < full_end:
+                rollup_terms.append(
+                    and_(
+                        UsageRollup.subscription_id == subscription_id,
+                        UsageRollup.bucket_start >= full_start,
+                        UsageRollup.bucket_start < full_end,
+                    )
+                )
+                edges = [(start, full_start), (full_end, end)]
+            else:
+                edges = [(start, end)]
+            raw_terms.extend(
+                and_(UsageEvent.subscription_id == subscription_id, UsageEvent.ts >= lo, UsageEvent.ts < hi)
+                for lo, hi in edges
+                if lo < hi
+            )
+        if rollup_terms:
+            rows = db.execute(
+                select(UsageRollup.subscription_id, func.sum(UsageRollup.quantity))
+                .where(UsageRollup.tenant_id == tenant_id, or_(*rollup_terms))
+                .group_by(UsageRollup.subscription_id)
+            )
+            for subscription_id, quantity in rows:
+                totals[subscription_id] += _to_decimal(quantity or 0)
+        if raw_terms:
+            rows = db.execute(
+                select(UsageEvent.subscription_id, func.sum(UsageEvent.quantity))
+                .where(or_(*raw_terms))
+                .group_by(UsageEvent.subscription_id)
+            )
+            for subscription_id, quantity in rows:
+                totals[subscription_id] += _to_decimal(quantity or 0)
+    return dict(totals)
+
+
+def reconcile_rollups(
+    db: Session,
+    tenant_id: uuid.UUID,
+    start: datetime,
+    end: datetime,
+    repair: bool = False,
+) -> list[dict]:
+    """Compare rollups for the hours covering ``[start, end)`` with raw events.
+
+    Returns one entry per mismatched bucket. With ``repair`` the rollups are rewritten
+    from the raw totals; only run repairs over settled hours so in-flight ingestion
+    deltas are not overwritten.
+    """
+    start, end = hour_bucket(start), next_hour_bucket(end)
+    expected: dict[RollupKey, list] = defaultdict(lambda: [Decimal("0"), 0])
+    raw_rows = db.execute(
+        select(UsageEvent.subscription_id, UsageEvent.metric, UsageEvent.ts, UsageEvent.quantity)
+        .where(UsageEvent.tenant_id == tenant_id, UsageEvent.ts >= start, UsageEvent.ts < end)
+        .execution_options(yield_per=10_000)
+    )
+    for subscription_id, metric, ts, quantity in raw_rows:
+        bucket = expected[(subscription_id, metric, hour_bucket(ts))]
+        bucket[0] += _to_decimal(quantity)
+        bucket[1] += 1
+
+    actual = {
+        (row.subscription_id, row.metric, hour_bucket(row.bucket_start)): row
+        for row in db.execute(
+            select(UsageRollup).where(
+                UsageRollup.tenant_id == tenant_id,
+                UsageRollup.bucket_start >= start,
+                UsageRollup.bucket_start < end,
+            )
+        ).scalars()
+    }
+
+    mismatches: list[dict] = []
+    for key in sorted(set(expected) | set(actual), key=lambda k: (str(k[0]), k[1], k[2])):
+        raw_quantity, raw_count = expected.get(key, (Decimal("0"), 0))
+        rollup = actual.get(key)
+        rollup_quantity = _to_decimal(rollup.quantity) if rollup else Decimal("0")
+        rollup_count = rollup.event_count if rollup else 0
+        if raw_quantity == rollup_quantity and raw_count == rollup_count:
+            continue
+        subscription_id, metric, bucket_start = key
+        mismatches.append(
+            {
+                "subscription_id": str(subscription_id),
+                "metric": metric,
+                "bucket_start": bucket_start,
+                "raw_quantity": raw_quantity,
+                "rollup_quantity": rollup_quantity,
+                "raw_count": raw_count,
+                "rollup_count": rollup_count,
+            }
+        )
+        if not repair:
+            continue
+        if raw_count == 0:
+            db.delete(rollup)
+        elif rollup is None:
+            db.add(
+                UsageRollup(
+                    tenant_id=tenant_id,
+                    subscription_id=subscription_id,
+                    metric=metric,
+                    bucket_start=bucket_start,
+                    quantity=raw_quantity,
+                    event_count=raw_count,
+                )
+            )
+        else:
+            rollup.quantity = raw_quantity
+            rollup.event_count = raw_count
+    if repair:
+        db.flush()
+    return mismatches
+
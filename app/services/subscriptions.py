@@ -1,8 +1,11 @@
 from datetime import datetime, timedelta, timezone
+import uuid
 
 from sqlalchemy.orm import Session
 
-from app.domain.models import Plan, Subscription, SubscriptionStatus
+from app.domain.models import Subscription, SubscriptionStatus
+from app.services.catalog import catalog_cache
+from app.services.revenue import apply_revenue_delta, monthly_value
 
 
 DEFAULT_PERIOD_DAYS = 30
@@ -16,7 +19,10 @@ def create_subscription(
     db: Session, tenant_id: str, plan_id: str, quantity: int, trial_days: int | None = None
 ) -> Subscription:
     now = datetime.now(timezone.utc)
-    plan: Plan | None = db.query(Plan).filter(Plan.id == plan_id, Plan.tenant_id == tenant_id).first()
+    try:
+        plan = catalog_cache.plan(db, uuid.UUID(str(tenant_id)), uuid.UUID(str(plan_id)))
+    except ValueError:
+        plan = None
     if plan is None:
         raise ValueError("Plan not found for tenant")
     current_end = period_end(now)
@@ -24,7 +30,7 @@ def create_subscription(
     trial_end = now + timedelta(days=trial_days) if trial_days else None
     subscription = Subscription(
         tenant_id=tenant_id,
-        plan_id=plan_id,
+        plan_id=plan.id,
         status=status,
         quantity=quantity,
         current_period_start=now,
@@ -34,6 +40,8 @@ def create_subscription(
     )
     db.add(subscription)
     db.flush()
+    if status == SubscriptionStatus.active:
+        apply_revenue_delta(db, subscription.tenant_id, mrr_delta=monthly_value(plan, quantity))
     return subscription
 
 
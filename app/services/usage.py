@@ -1,16 +1,27 @@
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
+from typing import Iterable, Sequence
 import uuid
 
 from fastapi import HTTPException, status
 from redis import Redis
-from sqlalchemy.exc import IntegrityError
+from redis import asyncio as aioredis
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.config import get_settings
-from app.domain.models import Subscription, UsageEvent
+from app.database import dialect_insert
+from app.domain.models import Subscription, UsageEvent, UsageIdempotencyKey
+from app.schemas.usage import UsageEventBatchItem, UsageIngestStatus
+from app.services.idempotency import idempotency_filter, record_lookups
+from app.services.rollups import apply_rollups
+from app.services.usage_partitions import idempotency_window_start, month_start
 
 settings = get_settings()
 
+# Keeps bound parameters per statement well under driver limits (sqlite: 32766).
+INSERT_CHUNK_SIZE = 1000
+
 
 def ingest_usage_event(
     db: Session,
@@ -36,15 +47,16 @@ def ingest_usage_event(
     if subscription is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Subscription not found")
 
-    redis_key = f"idemp:{idempotency_key}"
     if redis_client:
         try:
-            inserted = redis_client.setnx(redis_key, "1")
-            if not inserted:
-                return None, True
+            maybe_seen = idempotency_filter.check_and_add(redis_client, tenant_uuid, [idempotency_key])
         except Exception:
-            redis_client = None
+            maybe_seen = []
+        if maybe_seen and confirm_duplicates(db, tenant_uuid, [idempotency_key], maybe_seen):
+            return None, True
 
+    if not claim_idempotency_keys(db, tenant_uuid, [idempotency_key]):
+        return None, True
     event = UsageEvent(
         tenant_id=tenant_uuid,
         subscription_id=subscription_uuid,
@@ -54,15 +66,233 @@ def ingest_usage_event(
         idempotency_key=idempotency_key,
     )
     db.add(event)
-    try:
-        db.flush()
-    except IntegrityError:
-        db.rollback()
-        return None, True
+    db.flush()
+    apply_rollups(db, tenant_uuid, [(subscription_uuid, metric, event.ts, quantity)])
+    return event, False
+
+
+async def ingest_usage_event_async(
+    db: AsyncSession,
+    tenant_id: str,
+    subscription_id: str,
+    metric: str,
+    quantity: float,
+    ts: datetime | None,
+    idempotency_key: str,
+    redis_client: aioredis.Redis | None = None,
+) -> tuple[UsageEvent | None, bool]:
+    """Async counterpart of ``ingest_usage_event`` with the same idempotency semantics."""
+    if not idempotency_key:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Idempotency-Key required")
+
+    tenant_uuid = uuid.UUID(str(tenant_id))
+    subscription_uuid = uuid.UUID(str(subscription_id))
+
+    found = await db.scalar(
+        select(Subscription.id).where(Subscription.id == subscription_uuid, Subscription.tenant_id == tenant_uuid)
+    )
+    if found is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Subscription not found")
 
     if redis_client:
         try:
-            redis_client.expire(redis_key, settings.idempotency_ttl_seconds)
+            maybe_seen = await idempotency_filter.check_and_add_async(redis_client, tenant_uuid, [idempotency_key])
         except Exception:
-            pass
+            maybe_seen = []
+        if maybe_seen:
+            duplicates = await db.run_sync(confirm_duplicates, tenant_uuid, [idempotency_key], maybe_seen)
+            if duplicates:
+                return None, True
+
+    if not await db.run_sync(claim_idempotency_keys, tenant_uuid, [idempotency_key]):
+        return None, True
+    event = UsageEvent(
+        tenant_id=tenant_uuid,
+        subscription_id=subscription_uuid,
+        metric=metric,
+        quantity=quantity,
+        ts=ts or datetime.now(timezone.utc),
+        idempotency_key=idempotency_key,
+    )
+    db.add(event)
+    await db.flush()
+    await db.run_sync(apply_rollups, tenant_uuid, [(subscription_uuid, metric, event.ts, quantity)])
     return event, False
+
+
+def current_key_month() -> date:
+    return month_start(datetime.now(timezone.utc)).date()
+
+
+def claim_idempotency_keys(db: Session, tenant_uuid: uuid.UUID, keys: Sequence[str]) -> set[str]:
+    """Record the tenant's idempotency keys and return the ones not seen before.
+
+    The primary key dedups within the current month; keys from the earlier months of the
+    idempotency window are looked up first.
+    """
+    if not keys:
+        return set()
+    month = current_key_month()
+    if settings.usage_idempotency_window_months:
+        earlier = existing_idempotency_keys(db, tenant_uuid, keys, until=month)
+        keys = [key for key in keys if key not in earlier]
+        if not keys:
+            return set()
+    stmt = (
+        dialect_insert(db, UsageIdempotencyKey)
+        .values([{"tenant_id": tenant_uuid, "idempotency_key": key, "created_month": month} for key in keys])
+        .on_conflict_do_nothing(index_elements=["tenant_id", "idempotency_key", "created_month"])
+        .returning(UsageIdempotencyKey.idempotency_key)
+    )
+    return set(db.execute(stmt).scalars())
+
+
+def existing_idempotency_keys(
+    db: Session, tenant_uuid: uuid.UUID, keys: Sequence[str], until: date | None = None
+) -> set[str]:
+    """Keys already recorded within the idempotency window (before the ``until`` month, if given)."""
+    conditions = [
+        UsageIdempotencyKey.tenant_id == tenant_uuid,
+        UsageIdempotencyKey.created_month >= idempotency_window_start(settings.usage_idempotency_window_months),
+    ]
+    if until is not None:
+        conditions.append(UsageIdempotencyKey.created_month < until)
+    found: set[str] = set()
+    for start in range(0, len(keys), INSERT_CHUNK_SIZE):
+        found.update(
+            db.execute(
+                select(UsageIdempotencyKey.idempotency_key).where(
+                    *conditions, UsageIdempotencyKey.idempotency_key.in_(keys[start : start + INSERT_CHUNK_SIZE])
+                )
+            ).scalars()
+        )
+    return found
+
+
+def confirm_duplicates(db: Session, tenant_uuid: uuid.UUID, keys: Sequence[str], maybe_seen: Sequence[bool]) -> set[str]:
+    """Settle Bloom filter hits against the key table; returns the keys already ingested."""
+    hits = [key for key, hit in zip(keys, maybe_seen) if hit]
+    duplicates = existing_idempotency_keys(db, tenant_uuid, hits)
+    record_lookups(len(hits), len(duplicates), len(keys) - len(hits))
+    return duplicates
+
+
+def tenant_subscription_ids(db: Session, tenant_uuid: uuid.UUID, subscription_ids: Iterable[uuid.UUID]) -> set[uuid.UUID]:
+    wanted = set(subscription_ids)
+    if not wanted:
+        return set()
+    return set(
+        db.execute(
+            select(Subscription.id).where(Subscription.tenant_id == tenant_uuid, Subscription.id.in_(wanted))
+        ).scalars()
+    )
+
+
+def insert_usage_rows(db: Session, tenant_uuid: uuid.UUID, rows: Sequence[dict]) -> set[str]:
+    """Insert validated usage_events rows of one tenant, skipping keys already ingested.
+
+    Returns the idempotency keys that were inserted; rollups are updated for those rows.
+    """
+    # A key repeated within ``rows`` is inserted once (the first occurrence).
+    unique: dict[str, dict] = {}
+    for row in rows:
+        unique.setdefault(row["idempotency_key"], row)
+    rows = list(unique.values())
+    inserted_keys: set[str] = set()
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        chunk = rows[start : start + INSERT_CHUNK_SIZE]
+        fresh = claim_idempotency_keys(db, tenant_uuid, [row["idempotency_key"] for row in chunk])
+        if fresh:
+            db.execute(insert(UsageEvent), [row for row in chunk if row["idempotency_key"] in fresh])
+        inserted_keys.update(fresh)
+    apply_rollups(
+        db,
+        tenant_uuid,
+        (
+            (row["subscription_id"], row["metric"], row["ts"], row["quantity"])
+            for row in rows
+            if row["idempotency_key"] in inserted_keys
+        ),
+    )
+    return inserted_keys
+
+
+def _batch_result(key: str, state: UsageIngestStatus, event_id=None, error: str | None = None) -> dict:
+    return {
+        "idempotency_key": key,
+        "status": state,
+        "id": str(event_id) if event_id else None,
+        "error": error,
+    }
+
+
+def ingest_usage_batch(
+    db: Session,
+    tenant_id: str,
+    events: Sequence[UsageEventBatchItem],
+    redis_client: Redis | None = None,
+) -> list[dict]:
+    """Ingest many events with one subscription query, one Redis pipeline and chunked bulk inserts.
+
+    Returns one result per input event, in input order.
+    """
+    tenant_uuid = uuid.UUID(str(tenant_id))
+    results: list[dict | None] = [None] * len(events)
+
+    parsed: dict[int, uuid.UUID] = {}
+    for idx, item in enumerate(events):
+        try:
+            parsed[idx] = uuid.UUID(str(item.subscription_id))
+        except ValueError:
+            results[idx] = _batch_result(item.idempotency_key, UsageIngestStatus.rejected, error="Invalid subscription_id")
+
+    known_subscriptions = tenant_subscription_ids(db, tenant_uuid, parsed.values())
+
+    candidates: list[int] = []
+    seen_keys: set[str] = set()
+    for idx, subscription_uuid in parsed.items():
+        key = events[idx].idempotency_key
+        if subscription_uuid not in known_subscriptions:
+            results[idx] = _batch_result(key, UsageIngestStatus.rejected, error="Subscription not found")
+        elif key in seen_keys:
+            results[idx] = _batch_result(key, UsageIngestStatus.duplicate)
+        else:
+            seen_keys.add(key)
+            candidates.append(idx)
+
+    if redis_client and candidates:
+        keys = [events[idx].idempotency_key for idx in candidates]
+        try:
+            maybe_seen = idempotency_filter.check_and_add(redis_client, tenant_uuid, keys)
+        except Exception:
+            maybe_seen = []
+        duplicates = confirm_duplicates(db, tenant_uuid, keys, maybe_seen) if maybe_seen else set()
+        if duplicates:
+            for idx in candidates:
+                if events[idx].idempotency_key in duplicates:
+                    results[idx] = _batch_result(events[idx].idempotency_key, UsageIngestStatus.duplicate)
+            candidates = [idx for idx in candidates if events[idx].idempotency_key not in duplicates]
+
+    now = datetime.now(timezone.utc)
+    rows: list[dict] = [
+        {
+            "id": uuid.uuid4(),
+            "tenant_id": tenant_uuid,
+            "subscription_id": parsed[idx],
+            "metric": events[idx].metric,
+            "quantity": events[idx].quantity,
+            "ts": events[idx].ts or now,
+            "idempotency_key": events[idx].idempotency_key,
+        }
+        for idx in candidates
+    ]
+    inserted_keys = insert_usage_rows(db, tenant_uuid, rows)
+
+    for idx, row in zip(candidates, rows):
+        key = row["idempotency_key"]
+        if key in inserted_keys:
+            results[idx] = _batch_result(key, UsageIngestStatus.accepted, event_id=row["id"])
+        else:
+            results[idx] = _batch_result(key, UsageIngestStatus.duplicate)
+    # Every event has been accepted, rejected or marked duplicate by now.
+    return [result for result in results if result is not None]
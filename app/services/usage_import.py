@@ -0,0 +1,172 @@
+import csv
+import io
+import json
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator, List
+import uuid
+
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.schemas.usage import UsageEventBatchItem, UsageImportFormat, UsageIngestStatus
+from app.services.rollups import apply_rollups
+from app.services.usage import current_key_month, ingest_usage_batch, tenant_subscription_ids
+from app.services.usage_partitions import idempotency_window_start
+
+settings = get_settings()
+
+COPY_COLUMNS = ("id", "tenant_id", "subscription_id", "metric", "quantity", "ts", "idempotency_key")
+
+
+@dataclass
+class ImportProgress:
+    # Number of records consumed from the source; resume by passing it back as start_offset.
+    offset: int = 0
+    accepted: int = 0
+    duplicates: int = 0
+    rejected: int = 0
+
+
+def iter_ndjson_records(lines: Iterable[str]) -> Iterator[dict | Exception]:
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as exc:
+            yield exc
+
+
+def iter_csv_records(lines: Iterable[str]) -> Iterator[dict | Exception]:
+    for row in csv.DictReader(lines):
+        yield {key: (value if value != "" else None) for key, value in row.items()}
+
+
+def iter_records(lines: Iterable[str], fmt: UsageImportFormat) -> Iterator[dict | Exception]:
+    if fmt == UsageImportFormat.csv:
+        return iter_csv_records(lines)
+    return iter_ndjson_records(lines)
+
+
+def chunked(records: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(records)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _validate_chunk(chunk: list) -> tuple[List[UsageEventBatchItem], int]:
+    valid: List[UsageEventBatchItem] = []
+    rejected = 0
+    for raw in chunk:
+        if isinstance(raw, Exception) or not isinstance(raw, dict):
+            rejected += 1
+            continue
+        try:
+            valid.append(UsageEventBatchItem.model_validate(raw))
+        except ValidationError:
+            rejected += 1
+    return valid, rejected
+
+
+def _copy_chunk(db: Session, tenant_id: str, items: List[UsageEventBatchItem]) -> tuple[int, int, int]:
+    tenant_uuid = uuid.UUID(str(tenant_id))
+    parsed: list[tuple[UsageEventBatchItem, uuid.UUID]] = []
+    rejected = 0
+    for item in items:
+        try:
+            parsed.append((item, uuid.UUID(str(item.subscription_id))))
+        except ValueError:
+            rejected += 1
+    known = tenant_subscription_ids(db, tenant_uuid, (sub_id for _, sub_id in parsed))
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    now = datetime.now(timezone.utc)
+    seen_keys: set[str] = set()
+    duplicates = 0
+    for item, subscription_uuid in parsed:
+        if subscription_uuid not in known:
+            rejected += 1
+            continue
+        if item.idempotency_key in seen_keys:
+            duplicates += 1
+            continue
+        seen_keys.add(item.idempotency_key)
+        writer.writerow(
+            (uuid.uuid4(), tenant_uuid, subscription_uuid, item.metric, item.quantity, (item.ts or now).isoformat(), item.idempotency_key)
+        )
+    if not seen_keys:
+        return 0, duplicates, rejected
+    buffer.seek(0)
+
+    columns = ", ".join(COPY_COLUMNS)
+    raw: Any = db.connection().connection.driver_connection  # psycopg2, for COPY
+    with raw.cursor() as cursor:
+        # COPY cannot skip conflicts, so stage the chunk and let INSERT ... SELECT dedupe.
+        cursor.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS usage_events_import "
+            "(LIKE usage_events INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+        )
+        cursor.copy_expert(f"COPY usage_events_import ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+        month = current_key_month()
+        cursor.execute(
+            "WITH fresh AS ("
+            " INSERT INTO usage_idempotency_keys (tenant_id, idempotency_key, created_month)"
+            " SELECT tenant_id, idempotency_key, %(month)s FROM usage_events_import i"
+            # Keys from the earlier months of the idempotency window sit in other partitions.
+            " WHERE NOT EXISTS (SELECT 1 FROM usage_idempotency_keys k WHERE k.tenant_id = i.tenant_id"
+            " AND k.idempotency_key = i.idempotency_key AND k.created_month >= %(since)s AND k.created_month < %(month)s)"
+            " ON CONFLICT DO NOTHING RETURNING idempotency_key"
+            f") INSERT INTO usage_events ({columns}) SELECT {columns} FROM usage_events_import"
+            " WHERE idempotency_key IN (SELECT idempotency_key FROM fresh)"
+            " RETURNING subscription_id, metric, ts, quantity",
+            {"month": month, "since": idempotency_window_start(settings.usage_idempotency_window_months)},
+        )
+        inserted = cursor.fetchall()
+    apply_rollups(db, tenant_uuid, ((uuid.UUID(str(sub_id)), metric, ts, qty) for sub_id, metric, ts, qty in inserted))
+    accepted = len(inserted)
+    return accepted, duplicates + len(seen_keys) - accepted, rejected
+
+
+def _write_chunk(db: Session, tenant_id: str, items: List[UsageEventBatchItem]) -> tuple[int, int, int]:
+    if not items:
+        return 0, 0, 0
+    if db.get_bind().dialect.name == "postgresql":
+        return _copy_chunk(db, tenant_id, items)
+    results = ingest_usage_batch(db, tenant_id=tenant_id, events=items)
+    accepted = sum(1 for r in results if r["status"] == UsageIngestStatus.accepted)
+    duplicates = sum(1 for r in results if r["status"] == UsageIngestStatus.duplicate)
+    return accepted, duplicates, len(results) - accepted - duplicates
+
+
+def import_usage(
+    db: Session,
+    tenant_id: str,
+    lines: Iterable[str],
+    fmt: UsageImportFormat,
+    chunk_size: int,
+    start_offset: int = 0,
+    on_progress: Callable[[ImportProgress], None] | None = None,
+) -> ImportProgress:
+    """Stream records from ``lines`` into usage_events, committing once per chunk.
+
+    Memory is bounded by ``chunk_size``. After every commit ``on_progress`` receives the
+    running totals; its ``offset`` is a safe resume point.
+    """
+    progress = ImportProgress(offset=start_offset)
+    records = islice(iter_records(lines, fmt), start_offset, None)
+    for chunk in chunked(records, chunk_size):
+        valid, invalid = _validate_chunk(chunk)
+        accepted, duplicates, rejected = _write_chunk(db, tenant_id, valid)
+        db.commit()
+        progress.offset += len(chunk)
+        progress.accepted += accepted
+        progress.duplicates += duplicates
+        progress.rejected += rejected + invalid
+        if on_progress:
+            on_progress(progress)
+    return progress
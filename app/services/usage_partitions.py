@@ -0,0 +1,200 @@
+"""Monthly range partitions of ``usage_events`` and ``usage_idempotency_keys`` (PostgreSQL only).
+
+Partitions are named ``<table>_YYYY_MM`` and cover ``[month start, next month start)``
+in UTC (``ts`` for events, ``created_month`` for keys). Rows outside every partition land
+in ``<table>_default``; creating the partition for their month moves them out. Event
+retention detaches partitions that are older than the retention window and no longer
+inside any open billing period, archives them as gzipped CSV and drops them. Key
+partitions that have left the idempotency window are simply dropped.
+"""
+
+from datetime import date, datetime, timezone
+import gzip
+import os
+from pathlib import Path
+import re
+from typing import Any, Iterable
+
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import Session
+
+from app.domain.models import Subscription, SubscriptionStatus
+
+PARENT_TABLE = "usage_events"
+DEFAULT_PARTITION = "usage_events_default"
+KEYS_TABLE = "usage_idempotency_keys"
+# Partition column of each table, and the expression giving a row's month.
+PARTITION_COLUMNS = {PARENT_TABLE: "ts", KEYS_TABLE: "created_month"}
+_ROW_MONTH = {PARENT_TABLE: "date_trunc('month', ts, 'UTC')", KEYS_TABLE: "created_month"}
+
+
+def month_start(ts: datetime | date) -> datetime:
+    if not isinstance(ts, datetime):
+        return datetime(ts.year, ts.month, 1, tzinfo=timezone.utc)
+    ts = ts.astimezone(timezone.utc) if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+    return ts.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month: datetime, count: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month: datetime, parent: str = PARENT_TABLE) -> str:
+    return f"{parent}_{month:%Y_%m}"
+
+
+def partition_month(name: str, parent: str = PARENT_TABLE) -> datetime | None:
+    match = re.match(rf"^{parent}_(\d{{4}})_(\d{{2}})$", name)
+    if match is None:
+        return None
+    return datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=timezone.utc)
+
+
+def _is_postgres(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def attached_partitions(db: Session, parent: str = PARENT_TABLE) -> set[str]:
+    return set(
+        db.execute(
+            text(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+                "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                "WHERE parent.relname = :parent"
+            ),
+            {"parent": parent},
+        ).scalars()
+    )
+
+
+def create_usage_partitions(db: Session, months: Iterable[datetime], parent: str = PARENT_TABLE) -> list[str]:
+    """Create (and attach) the monthly partitions of ``parent`` for ``months`` that do not exist yet.
+
+    Each partition is built as a plain table, filled with its rows from the default
+    partition and then attached, so months that already received rows are handled too.
+    """
+    if not _is_postgres(db):
+        return []
+    existing = attached_partitions(db, parent)
+    default, column = f"{parent}_default", PARTITION_COLUMNS[parent]
+    created: list[str] = []
+    for month in sorted({month_start(month) for month in months}):
+        name = partition_name(month, parent)
+        if name in existing:
+            continue
+        bounds = {"lo": month, "hi": add_months(month, 1)}
+        db.execute(text(f"CREATE TABLE {name} (LIKE {parent} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+        if default in existing:
+            db.execute(
+                text(
+                    f"WITH moved AS (DELETE FROM {default} WHERE {column} >= :lo AND {column} < :hi RETURNING *) "
+                    f"INSERT INTO {name} SELECT * FROM moved"
+                ),
+                bounds,
+            )
+        lo, hi = (value.isoformat() for value in bounds.values())
+        db.execute(text(f"ALTER TABLE {parent} ATTACH PARTITION {name} FOR VALUES FROM ('{lo}') TO ('{hi}')"))
+        created.append(name)
+    return created
+
+
+def ensure_usage_partitions(
+    db: Session, months_ahead: int, now: datetime | None = None, parent: str = PARENT_TABLE
+) -> list[str]:
+    """Create partitions for this month, the next ``months_ahead`` and any month parked in the default partition."""
+    if not _is_postgres(db):
+        return []
+    current = month_start(now or datetime.now(timezone.utc))
+    months = [add_months(current, offset) for offset in range(months_ahead + 1)]
+    months.extend(db.execute(text(f"SELECT DISTINCT {_ROW_MONTH[parent]} FROM {parent}_default")).scalars())
+    return create_usage_partitions(db, months, parent)
+
+
+def idempotency_window_start(window_months: int, now: datetime | None = None) -> date:
+    """First ``created_month`` whose keys still count: the current month and ``window_months`` before it."""
+    return add_months(month_start(now or datetime.now(timezone.utc)), -window_months).date()
+
+
+def drop_idempotency_key_partitions(db: Session, window_months: int, now: datetime | None = None) -> list[str]:
+    """Drop ``usage_idempotency_keys`` partitions (and default-partition rows) older than the idempotency window.
+
+    Commits after each drop.
+    """
+    if not _is_postgres(db):
+        return []
+    start = month_start(idempotency_window_start(window_months, now))
+    dropped: list[str] = []
+    for name in sorted(attached_partitions(db, KEYS_TABLE)):
+        month = partition_month(name, KEYS_TABLE)
+        if month is not None and month < start:
+            db.execute(text(f"ALTER TABLE {KEYS_TABLE} DETACH PARTITION {name}"))
+            db.execute(text(f"DROP TABLE {name}"))
+            db.commit()
+            dropped.append(name)
+    db.execute(text(f"DELETE FROM {KEYS_TABLE}_default WHERE created_month < :start"), {"start": start.date()})
+    db.commit()
+    return dropped
+
+
+def retention_cutoff(db: Session, retention_months: int, now: datetime | None = None) -> datetime:
+    """Partitions ending on or before this instant may be archived.
+
+    Raw events stay until they are older than the retention window and every open
+    subscription has been invoiced past them.
+    """
+    cutoff = add_months(month_start(now or datetime.now(timezone.utc)), -retention_months)
+    open_from = db.execute(
+        select(func.min(Subscription.current_period_start)).where(Subscription.status != SubscriptionStatus.canceled)
+    ).scalar_one_or_none()
+    if open_from is not None:
+        cutoff = min(cutoff, month_start(open_from))
+    return cutoff
+
+
+def _archive_table(db: Session, name: str, archive_dir: Path) -> Path:
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    # Timestamped so a month re-created by a late backfill never overwrites an earlier archive.
+    path = archive_dir / f"{name}-{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}.csv.gz"
+    partial = path.with_name(path.name + ".partial")
+    raw: Any = db.connection().connection.driver_connection  # psycopg2, for COPY
+    with gzip.open(partial, "wb") as archive, raw.cursor() as cursor:
+        cursor.copy_expert(f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER)", archive)
+    with open(partial, "rb") as archive:
+        os.fsync(archive.fileno())
+    partial.rename(path)
+    return path
+
+
+def archive_usage_partitions(
+    db: Session, archive_dir: str | Path, retention_months: int, now: datetime | None = None
+) -> list[Path]:
+    """Detach, archive and drop partitions older than the retention cutoff; returns the archive files.
+
+    Commits after detaching and after each drop. A table left detached by an interrupted
+    run is picked up again on the next one.
+    """
+    if not _is_postgres(db):
+        return []
+    cutoff = retention_cutoff(db, retention_months, now)
+    for name in sorted(attached_partitions(db)):
+        month = partition_month(name)
+        if month is not None and add_months(month, 1) <= cutoff:
+            db.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+    db.commit()
+
+    attached = attached_partitions(db)
+    detached = [
+        name
+        for name in db.execute(
+            text("SELECT tablename FROM pg_tables WHERE schemaname = current_schema() AND tablename LIKE 'usage\\_events\\_%'")
+        ).scalars()
+        if partition_month(name) is not None and name not in attached
+    ]
+    archived: list[Path] = []
+    for name in sorted(detached):
+        archived.append(_archive_table(db, name, Path(archive_dir)))
+        db.execute(text(f"DROP TABLE {name}"))
+        db.commit()
+    return archived
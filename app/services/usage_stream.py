@@ -0,0 +1,137 @@
+"""Write-behind usage ingestion through a Redis Stream.
+
+With ``BILLING_USAGE_WRITE_BEHIND`` enabled the single-event endpoint validates an event,
+appends it to ``USAGE_STREAM_KEY`` and answers 202. ``app.workers.usage_writer``
+consumers drain the stream in batches into usage_events. Entries are acknowledged and
+deleted only after their batch commits, so delivery is at-least-once; the per-tenant
+idempotency key table turns redeliveries into no-ops.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Sequence
+import uuid
+
+from fastapi import HTTPException, status
+from redis import Redis
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError, ResponseError
+from redis.typing import EncodableT, FieldT
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.domain.models import Subscription
+from app.services.idempotency import idempotency_filter
+from app.services.usage import confirm_duplicates, insert_usage_rows, tenant_subscription_ids
+
+USAGE_STREAM_KEY = "usage:events"
+USAGE_STREAM_GROUP = "usage-writers"
+USAGE_DEAD_LETTER_KEY = "usage:events:dead"
+
+# An entry id and its fields (None once the entry was deleted). Stream replies are bytes:
+# the shared Redis pools leave decode_responses off.
+StreamEntry = tuple[bytes, dict[bytes, bytes] | None]
+
+
+def encode_event(event: dict) -> dict[FieldT, EncodableT]:
+    return {
+        "id": str(event["id"]),
+        "tenant_id": str(event["tenant_id"]),
+        "subscription_id": str(event["subscription_id"]),
+        "metric": event["metric"],
+        "quantity": str(event["quantity"]),
+        "ts": event["ts"].isoformat(),
+        "idempotency_key": event["idempotency_key"],
+    }
+
+
+def decode_event(raw: dict[bytes, bytes]) -> dict:
+    """Parse a stream entry back into a usage_events row; raises ValueError/KeyError if malformed."""
+    fields = {key.decode(): value.decode() for key, value in raw.items()}
+    return {
+        "id": uuid.UUID(fields["id"]),
+        "tenant_id": uuid.UUID(fields["tenant_id"]),
+        "subscription_id": uuid.UUID(fields["subscription_id"]),
+        "metric": fields["metric"],
+        "quantity": Decimal(fields["quantity"]),
+        "ts": datetime.fromisoformat(fields["ts"]),
+        "idempotency_key": fields["idempotency_key"],
+    }
+
+
+async def buffer_usage_event_async(
+    db: AsyncSession,
+    tenant_id: str,
+    subscription_id: str,
+    metric: str,
+    quantity: float,
+    ts: datetime | None,
+    idempotency_key: str,
+    redis_client: aioredis.Redis,
+) -> tuple[dict | None, bool] | None:
+    """Validate an event and append it to the usage stream.
+
+    Returns ``(event, duplicate)`` like ``ingest_usage_event_async`` (``event`` is the row
+    that will be written), or None if the stream is unavailable and the caller should
+    write synchronously instead.
+    """
+    if not idempotency_key:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Idempotency-Key required")
+    tenant_uuid = uuid.UUID(str(tenant_id))
+    subscription_uuid = uuid.UUID(str(subscription_id))
+    found = await db.scalar(
+        select(Subscription.id).where(Subscription.id == subscription_uuid, Subscription.tenant_id == tenant_uuid)
+    )
+    if found is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Subscription not found")
+
+    try:
+        maybe_seen = await idempotency_filter.check_and_add_async(redis_client, tenant_uuid, [idempotency_key])
+        # Keys still waiting in the stream are not in the table yet; the writer drops those repeats.
+        if maybe_seen[0]:
+            duplicates = await db.run_sync(confirm_duplicates, tenant_uuid, [idempotency_key], maybe_seen)
+            if duplicates:
+                return None, True
+        event = {
+            "id": uuid.uuid4(),
+            "tenant_id": tenant_uuid,
+            "subscription_id": subscription_uuid,
+            "metric": metric,
+            "quantity": quantity,
+            "ts": ts or datetime.now(timezone.utc),
+            "idempotency_key": idempotency_key,
+        }
+        await redis_client.xadd(USAGE_STREAM_KEY, encode_event(event))
+    except RedisError:
+        return None
+    return event, False
+
+
+def ensure_consumer_group(redis_client: Redis) -> None:
+    try:
+        redis_client.xgroup_create(USAGE_STREAM_KEY, USAGE_STREAM_GROUP, id="0", mkstream=True)
+    except ResponseError as exc:
+        if "BUSYGROUP" not in str(exc):
+            raise
+
+
+def write_buffered_events(db: Session, events: Sequence[dict]) -> tuple[set[str], list[int]]:
+    """Write decoded stream events (any mix of tenants).
+
+    Returns the inserted idempotency keys as ``"tenant_id:key"`` and the positions of
+    events rejected because their subscription no longer exists.
+    """
+    by_tenant: dict[uuid.UUID, list[int]] = defaultdict(list)
+    for position, event in enumerate(events):
+        by_tenant[event["tenant_id"]].append(position)
+
+    inserted: set[str] = set()
+    rejected: list[int] = []
+    for tenant_uuid, positions in by_tenant.items():
+        known = tenant_subscription_ids(db, tenant_uuid, (events[p]["subscription_id"] for p in positions))
+        rejected.extend(p for p in positions if events[p]["subscription_id"] not in known)
+        rows = [events[p] for p in positions if events[p]["subscription_id"] in known]
+        inserted.update(f"{tenant_uuid}:{key}" for key in insert_usage_rows(db, tenant_uuid, rows))
+    return inserted, sorted(rejected)
@@ -1,13 +1,23 @@
 from datetime import datetime, timedelta, timezone
+import json
+import random
+from typing import Iterable, List, cast
+import uuid
 
 import httpx
+from redis import Redis
+from sqlalchemy import CursorResult, select, update
 from sqlalchemy.orm import Session
 
 from app.api.v1.health import webhook_retry_counter
-from app.domain.models import WebhookDelivery, WebhookDeliveryStatus, WebhookEvent
+from app.domain.models import Tenant, WebhookDelivery, WebhookDeliveryStatus, WebhookEvent
 
 MAX_ATTEMPTS = 5
 BASE_DELAY_SECONDS = 5
+# Retry delays are spread +/-20% so deliveries that failed together do not retry together.
+RETRY_JITTER = 0.2
+RETRYABLE_STATUSES = (WebhookDeliveryStatus.pending, WebhookDeliveryStatus.failed)
+DELIVERY_QUEUE_KEY = "webhooks:deliveries"
 
 
 def create_webhook_event(db: Session, tenant_id: str, event_type: str, payload: dict) -> WebhookDelivery:
@@ -20,27 +30,134 @@ def create_webhook_event(db: Session, tenant_id: str, event_type: str, payload:
     return delivery
 
 
+def enqueue_webhook_delivery(
+    redis_client: Redis | None, delivery_id: str, webhook_url: str, lease: datetime | None
+) -> bool:
+    """Hand a committed delivery to the async delivery engine; False if Redis is unavailable.
+
+    ``lease`` is the delivery's committed ``next_attempt_at``; the engine only posts while
+    the row still carries it.
+    """
+    if redis_client is None:
+        return False
+    message = {"delivery_id": delivery_id, "url": webhook_url, "lease": lease.isoformat() if lease else None}
+    try:
+        redis_client.rpush(DELIVERY_QUEUE_KEY, json.dumps(message))
+    except Exception:
+        return False
+    return True
+
+
+def record_delivery_attempt(delivery: WebhookDelivery, error: str | None) -> WebhookDelivery:
+    delivery.attempts += 1
+    if error is None:
+        delivery.status = WebhookDeliveryStatus.delivered
+        delivery.next_attempt_at = None
+        delivery.last_error = None
+        return delivery
+    if delivery.attempts >= MAX_ATTEMPTS:
+        delivery.status = WebhookDeliveryStatus.dead_lettered
+        delivery.next_attempt_at = None
+    else:
+        delivery.status = WebhookDeliveryStatus.failed
+        delay = BASE_DELAY_SECONDS * (2 ** (delivery.attempts - 1))
+        delay *= random.uniform(1 - RETRY_JITTER, 1 + RETRY_JITTER)
+        delivery.next_attempt_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+        webhook_retry_counter.inc()
+    delivery.last_error = error[:500]
+    return delivery
+
+
 def deliver_webhook(db: Session, delivery_id: str, webhook_url: str) -> WebhookDelivery:
     delivery: WebhookDelivery | None = db.get(WebhookDelivery, delivery_id)
     if delivery is None:
         return None
-    delivery.attempts += 1
+    error = None
     try:
         with httpx.Client(timeout=10.0) as client:
             resp = client.post(webhook_url, json=delivery.event.payload)
             resp.raise_for_status()
-        delivery.status = WebhookDeliveryStatus.delivered
-        delivery.next_attempt_at = None
-        delivery.last_error = None
     except Exception as exc:  # noqa: BLE001
-        if delivery.attempts >= MAX_ATTEMPTS:
-            delivery.status = WebhookDeliveryStatus.dead_lettered
-        else:
-            delivery.status = WebhookDeliveryStatus.failed
-            delay = BASE_DELAY_SECONDS * (2** (delivery.attempts - 1))
-            delivery.next_attempt_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
-            webhook_retry_counter.inc()
-        delivery.last_error = str(exc)
+        error = str(exc)
+    record_delivery_attempt(delivery, error)
     db.add(delivery)
     db.flush()
     return delivery
+
+
+def claim_due_deliveries(db: Session, limit: int, lease_seconds: int) -> list[tuple[str, str, datetime]]:
+    """Lock up to ``limit`` due deliveries and return ``(delivery_id, webhook_url, lease)``.
+
+    Rows locked by another scheduler are skipped. Claimed rows have their next attempt
+    pushed out to ``lease`` (``lease_seconds`` from now) so they are not handed out again
+    while in flight; if the worker dies they become due again once the lease runs out.
+    """
+    now = datetime.now(timezone.utc)
+    rows = db.execute(
+        select(WebhookDelivery, Tenant.webhook_url)
+        .join(WebhookEvent, WebhookEvent.id == WebhookDelivery.event_id)
+        .join(Tenant, Tenant.id == WebhookEvent.tenant_id)
+        .where(WebhookDelivery.status.in_(RETRYABLE_STATUSES), WebhookDelivery.next_attempt_at <= now)
+        .order_by(WebhookDelivery.next_attempt_at)
+        .limit(limit)
+        .with_for_update(of=WebhookDelivery, skip_locked=True)
+    ).all()
+    lease = now + timedelta(seconds=lease_seconds)
+    claimed: list[tuple[str, str, datetime]] = []
+    for delivery, webhook_url in rows:
+        if not webhook_url:
+            delivery.status = WebhookDeliveryStatus.dead_lettered
+            delivery.next_attempt_at = None
+            delivery.last_error = "Tenant has no webhook_url"
+            continue
+        claimed.append((str(delivery.id), webhook_url, lease))
+    if claimed:
+        db.execute(
+            update(WebhookDelivery)
+            .where(WebhookDelivery.id.in_([uuid.UUID(delivery_id) for delivery_id, *_ in claimed]))
+            .values(next_attempt_at=lease)
+            .execution_options(synchronize_session=False)
+        )
+    db.flush()
+    return claimed
+
+
+def list_dead_letters(db: Session, tenant_id: str, limit: int = 100) -> List[WebhookDelivery]:
+    return list(
+        db.scalars(
+            select(WebhookDelivery)
+            .join(WebhookEvent, WebhookEvent.id == WebhookDelivery.event_id)
+            .where(
+                WebhookEvent.tenant_id == uuid.UUID(str(tenant_id)),
+                WebhookDelivery.status == WebhookDeliveryStatus.dead_lettered,
+            )
+            .order_by(WebhookDelivery.created_at.desc())
+            .limit(limit)
+        )
+    )
+
+
+def replay_dead_letters(db: Session, tenant_id: str, delivery_ids: Iterable[str] | None = None) -> int:
+    """Make dead-lettered deliveries due again with a fresh attempt budget; returns the count."""
+    stmt = update(WebhookDelivery).where(
+        WebhookDelivery.status == WebhookDeliveryStatus.dead_lettered,
+        WebhookDelivery.event_id.in_(
+            select(WebhookEvent.id).where(WebhookEvent.tenant_id == uuid.UUID(str(tenant_id)))
+        ),
+    )
+    if delivery_ids is not None:
+        try:
+            ids = [uuid.UUID(str(delivery_id)) for delivery_id in delivery_ids]
+        except ValueError as exc:
+            raise ValueError("Invalid delivery id") from exc
+        stmt = stmt.where(WebhookDelivery.id.in_(ids))
+    result = db.execute(
+        stmt.values(
+            status=WebhookDeliveryStatus.pending,
+            attempts=0,
+            next_attempt_at=datetime.now(timezone.utc),
+            last_error=None,
+        ).execution_options(synchronize_session=False)
+    )
+    # UPDATE statements return a CursorResult, which carries the matched row count.
+    return cast(CursorResult, result).rowcount
@@ -0,0 +1,77 @@
+"""Backfill usage_events from an NDJSON or CSV file.
+
+    python -m app.workers.import_usage --tenant-id <uuid> --format csv usage.csv
+
+Progress is logged after every committed chunk and written to the checkpoint
+file; re-running the same command resumes from the last checkpoint.
+"""
+
+import argparse
+import os
+import sys
+
+import structlog
+
+from app.config import get_settings
+from app.database import SessionLocal
+from app.logging_config import setup_logging
+from app.schemas.usage import UsageImportFormat
+from app.services.usage_import import ImportProgress, import_usage
+
+
+def _read_checkpoint(path: str) -> int:
+    try:
+        with open(path) as fh:
+            return int(fh.read().strip() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def _write_checkpoint(path: str, offset: int) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as fh:
+        fh.write(str(offset))
+    os.replace(tmp_path, path)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="File to import, or - for stdin")
+    parser.add_argument("--tenant-id", required=True)
+    parser.add_argument("--format", dest="fmt", choices=[f.value for f in UsageImportFormat], default="ndjson")
+    parser.add_argument("--chunk-size", type=int, default=get_settings().usage_import_chunk_size)
+    parser.add_argument("--offset", type=int, default=None, help="Override the checkpointed start offset")
+    parser.add_argument("--checkpoint-file", default=None, help="Defaults to <path>.checkpoint")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    logger = structlog.get_logger()
+    checkpoint = args.checkpoint_file or (None if args.path == "-" else f"{args.path}.checkpoint")
+    start_offset = args.offset if args.offset is not None else (_read_checkpoint(checkpoint) if checkpoint else 0)
+
+    def _on_progress(progress: ImportProgress) -> None:
+        if checkpoint:
+            _write_checkpoint(checkpoint, progress.offset)
+        logger.info("usage_import_progress", tenant_id=args.tenant_id, **vars(progress))
+
+    source = sys.stdin if args.path == "-" else open(args.path, newline="", encoding="utf-8")
+    try:
+        with SessionLocal() as db:
+            progress = import_usage(
+                db,
+                tenant_id=args.tenant_id,
+                lines=source,
+                fmt=UsageImportFormat(args.fmt),
+                chunk_size=args.chunk_size,
+                start_offset=start_offset,
+                on_progress=_on_progress,
+            )
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    logger.info("usage_import_complete", tenant_id=args.tenant_id, **vars(progress))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+"""Period-close scheduler for invoice runs.
+
+    python -m app.workers.invoice_scheduler [--once]
+
+Every ``BILLING_INVOICE_SCHEDULE_INTERVAL_SECONDS`` it enqueues ``invoice_fanout_job`` on
+the ``billing`` queue; RQ workers (``make worker``) do the rest. A Redis key per tick
+keeps several schedulers from starting the same run twice.
+"""
+
+import argparse
+import sys
+import time
+
+import structlog
+
+from app.config import get_settings
+from app.logging_config import setup_logging
+from app.redis_client import get_redis
+from app.workers.jobs import invoice_fanout_job
+from app.workers.queue import get_queue
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+
+def schedule_tick(now: float) -> bool:
+    interval = settings.invoice_schedule_interval_seconds
+    tick = int(now // interval)
+    if not get_redis().set(f"invoice_run:tick:{tick}", 1, nx=True, ex=2 * interval):
+        return False
+    job = get_queue("billing").enqueue(invoice_fanout_job)
+    logger.info("invoice_run_scheduled", tick=tick, job_id=job.id)
+    return True
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--once", action="store_true", help="enqueue one run now and exit")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    if args.once:
+        job = get_queue("billing").enqueue(invoice_fanout_job)
+        logger.info("invoice_run_scheduled", job_id=job.id)
+        return 0
+    interval = settings.invoice_schedule_interval_seconds
+    while True:
+        schedule_tick(time.time())
+        time.sleep(interval - time.time() % interval)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
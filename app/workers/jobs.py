@@ -1,6 +1,31 @@
+from datetime import datetime, timedelta, timezone
+import uuid
+
+from rq import Queue
+import structlog
+from sqlalchemy import select
+
+from app.config import get_settings
 from app.database import SessionLocal
-from app.services.invoices import run_invoicing
+from app.domain.models import Tenant, TenantRevenueMV
+from app.redis_client import get_redis
+from app.services.invoice_runs import finish_run, record_chunk, run_progress, run_tenants, start_run
+from app.services.invoices import due_subscription_ranges, invoice_due_range, run_invoicing
+from app.services.revenue import rebuild_revenue_mv
+from app.services.revenue_snapshots import take_revenue_snapshot
+from app.services.rollups import hour_bucket, reconcile_rollups
+from app.services.usage_partitions import (
+    KEYS_TABLE,
+    PARENT_TABLE,
+    archive_usage_partitions,
+    drop_idempotency_key_partitions,
+    ensure_usage_partitions,
+)
 from app.services.webhooks import deliver_webhook
+from app.workers.queue import get_queue
+
+settings = get_settings()
+logger = structlog.get_logger()
 
 
 def invoice_run_job(tenant_id: str) -> list[str]:
@@ -11,8 +36,146 @@ def invoice_run_job(tenant_id: str) -> list[str]:
         return [str(inv.id) for inv in invoices]
 
 
+def invoice_fanout_job(cutoff: str | None = None, chunk_size: int | None = None) -> str:
+    """Coordinator for period close: one invoice_chunk_job per range of due subscriptions.
+
+    Ranges hold at most ``BILLING_INVOICE_JOB_CHUNK_SIZE`` subscriptions of a single tenant,
+    so a large tenant is spread over many workers. Returns the run id to poll with
+    ``run_progress``.
+    """
+    cutoff_at = datetime.fromisoformat(cutoff) if cutoff else datetime.now(timezone.utc)
+    with SessionLocal() as db:
+        ranges = due_subscription_ranges(db, cutoff_at, chunk_size or settings.invoice_job_chunk_size)
+    run_id = start_run(get_redis(), cutoff_at, len(ranges), sum(count for *_, count in ranges))
+    queue = get_queue("billing")
+    for offset in range(0, len(ranges), 1000):
+        queue.enqueue_many(
+            [
+                Queue.prepare_data(
+                    invoice_chunk_job,
+                    args=(run_id, str(tenant_id), str(first_id), str(end_id) if end_id else None, cutoff_at.isoformat()),
+                )
+                for tenant_id, first_id, end_id, _ in ranges[offset : offset + 1000]
+            ]
+        )
+    logger.info("invoice_run_started", run_id=run_id, chunks=len(ranges), cutoff=cutoff_at.isoformat())
+    return run_id
+
+
+def invoice_chunk_job(run_id: str, tenant_id: str, first_id: str, end_id: str | None, cutoff: str) -> int:
+    """Invoice one range of due subscriptions in its own transaction; returns invoices created.
+
+    The range's first subscription id identifies the chunk in the run's progress.
+    """
+    redis_client = get_redis()
+    try:
+        with SessionLocal() as db:
+            invoice_ids = invoice_due_range(db, tenant_id, first_id, end_id, datetime.fromisoformat(cutoff))
+            db.commit()
+    except Exception:
+        # The range stays due and is picked up by the next run; the reducer still runs.
+        if record_chunk(redis_client, run_id, first_id, tenant_id, None):
+            get_queue("billing").enqueue(invoice_reduce_job, run_id)
+        raise
+    if record_chunk(redis_client, run_id, first_id, tenant_id, len(invoice_ids)):
+        get_queue("billing").enqueue(invoice_reduce_job, run_id)
+    return len(invoice_ids)
+
+
+def invoice_reduce_job(run_id: str) -> int:
+    """Final step of a fanned-out run: refresh revenue metrics of every tenant it invoiced."""
+    redis_client = get_redis()
+    tenant_ids = run_tenants(redis_client, run_id)
+    for tid in tenant_ids:
+        with SessionLocal() as db:
+            rebuild_revenue_mv(db, uuid.UUID(tid))
+            db.commit()
+    finish_run(redis_client, run_id)
+    logger.info("invoice_run_finished", run_id=run_id, **run_progress(redis_client, run_id))
+    return len(tenant_ids)
+
+
 def webhook_delivery_job(delivery_id: str, webhook_url: str) -> str:
     with SessionLocal() as db:
         delivery = deliver_webhook(db, delivery_id, webhook_url)
         db.commit()
         return str(delivery.id) if delivery else ""
+
+
+def usage_rollup_reconcile_job(tenant_id: str, hours: int = 24, repair: bool = True) -> int:
+    """Check the last settled ``hours`` of rollups against raw events; returns mismatches found."""
+    end = hour_bucket(datetime.now(timezone.utc)) - timedelta(hours=1)
+    with SessionLocal() as db:
+        mismatches = reconcile_rollups(db, uuid.UUID(str(tenant_id)), end - timedelta(hours=hours), end, repair=repair)
+        db.commit()
+        return len(mismatches)
+
+
+def revenue_rebuild_job(tenant_id: str | None = None) -> int:
+    """Periodic full rebuild of tenant revenue rows; corrects drift in the incremental deltas."""
+    with SessionLocal() as db:
+        tenant_ids = [uuid.UUID(str(tenant_id))] if tenant_id else list(db.scalars(select(Tenant.id)))
+    for tid in tenant_ids:
+        with SessionLocal() as db:
+            mv = db.get(TenantRevenueMV, tid)
+            before = (mv.monthly_recurring_revenue, mv.invoiced_revenue) if mv else None
+            mv = rebuild_revenue_mv(db, tid)
+            after = (mv.monthly_recurring_revenue, mv.invoiced_revenue)
+            db.commit()
+        if before is not None and before != after:
+            logger.warning(
+                "revenue_drift_corrected",
+                tenant_id=str(tid),
+                before=[str(v) for v in before],
+                after=[str(v) for v in after],
+            )
+    return len(tenant_ids)
+
+
+def revenue_snapshot_job(tenant_id: str | None = None) -> int:
+    """Snapshot the UTC day that just ended for every tenant (or one); returns rows written.
+
+    One transaction per tenant. Run after midnight so the snapshot sees all of the day's invoices.
+    """
+    day = datetime.now(timezone.utc).date() - timedelta(days=1)
+    with SessionLocal() as db:
+        tenant_ids = [uuid.UUID(str(tenant_id))] if tenant_id else list(db.scalars(select(Tenant.id)))
+    written = 0
+    for tid in tenant_ids:
+        with SessionLocal() as db:
+            written += len(take_revenue_snapshot(db, tid, day))
+            db.commit()
+    logger.info("revenue_snapshot_taken", date=day.isoformat(), tenants=len(tenant_ids), rows=written)
+    return written
+
+
+def usage_partition_maintenance_job(months_ahead: int | None = None) -> list[str]:
+    """Create upcoming usage_events and usage_idempotency_keys partitions and drop expired key partitions.
+
+    Run daily so writes never hit the default partitions.
+    """
+    months_ahead = settings.usage_partition_months_ahead if months_ahead is None else months_ahead
+    with SessionLocal() as db:
+        created = [
+            name for parent in (PARENT_TABLE, KEYS_TABLE) for name in ensure_usage_partitions(db, months_ahead, parent=parent)
+        ]
+        db.commit()
+        dropped = drop_idempotency_key_partitions(db, settings.usage_idempotency_window_months)
+    if created:
+        logger.info("usage_partitions_created", partitions=created)
+    if dropped:
+        logger.info("idempotency_key_partitions_dropped", partitions=dropped)
+    return created
+
+
+def usage_retention_job(retention_months: int | None = None) -> list[str]:
+    """Archive and drop usage_events partitions past retention whose billing periods have closed."""
+    with SessionLocal() as db:
+        archived = archive_usage_partitions(
+            db,
+            settings.usage_archive_dir,
+            settings.usage_retention_months if retention_months is None else retention_months,
+        )
+    for path in archived:
+        logger.info("usage_partition_archived", path=str(path))
+    return [str(path) for path in archived]
@@ -1,11 +1,32 @@
-from redis import Redis
-from rq import Queue
+from rq import Queue, Worker
 
 from app.config import get_settings
+from app.profiling import active_worker_profile, profile_worker_job
+from app.redis_client import get_redis
+from app.services.catalog import warm_catalog_cache
 
 settings = get_settings()
 
 
 def get_queue(name: str = "default") -> Queue:
-    redis = Redis.from_url(settings.redis_url)
-    return Queue(name, connection=redis)
+    return Queue(name, connection=get_redis())
+
+
+class BillingWorker(Worker):
+    """RQ worker that loads the plan/product catalog before taking jobs.
+
+    Work horses fork from this process, so every job starts with a warm catalog cache.
+    With profiling enabled, a horse samples its job while a worker profile is active.
+    Use with ``rq worker -w app.workers.queue.BillingWorker``.
+    """
+
+    def work(self, *args, **kwargs):
+        warm_catalog_cache()
+        return super().work(*args, **kwargs)
+
+    def perform_job(self, job, queue):
+        session = active_worker_profile(self.connection) if settings.profiling_enabled else None
+        if session is None:
+            return super().perform_job(job, queue)
+        with profile_worker_job(self.connection, session):
+            return super().perform_job(job, queue)
@@ -0,0 +1,27 @@
+"""Take yesterday's revenue snapshots; meant to run daily from cron (after midnight UTC).
+
+    python -m app.workers.revenue_snapshots [--tenant-id UUID]
+
+Writes ``revenue_snapshots`` rows for every tenant, which the MRR history, plan breakdown
+and product revenue endpoints read. Running it again refreshes yesterday's rows.
+"""
+
+import argparse
+import sys
+
+from app.logging_config import setup_logging
+from app.workers.jobs import revenue_snapshot_job
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tenant-id", default=None, help="only snapshot this tenant")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    revenue_snapshot_job(args.tenant_id)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
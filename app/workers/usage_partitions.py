@@ -0,0 +1,33 @@
+"""Maintain usage_events and usage_idempotency_keys partitions; meant to run daily from cron.
+
+    python -m app.workers.usage_partitions [--archive] [--months-ahead N]
+
+Creates the upcoming monthly partitions (and any month parked in the default
+partition) and drops idempotency key partitions that left the idempotency window.
+With ``--archive`` it also detaches, archives to ``BILLING_USAGE_ARCHIVE_DIR`` and
+drops usage_events partitions past retention.
+"""
+
+import argparse
+import sys
+
+from app.logging_config import setup_logging
+from app.workers.jobs import usage_partition_maintenance_job, usage_retention_job
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--months-ahead", type=int, default=None)
+    parser.add_argument("--archive", action="store_true", help="also archive partitions past retention")
+    parser.add_argument("--retention-months", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    usage_partition_maintenance_job(args.months_ahead)
+    if args.archive:
+        usage_retention_job(args.retention_months)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
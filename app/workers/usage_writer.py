@@ -0,0 +1,145 @@
+"""Drain the write-behind usage stream into usage_events.
+
+    python -m app.workers.usage_writer [--consumer NAME]
+
+Consumers share one Redis consumer group, so run as many as throughput needs. Each
+batch is committed in one transaction and only then acknowledged; entries left
+pending by a crashed consumer are reclaimed with XAUTOCLAIM after
+``BILLING_USAGE_STREAM_CLAIM_IDLE_MS``. Malformed events and events whose
+subscription is gone are moved to ``usage:events:dead``.
+"""
+
+import argparse
+import os
+import socket
+import sys
+import time
+from typing import Callable, cast
+
+from redis import Redis
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.orm import Session
+import structlog
+
+from app.api.v1.health import usage_stream_dead_letters
+from app.config import get_settings
+from app.database import SessionLocal
+from app.logging_config import setup_logging
+from app.redis_client import get_redis
+from app.services.usage_stream import (
+    USAGE_DEAD_LETTER_KEY,
+    USAGE_STREAM_GROUP,
+    USAGE_STREAM_KEY,
+    StreamEntry,
+    decode_event,
+    ensure_consumer_group,
+    write_buffered_events,
+)
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+
+def _finish(redis_client: Redis, entry_ids: list, dead: list[tuple[dict, str]]) -> None:
+    pipe = redis_client.pipeline(transaction=True)
+    for fields, error in dead:
+        pipe.xadd(USAGE_DEAD_LETTER_KEY, {**fields, "error": error})
+    pipe.xack(USAGE_STREAM_KEY, USAGE_STREAM_GROUP, *entry_ids)
+    pipe.xdel(USAGE_STREAM_KEY, *entry_ids)
+    pipe.execute()
+    if dead:
+        usage_stream_dead_letters.inc(len(dead))
+
+
+def process_entries(
+    redis_client: Redis,
+    batch: list[StreamEntry],
+    session_factory: Callable[[], Session] = SessionLocal,
+) -> int:
+    """Write one batch of stream entries and acknowledge it; returns the number of new events."""
+    entries = [(entry_id, fields) for entry_id, fields in batch if fields]
+    if not entries:
+        return 0
+    events: list[dict] = []
+    decoded_ids: list = []
+    dead: list[tuple[dict, str]] = []
+    for entry_id, fields in entries:
+        try:
+            events.append(decode_event(fields))
+            decoded_ids.append(entry_id)
+        except (KeyError, ValueError) as exc:
+            dead.append((fields, f"malformed: {exc}"))
+    try:
+        with session_factory() as db:
+            inserted, rejected = write_buffered_events(db, events)
+            db.commit()
+    except (DataError, IntegrityError):
+        if len(entries) == 1:
+            logger.exception("usage_stream_entry_failed", entry_id=entries[0][0])
+            _finish(redis_client, [entries[0][0]], [(entries[0][1], "write failed")])
+            return 0
+        # Isolate the bad entry so one poison event cannot stall the whole stream.
+        return sum(process_entries(redis_client, [entry], session_factory) for entry in entries)
+    fields_by_id = dict(entries)
+    dead.extend((fields_by_id[decoded_ids[position]], "subscription not found") for position in rejected)
+    _finish(redis_client, [entry_id for entry_id, _ in entries], dead)
+    return len(inserted)
+
+
+def reclaim_stale(redis_client: Redis, consumer: str, count: int) -> list[StreamEntry]:
+    reply = redis_client.xautoclaim(
+        USAGE_STREAM_KEY,
+        USAGE_STREAM_GROUP,
+        consumer,
+        min_idle_time=settings.usage_stream_claim_idle_ms,
+        start_id="0-0",
+        count=count,
+    )
+    # [next start id, claimed entries, ids deleted meanwhile (Redis 7+)]
+    claimed: list[StreamEntry] = cast(list, reply)[1]
+    return claimed
+
+
+def run(consumer: str) -> None:
+    redis_client = get_redis()
+    ensure_consumer_group(redis_client)
+    batch_size = settings.usage_stream_batch_size
+    logger.info("usage_writer_started", consumer=consumer, batch_size=batch_size)
+    next_reclaim = 0.0
+    while True:
+        try:
+            if time.monotonic() >= next_reclaim:
+                stale = reclaim_stale(redis_client, consumer, batch_size)
+                if stale:
+                    process_entries(redis_client, stale)
+                    continue
+                next_reclaim = time.monotonic() + settings.usage_stream_claim_idle_ms / 1000
+            reply = redis_client.xreadgroup(
+                USAGE_STREAM_GROUP,
+                consumer,
+                {USAGE_STREAM_KEY: ">"},
+                count=batch_size,
+                block=settings.usage_stream_block_ms,
+            )
+            # One [stream name, entries] pair per stream read; None if the block timed out.
+            streams: list[tuple[bytes, list[StreamEntry]]] = cast(list, reply) or []
+            for _stream, entries in streams:
+                process_entries(redis_client, entries)
+        except Exception:
+            # Unacknowledged entries stay pending and are reclaimed once idle.
+            logger.exception("usage_writer_batch_failed", consumer=consumer)
+            time.sleep(1)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--consumer", default=f"{socket.gethostname()}-{os.getpid()}")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    run(args.consumer)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
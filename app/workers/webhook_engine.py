@@ -0,0 +1,237 @@
+"""Async webhook delivery engine.
+
+    python -m app.workers.webhook_engine
+
+Pops deliveries queued by the API from Redis and posts them through one
+long-lived httpx.AsyncClient (pooled keep-alive connections, HTTP/2 unless
+``BILLING_WEBHOOK_HTTP2`` is off), bounded by a global and a per-host
+concurrency limit. A delivery takes its host's slot before a global one, so a
+slow host only ever ties up its own share of the engine. Deliveries lost from
+the queue, or turned away because their host is backed up, stay pending in the
+database and are picked up by the retry scheduler once their lease runs out.
+
+Each delivery arrives with the lease it was handed out under. Before posting,
+the engine claims the row with a conditional update on that lease and a
+retryable status, and records the result only while it still holds its own
+lease. A copy handed out again after the lease ran out therefore posts once.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+import json
+from typing import AsyncIterator, Callable, cast
+from urllib.parse import urlsplit
+import uuid
+
+import httpx
+from redis import asyncio as aioredis
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+import structlog
+
+from app.api.v1.health import webhook_deliveries_inflight
+from app.config import get_settings
+from app.database import SessionLocal
+from app.domain.models import WebhookDelivery, WebhookDeliveryStatus, WebhookEvent
+from app.logging_config import setup_logging
+from app.services.webhooks import DELIVERY_QUEUE_KEY, RETRYABLE_STATUSES, record_delivery_attempt
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+# Deliveries a host may have accepted (queued or in flight), as a multiple of its concurrency.
+HOST_BACKLOG_FACTOR = 2
+
+
+class _Host:
+    """Concurrency limit for one receiving host; dropped once nothing refers to it."""
+
+    def __init__(self, limit: int):
+        self.slots = asyncio.Semaphore(limit)
+        self.refs = 0
+        self.queued = 0
+
+
+class WebhookDispatcher:
+    def __init__(
+        self,
+        max_concurrency: int | None = None,
+        per_host_concurrency: int | None = None,
+        session_factory: Callable[[], Session] = SessionLocal,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self.max_concurrency = max_concurrency or settings.webhook_max_concurrency
+        self.per_host_concurrency = per_host_concurrency or settings.webhook_per_host_concurrency
+        self._session_factory = session_factory
+        self._client = httpx.AsyncClient(
+            timeout=settings.webhook_timeout_seconds,
+            http2=settings.webhook_http2,
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=self.max_concurrency,
+                keepalive_expiry=settings.webhook_keepalive_seconds,
+            ),
+            transport=transport,
+        )
+        # Posts in flight; taken only once the delivery holds its host's slot.
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        # Deliveries accepted by submit(), queued or in flight.
+        self._accepted = asyncio.Semaphore(self.max_concurrency)
+        self._hosts: dict[str, _Host] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    @property
+    def idle_slots(self) -> int:
+        return self.max_concurrency - len(self._tasks)
+
+    def _hold(self, host: str) -> _Host:
+        entry = self._hosts.get(host)
+        if entry is None:
+            entry = self._hosts[host] = _Host(self.per_host_concurrency)
+        entry.refs += 1
+        return entry
+
+    def _release(self, host: str) -> None:
+        entry = self._hosts[host]
+        entry.refs -= 1
+        if not entry.refs:
+            del self._hosts[host]
+
+    @asynccontextmanager
+    async def _host_slot(self, host: str) -> AsyncIterator[None]:
+        entry = self._hold(host)
+        try:
+            async with entry.slots, self._slots:
+                yield
+        finally:
+            self._release(host)
+
+    async def submit(self, delivery_id: str, url: str, lease: datetime | None = None) -> bool:
+        """Queue a delivery; False if its host is backed up and it was left to the retry scheduler.
+
+        Blocks while the engine is saturated so callers stop pulling more work.
+        """
+        host = urlsplit(url).netloc
+        entry = self._hosts.get(host)
+        if entry is not None and entry.queued >= self.per_host_concurrency * HOST_BACKLOG_FACTOR:
+            logger.info("webhook_delivery_deferred", delivery_id=delivery_id, host=host)
+            return False
+        entry = self._hold(host)
+        entry.queued += 1
+        try:
+            await self._accepted.acquire()
+        except BaseException:
+            entry.queued -= 1
+            self._release(host)
+            raise
+        task = asyncio.create_task(self._run(delivery_id, url, lease, host))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _run(self, delivery_id: str, url: str, lease: datetime | None, host: str) -> None:
+        webhook_deliveries_inflight.inc()
+        try:
+            await self.deliver(delivery_id, url, lease)
+        except Exception:  # noqa: BLE001
+            logger.exception("webhook_delivery_crashed", delivery_id=delivery_id)
+        finally:
+            webhook_deliveries_inflight.dec()
+            self._accepted.release()
+            self._hosts[host].queued -= 1
+            self._release(host)
+
+    async def deliver(
+        self, delivery_id: str, url: str, lease: datetime | None = None
+    ) -> WebhookDeliveryStatus | None:
+        """Post one delivery handed out under ``lease``; None if it was not ours to post."""
+        claim = await asyncio.to_thread(self._claim, delivery_id, lease)
+        if claim is None:
+            logger.info("webhook_delivery_skipped", delivery_id=delivery_id)
+            return None
+        payload, claimed_until = claim
+        error = None
+        async with self._host_slot(urlsplit(url).netloc):
+            try:
+                resp = await self._client.post(url, json=payload)
+                resp.raise_for_status()
+            except Exception as exc:  # noqa: BLE001
+                error = str(exc) or exc.__class__.__name__
+        return await asyncio.to_thread(self._record_result, delivery_id, claimed_until, error)
+
+    @staticmethod
+    def _holds(delivery_id: str, lease: datetime | None):
+        return (
+            WebhookDelivery.id == uuid.UUID(str(delivery_id)),
+            WebhookDelivery.status.in_(RETRYABLE_STATUSES),
+            WebhookDelivery.next_attempt_at == lease if lease else WebhookDelivery.next_attempt_at.is_(None),
+        )
+
+    def _claim(self, delivery_id: str, lease: datetime | None) -> tuple[dict, datetime] | None:
+        """Move the row from ``lease`` to a lease of our own; None if it is final or handed out again."""
+        claimed_until = datetime.now(timezone.utc) + timedelta(seconds=settings.webhook_claim_lease_seconds)
+        with self._session_factory() as db:
+            event_id = db.execute(
+                update(WebhookDelivery)
+                .where(*self._holds(delivery_id, lease))
+                .values(next_attempt_at=claimed_until)
+                .returning(WebhookDelivery.event_id)
+                .execution_options(synchronize_session=False)
+            ).scalar_one_or_none()
+            if event_id is None:
+                return None
+            payload = db.execute(select(WebhookEvent.payload).where(WebhookEvent.id == event_id)).scalar_one()
+            db.commit()
+            return payload, claimed_until
+
+    def _record_result(
+        self, delivery_id: str, claimed_until: datetime, error: str | None
+    ) -> WebhookDeliveryStatus | None:
+        with self._session_factory() as db:
+            delivery = db.scalars(
+                select(WebhookDelivery).where(*self._holds(delivery_id, claimed_until)).with_for_update()
+            ).first()
+            if delivery is None:
+                # Our lease ran out mid-post and the row was handed out again; that attempt records.
+                logger.warning("webhook_delivery_lease_lost", delivery_id=delivery_id)
+                return None
+            record_delivery_attempt(delivery, error)
+            db.commit()
+            return delivery.status
+
+    async def drain(self) -> None:
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    async def aclose(self) -> None:
+        await self.drain()
+        await self._client.aclose()
+
+
+async def run(batch_size: int = 100) -> None:
+    redis = aioredis.from_url(settings.redis_url)
+    dispatcher = WebhookDispatcher()
+    logger.info(
+        "webhook_engine_started",
+        max_concurrency=dispatcher.max_concurrency,
+        per_host_concurrency=dispatcher.per_host_concurrency,
+    )
+    try:
+        while True:
+            messages = await redis.lpop(DELIVERY_QUEUE_KEY, batch_size)
+            if not messages:
+                popped = await redis.blpop([DELIVERY_QUEUE_KEY], timeout=5)
+                messages = [popped[1]] if popped else []
+            for raw in messages:
+                message = json.loads(cast(bytes, raw))
+                lease = datetime.fromisoformat(message["lease"]) if message.get("lease") else None
+                await dispatcher.submit(message["delivery_id"], message["url"], lease)
+    finally:
+        await dispatcher.aclose()
+        await redis.aclose()
+
+
+if __name__ == "__main__":
+    setup_logging()
+    asyncio.run(run())
@@ -0,0 +1,51 @@
+"""Retry scheduler for webhook deliveries.
+
+    python -m app.workers.webhook_scheduler
+
+Claims due deliveries in batches with ``FOR UPDATE SKIP LOCKED`` (so any number of
+schedulers can run side by side) and delivers them through an in-process
+WebhookDispatcher. Claims never exceed the dispatcher's free capacity.
+"""
+
+import asyncio
+from datetime import datetime
+import random
+
+import structlog
+
+from app.config import get_settings
+from app.database import SessionLocal
+from app.logging_config import setup_logging
+from app.services.webhooks import claim_due_deliveries
+from app.workers.webhook_engine import WebhookDispatcher
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+
+def claim_batch(limit: int) -> list[tuple[str, str, datetime]]:
+    with SessionLocal() as db:
+        claimed = claim_due_deliveries(db, limit, settings.webhook_claim_lease_seconds)
+        db.commit()
+        return claimed
+
+
+async def run() -> None:
+    dispatcher = WebhookDispatcher()
+    logger.info("webhook_scheduler_started", batch_size=settings.webhook_claim_batch_size)
+    try:
+        while True:
+            limit = min(settings.webhook_claim_batch_size, dispatcher.idle_slots)
+            claimed = await asyncio.to_thread(claim_batch, limit) if limit else []
+            for delivery_id, url, lease in claimed:
+                await dispatcher.submit(delivery_id, url, lease)
+            if not limit or len(claimed) < limit:
+                # Jittered so parallel schedulers do not poll in lockstep.
+                await asyncio.sleep(settings.webhook_poll_interval_seconds * random.uniform(0.5, 1.5))
+    finally:
+        await dispatcher.aclose()
+
+
+if __name__ == "__main__":
+    setup_logging()
+    asyncio.run(run())
@@ -0,0 +1,60 @@
+"""Per-request cost of the auth dependency chain.
+
+    python benchmarks/bench_auth.py --requests 20000
+
+Times token verification with each JWT backend, a claims cache hit, and the full
+``get_current_user`` chain (claims plus a principal cache hit) against SQLite.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app import security  # noqa: E402
+from app.database import Base  # noqa: E402
+from app.dependencies import get_current_user  # noqa: E402
+from app.domain.models import Role, Tenant, User  # noqa: E402
+
+
+def measure(label: str, requests: int, fn) -> float:
+    started = time.perf_counter()
+    for _ in range(requests):
+        fn()
+    per_request = (time.perf_counter() - started) / requests * 1e6
+    print(f"{label:<22} {per_request:8.2f} us/request")
+    return per_request
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    engine = create_engine(f"sqlite+pysqlite:///{tempfile.mkdtemp()}/bench.db")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    tenant = Tenant(id=uuid.uuid4(), name="bench-auth")
+    user = User(id=uuid.uuid4(), tenant_id=tenant.id, email="m2m@example.com", hashed_password="x", role=Role.admin)
+    db.add_all([tenant, user])
+    db.commit()
+    token = security.create_access_token(str(user.id), str(tenant.id))
+
+    jose = measure("jose verify", args.requests, lambda: security._decode_jose(token))
+    measure("hmac verify", args.requests, lambda: security._decode_hmac(token))
+    security.token_cache.clear()
+    cached = measure("claims cache hit", args.requests, lambda: security.decode_token(token))
+    print(f"cache speedup          {jose / cached:8.1f}x")
+    get_current_user(db, token)
+    measure("get_current_user", args.requests, lambda: get_current_user(db, token))
+
+
+if __name__ == "__main__":
+    main()
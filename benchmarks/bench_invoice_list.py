@@ -0,0 +1,115 @@
+"""Compare OFFSET paging with keyset paging of the invoice list at increasing depth.
+
+    python benchmarks/bench_invoice_list.py --invoices 200000 --page-size 50
+
+Set BENCH_DATABASE_URL to run against PostgreSQL (the schema is created and
+dropped); defaults to a temporary SQLite file.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import create_engine, insert, select  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine  # noqa: E402
+from sqlalchemy.orm import selectinload  # noqa: E402
+
+from app.database import Base, async_database_url  # noqa: E402
+from app.domain.models import Invoice, InvoiceItem, InvoiceStatus, Tenant  # noqa: E402
+from app.services.invoices import list_invoices_async  # noqa: E402
+
+
+def seed(engine, invoices: int) -> uuid.UUID:
+    tenant_id = uuid.uuid4()
+    start = datetime.now(timezone.utc) - timedelta(days=365)
+    with engine.begin() as conn:
+        conn.execute(insert(Tenant), [{"id": tenant_id, "name": "bench-invoices"}])
+        for offset in range(0, invoices, 5000):
+            rows = [
+                {
+                    "id": uuid.uuid4(),
+                    "tenant_id": tenant_id,
+                    "total": 10,
+                    "currency": "USD",
+                    "period_start": start,
+                    "period_end": start + timedelta(days=30),
+                    "status": InvoiceStatus.sent,
+                    # 500 invoices per "run" share a timestamp, like a bulk invoicing pass.
+                    "created_at": start + timedelta(minutes=(offset + i) // 500),
+                }
+                for i in range(min(5000, invoices - offset))
+            ]
+            conn.execute(insert(Invoice), rows)
+            conn.execute(
+                insert(InvoiceItem),
+                [
+                    {"id": uuid.uuid4(), "invoice_id": row["id"], "description": "Seat", "unit_amount": 10, "amount": 10}
+                    for row in rows
+                ],
+            )
+    return tenant_id
+
+
+async def run(url: str, tenant_id: uuid.UUID, invoices: int, page_size: int) -> None:
+    engine = create_async_engine(async_database_url(url))
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+    listing = (
+        select(Invoice)
+        .options(selectinload(Invoice.items))
+        .where(Invoice.tenant_id == tenant_id)
+        .order_by(Invoice.created_at.desc(), Invoice.id.desc())
+    )
+    print(f"{'depth':>10} {'offset ms':>10} {'keyset ms':>10}")
+    depth = page_size
+    async with Session() as db:
+        while depth < invoices:
+            anchor = (
+                await db.execute(
+                    select(Invoice.created_at, Invoice.id)
+                    .where(Invoice.tenant_id == tenant_id)
+                    .order_by(Invoice.created_at.desc(), Invoice.id.desc())
+                    .offset(depth - 1)
+                    .limit(1)
+                )
+            ).one()
+
+            started = time.perf_counter()
+            list((await db.scalars(listing.offset(depth).limit(page_size))).all())
+            offset_ms = (time.perf_counter() - started) * 1000
+
+            started = time.perf_counter()
+            await list_invoices_async(db, str(tenant_id), limit=page_size, after=tuple(anchor))
+            keyset_ms = (time.perf_counter() - started) * 1000
+
+            print(f"{depth:>10} {offset_ms:>10.2f} {keyset_ms:>10.2f}")
+            db.expunge_all()
+            depth *= 10
+    await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--invoices", type=int, default=200_000)
+    parser.add_argument("--page-size", type=int, default=50)
+    args = parser.parse_args()
+
+    url = os.environ.get("BENCH_DATABASE_URL") or f"sqlite+pysqlite:///{tempfile.mkdtemp()}/bench.db"
+    engine = create_engine(url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    try:
+        tenant_id = seed(engine, args.invoices)
+        asyncio.run(run(url, tenant_id, args.invoices, args.page_size))
+    finally:
+        Base.metadata.drop_all(engine)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Compare the per-subscription invoicing loop with run_invoicing_bulk.
+
+    python benchmarks/bench_invoicing.py --subscriptions 2000 --events 20
+
+Set BENCH_DATABASE_URL to run against PostgreSQL (the schema is created and
+dropped); defaults to in-memory SQLite, which hides network round trips.
+"""
+
+import argparse
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import create_engine, event  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.database import Base  # noqa: E402
+from app.domain.models import Plan, PricingModel, Product, Subscription, SubscriptionStatus, Tenant  # noqa: E402
+from app.schemas.usage import UsageEventBatchItem  # noqa: E402
+from app.services.invoices import generate_invoice_for_subscription, run_invoicing_bulk  # noqa: E402
+from app.services.usage import ingest_usage_batch  # noqa: E402
+
+TIERS = [{"up_to": 1000, "unit_amount": 0.01}, {"up_to": 10000, "unit_amount": 0.005}, {"up_to": None, "unit_amount": 0.001}]
+
+
+def seed(db, name: str, subscriptions: int, events: int) -> uuid.UUID:
+    start = datetime.now(timezone.utc) - timedelta(days=30, minutes=7)
+    tenant = Tenant(id=uuid.uuid4(), name=name)
+    product = Product(id=uuid.uuid4(), tenant_id=tenant.id, name="API")
+    plans = [
+        Plan(
+            id=uuid.uuid4(),
+            tenant_id=tenant.id,
+            product_id=product.id,
+            name=model.value,
+            pricing_model=model,
+            price=29,
+            tiers=None if model == PricingModel.flat else TIERS,
+        )
+        for model in PricingModel
+    ]
+    subs = [
+        Subscription(
+            id=uuid.uuid4(),
+            tenant_id=tenant.id,
+            plan_id=plans[i % len(plans)].id,
+            status=SubscriptionStatus.active,
+            quantity=1 + i % 5,
+            current_period_start=start,
+            current_period_end=start + timedelta(days=30),
+        )
+        for i in range(subscriptions)
+    ]
+    db.add_all([tenant, product, *plans, *subs])
+    db.commit()
+    for offset in range(0, subscriptions, 200):
+        batch = [
+            UsageEventBatchItem(
+                subscription_id=str(sub.id),
+                metric="api_calls",
+                quantity=n + 1,
+                ts=start + timedelta(hours=n * 7),
+                idempotency_key=f"{sub.id}-{n}",
+            )
+            for sub in subs[offset : offset + 200]
+            for n in range(events)
+        ]
+        ingest_usage_batch(db, tenant_id=str(tenant.id), events=batch)
+        db.commit()
+    return tenant.id
+
+
+def measure(engine, label: str, fn) -> None:
+    statements = 0
+
+    def _count(*_args, **_kwargs):
+        nonlocal statements
+        statements += 1
+
+    event.listen(engine, "before_cursor_execute", _count)
+    started = time.perf_counter()
+    count = fn()
+    elapsed = time.perf_counter() - started
+    event.remove(engine, "before_cursor_execute", _count)
+    print(f"{label:<18} {count:>7} invoices  {elapsed:8.3f}s  {count / elapsed:10.1f} inv/s  {statements:>7} statements")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subscriptions", type=int, default=2000)
+    parser.add_argument("--events", type=int, default=20, help="usage events per subscription")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    args = parser.parse_args()
+
+    engine = create_engine(os.environ.get("BENCH_DATABASE_URL", "sqlite+pysqlite:///:memory:"))
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+    try:
+        with Session() as db:
+            legacy_tenant = seed(db, "bench-legacy", args.subscriptions, args.events)
+            bulk_tenant = seed(db, "bench-bulk", args.subscriptions, args.events)
+
+            def legacy() -> int:
+                subs = db.query(Subscription).filter(Subscription.tenant_id == legacy_tenant).all()
+                for sub in subs:
+                    generate_invoice_for_subscription(db, sub)
+                db.commit()
+                return len(subs)
+
+            def bulk() -> int:
+                ids = run_invoicing_bulk(db, str(bulk_tenant), chunk_size=args.chunk_size)
+                db.commit()
+                return len(ids)
+
+            measure(engine, "per-subscription", legacy)
+            measure(engine, "bulk", bulk)
+    finally:
+        Base.metadata.drop_all(engine)
+
+
+if __name__ == "__main__":
+    main()
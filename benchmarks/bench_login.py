@@ -0,0 +1,84 @@
+"""Login throughput and the latency other endpoints see during a login storm.
+
+    python benchmarks/bench_login.py --logins 400 --workers 2
+
+First measures password verifications per second on one core. Then fires ``--logins``
+concurrent verifications while a probe calls a trivial sync endpoint body through the
+request threadpool every few milliseconds, once with hashing on the threadpool (the old
+path) and once with the process pool, and reports the probe's latency percentiles.
+"""
+
+import argparse
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from fastapi.concurrency import run_in_threadpool  # noqa: E402
+
+from app.security import get_password_hash, verify_and_update_password  # noqa: E402
+
+
+def other_endpoint() -> int:
+    return sum(range(1000))
+
+
+async def storm(label: str, logins: int, hashed: str, verify) -> None:
+    latencies: list[float] = []
+    done = asyncio.Event()
+
+    async def probe() -> None:
+        while not done.is_set():
+            started = time.perf_counter()
+            await run_in_threadpool(other_endpoint)
+            latencies.append((time.perf_counter() - started) * 1000)
+            await asyncio.sleep(0.005)
+
+    probe_task = asyncio.create_task(probe())
+    started = time.perf_counter()
+    await asyncio.gather(*(verify("secret123", hashed) for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await probe_task
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99)]
+    print(
+        f"{label:<12} {logins / elapsed:8.1f} logins/s  probe p50 {statistics.median(latencies):7.2f} ms"
+        f"  p99 {p99:7.2f} ms  max {latencies[-1]:7.2f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=400)
+    parser.add_argument("--workers", type=int, default=2, help="hashing processes")
+    args = parser.parse_args()
+
+    hashed = get_password_hash("secret123")
+    started = time.perf_counter()
+    for _ in range(20):
+        verify_and_update_password("secret123", hashed)
+    print(f"single core  {20 / (time.perf_counter() - started):8.1f} logins/s")
+
+    async def threadpool(password: str, stored: str):
+        return await run_in_threadpool(verify_and_update_password, password, stored)
+
+    pool = ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn"))
+    # Start the workers before timing.
+    list(pool.map(get_password_hash, ["warmup"] * args.workers))
+
+    async def process_pool(password: str, stored: str):
+        return await asyncio.get_running_loop().run_in_executor(pool, verify_and_update_password, password, stored)
+
+    asyncio.run(storm("threadpool", args.logins, hashed, threadpool))
+    asyncio.run(storm("process pool", args.logins, hashed, process_pool))
+    pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
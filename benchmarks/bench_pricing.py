@@ -0,0 +1,47 @@
+"""Compare calculate_tiered/calculate_volume with compiled PriceSchedules.
+
+    python benchmarks/bench_pricing.py --tiers 8 --quantities 200000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.domain.models import PricingModel  # noqa: E402
+from app.services.pricing import calculate_tiered, calculate_volume, compile_schedule  # noqa: E402
+
+
+def measure(label: str, fn, count: int) -> list:
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<22} {elapsed:8.3f}s  {count / elapsed:12.0f} prices/s")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tiers", type=int, default=8)
+    parser.add_argument("--quantities", type=int, default=200_000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    caps = sorted(rng.sample(range(100, 1_000_000), args.tiers - 1))
+    tiers = [{"up_to": cap, "unit_amount": round(0.01 / (i + 1), 5)} for i, cap in enumerate(caps)]
+    tiers.append({"up_to": None, "unit_amount": 0.0001})
+    rng.shuffle(tiers)
+    quantities = [rng.randint(0, 1_200_000) for _ in range(args.quantities)]
+
+    for model, reference in ((PricingModel.tiered, calculate_tiered), (PricingModel.volume, calculate_volume)):
+        expected = measure(f"{model.value} reference", lambda: [reference(tiers, q) for q in quantities], len(quantities))
+        schedule = compile_schedule(model, tiers=tiers)
+        actual = measure(f"{model.value} compiled", lambda: schedule.price_many(quantities), len(quantities))
+        assert actual == expected
+
+
+if __name__ == "__main__":
+    main()
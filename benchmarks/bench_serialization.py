@@ -0,0 +1,104 @@
+"""Per-invoice cost of rendering an invoice run response.
+
+    python benchmarks/bench_serialization.py --invoices 20000 --items 2
+
+"before" is the old route path: a hand-built dict of floats and strings, validated
+again against ``response_model`` and rendered with the stdlib encoder. "after" is
+``ORJSONResponse`` over the domain values.
+"""
+
+import argparse
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+from app.api.responses import ORJSONResponse  # noqa: E402
+from app.domain.models import Invoice, InvoiceItem, InvoiceStatus  # noqa: E402
+from app.schemas.invoice import InvoiceOut  # noqa: E402
+from app.services.invoice_export import invoice_record  # noqa: E402
+
+
+def build(invoices: int, items: int) -> list[Invoice]:
+    start = datetime.now(timezone.utc) - timedelta(days=30)
+    result = []
+    for i in range(invoices):
+        invoice = Invoice(
+            id=uuid.uuid4(),
+            tenant_id=uuid.uuid4(),
+            total=Decimal("0"),
+            currency="USD",
+            period_start=start,
+            period_end=start + timedelta(days=30),
+            status=InvoiceStatus.sent,
+        )
+        for n in range(items):
+            amount = Decimal(i % 997) + Decimal(n) / 100
+            invoice.items.append(
+                InvoiceItem(id=uuid.uuid4(), description="Metered (tiered)", quantity=n + 1, unit_amount=amount, amount=amount)
+            )
+            invoice.total += amount
+        result.append(invoice)
+    return result
+
+
+def legacy_invoice_out(inv: Invoice) -> dict:
+    return {
+        "id": str(inv.id),
+        "total": float(inv.total),
+        "currency": inv.currency,
+        "period_start": inv.period_start,
+        "period_end": inv.period_end,
+        "status": inv.status,
+        "items": [
+            {
+                "id": str(item.id),
+                "description": item.description,
+                "quantity": item.quantity,
+                "unit_amount": float(item.unit_amount),
+                "amount": float(item.amount),
+            }
+            for item in inv.items
+        ],
+    }
+
+
+def measure(label: str, invoices: list[Invoice], fn) -> float:
+    started = time.perf_counter()
+    body = fn(invoices)
+    elapsed = time.perf_counter() - started
+    per_invoice = elapsed / len(invoices) * 1e6
+    print(f"{label:<8} {elapsed * 1000:9.1f} ms  {per_invoice:7.2f} us/invoice  {len(body) / 1024:9.0f} KiB")
+    return per_invoice
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--invoices", type=int, default=20000)
+    parser.add_argument("--items", type=int, default=2, help="line items per invoice")
+    args = parser.parse_args()
+
+    invoices = build(args.invoices, args.items)
+    adapter = TypeAdapter(list[InvoiceOut])
+
+    def before(rows: list[Invoice]) -> bytes:
+        content = adapter.dump_python(adapter.validate_python([legacy_invoice_out(inv) for inv in rows]), mode="json")
+        return JSONResponse(content).body
+
+    def after(rows: list[Invoice]) -> bytes:
+        return ORJSONResponse([invoice_record(inv) for inv in rows]).body
+
+    old = measure("before", invoices, before)
+    new = measure("after", invoices, after)
+    print(f"speedup  {old / new:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Closed-loop HTTP load test for the hot API endpoints.
+
+    python benchmarks/load_test.py --base-url http://localhost:8000 --token <jwt> \
+        --tenant-id <uuid> --subscription-id <uuid> --endpoint usage --concurrency 200
+
+Keeps ``--concurrency`` requests in flight and reports throughput and latency
+percentiles. Run it against a server started with ``uvicorn app.main:app``.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import httpx
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run(args) -> None:
+    headers = {"Authorization": f"Bearer {args.token}"}
+    latencies: list[float] = []
+    errors = 0
+    remaining = args.requests
+
+    async def send(client: httpx.AsyncClient) -> httpx.Response:
+        if args.endpoint == "mrr":
+            return await client.get(f"/v1/tenants/{args.tenant_id}/metrics/mrr", headers=headers)
+        if args.endpoint == "invoices":
+            return await client.get(f"/v1/tenants/{args.tenant_id}/invoices", headers=headers)
+        return await client.post(
+            f"/v1/tenants/{args.tenant_id}/usage",
+            headers={**headers, "Idempotency-Key": uuid.uuid4().hex},
+            json={"subscription_id": args.subscription_id, "metric": "api_calls", "quantity": 1},
+        )
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        nonlocal errors, remaining
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            try:
+                resp = await send(client)
+                if resp.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=30.0) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    print(f"{args.endpoint}: {len(latencies)} requests, {errors} errors, {len(latencies) / elapsed:,.0f} req/s")
+    print(
+        "latency ms: "
+        f"mean={statistics.mean(latencies) * 1000:.1f} "
+        f"p50={percentile(latencies, 50) * 1000:.1f} "
+        f"p95={percentile(latencies, 95) * 1000:.1f} "
+        f"p99={percentile(latencies, 99) * 1000:.1f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--token", required=True)
+    parser.add_argument("--tenant-id", required=True)
+    parser.add_argument("--subscription-id")
+    parser.add_argument("--endpoint", choices=["usage", "mrr", "invoices"], default="usage")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+    if args.endpoint == "usage" and not args.subscription_id:
+        parser.error("--subscription-id is required for the usage endpoint")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""usage rollups and (subscription_id, ts) index"""
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.database import Base
+
+# revision identifiers, used by Alembic.
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    # 0001 builds the schema from current metadata, so fresh databases already have these.
+    existed = sa.inspect(bind).has_table("usage_rollups")
+    Base.metadata.tables["usage_rollups"].create(bind, checkfirst=True)
+    usage_events = Base.metadata.tables["usage_events"]
+    for index in usage_events.indexes:
+        if index.name == "ix_usage_events_subscription_ts":
+            index.create(bind, checkfirst=True)
+    if not existed and bind.dialect.name == "postgresql":
+        op.execute(
+            """
+            INSERT INTO usage_rollups (tenant_id, subscription_id, bucket_start, metric, quantity, event_count)
+            SELECT tenant_id, subscription_id, date_trunc('hour', ts, 'UTC'), metric, sum(quantity), count(*)
+            FROM usage_events
+            GROUP BY 1, 2, 3, 4
+            """
+        )
+
+
+def downgrade():
+    op.drop_index("ix_usage_events_subscription_ts", table_name="usage_events")
+    op.drop_table("usage_rollups")
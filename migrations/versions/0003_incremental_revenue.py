@@ -0,0 +1,39 @@
+"""incremental revenue metrics"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    columns = {col["name"] for col in sa.inspect(bind).get_columns("tenant_revenue_mv")}
+    if "invoiced_revenue" not in columns:
+        op.add_column(
+            "tenant_revenue_mv",
+            sa.Column("invoiced_revenue", sa.Numeric(14, 2), nullable=False, server_default="0"),
+        )
+    # MRR switches from the lifetime invoice sum to active subscriptions' recurring price.
+    op.execute(
+        """
+        UPDATE tenant_revenue_mv SET
+            monthly_recurring_revenue = COALESCE((
+                SELECT SUM(p.price * s.quantity) FROM subscriptions s JOIN plans p ON p.id = s.plan_id
+                WHERE s.tenant_id = tenant_revenue_mv.tenant_id AND s.status = 'active'
+            ), 0),
+            invoiced_revenue = COALESCE((
+                SELECT SUM(i.total) FROM invoices i
+                WHERE i.tenant_id = tenant_revenue_mv.tenant_id AND i.status IN ('sent', 'paid')
+            ), 0)
+        """
+    )
+    op.execute("UPDATE tenant_revenue_mv SET annual_run_rate = monthly_recurring_revenue * 12")
+
+
+def downgrade():
+    op.drop_column("tenant_revenue_mv", "invoiced_revenue")
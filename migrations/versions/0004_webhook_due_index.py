@@ -0,0 +1,22 @@
+"""partial index for due webhook deliveries"""
+
+from alembic import op
+
+from app.database import Base
+
+# revision identifiers, used by Alembic.
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    for index in Base.metadata.tables["webhook_deliveries"].indexes:
+        if index.name == "ix_webhook_deliveries_due":
+            index.create(bind, checkfirst=True)
+
+
+def downgrade():
+    op.drop_index("ix_webhook_deliveries_due", table_name="webhook_deliveries")
@@ -0,0 +1,20 @@
+"""plan version counter"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    columns = {col["name"] for col in sa.inspect(op.get_bind()).get_columns("plans")}
+    if "version" not in columns:
+        op.add_column("plans", sa.Column("version", sa.Integer(), nullable=False, server_default="1"))
+
+
+def downgrade():
+    op.drop_column("plans", "version")
@@ -0,0 +1,107 @@
+"""monthly partitions for usage_events, per-tenant idempotency keys"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.database import Base
+from app.services.usage_partitions import add_months, create_usage_partitions, ensure_usage_partitions, month_start
+
+# revision identifiers, used by Alembic.
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+COLUMNS = "id, tenant_id, subscription_id, metric, quantity, ts, idempotency_key"
+
+
+def _is_partitioned(bind) -> bool:
+    return bool(
+        bind.execute(
+            sa.text(
+                "SELECT 1 FROM pg_partitioned_table JOIN pg_class ON pg_class.oid = partrelid "
+                "WHERE relname = 'usage_events'"
+            )
+        ).scalar()
+    )
+
+
+def _unique_constraints(bind) -> set[str]:
+    return {uc["name"] for uc in sa.inspect(bind).get_unique_constraints("usage_events")}
+
+
+def _create_keys_table(bind) -> None:
+    # The key table as of this revision; current metadata has 0010's partitioned shape, which
+    # the backfill below does not fill. 0001 already built that shape on fresh databases.
+    if sa.inspect(bind).has_table("usage_idempotency_keys"):
+        return
+    op.create_table(
+        "usage_idempotency_keys",
+        sa.Column("tenant_id", sa.Uuid(), sa.ForeignKey("tenants.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("idempotency_key", sa.String(255), primary_key=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_usage_idempotency_keys_created_at", "usage_idempotency_keys", ["created_at"])
+
+
+def upgrade():
+    bind = op.get_bind()
+    _create_keys_table(bind)
+    backfill_keys = (
+        "INSERT INTO usage_idempotency_keys (tenant_id, idempotency_key, created_at) "
+        "SELECT tenant_id, idempotency_key, min(coalesce(ts, CURRENT_TIMESTAMP)) FROM {table} "
+        "GROUP BY tenant_id, idempotency_key ON CONFLICT DO NOTHING"
+    )
+    if bind.dialect.name != "postgresql":
+        if "uq_usage_idempotency" in _unique_constraints(bind):
+            with op.batch_alter_table("usage_events") as batch:
+                batch.drop_constraint("uq_usage_idempotency", type_="unique")
+        op.execute(backfill_keys.format(table="usage_events"))
+        return
+
+    session = Session(bind=bind)
+    # 0001 builds the schema from current metadata, so fresh databases are already partitioned.
+    if not _is_partitioned(bind):
+        op.execute("ALTER TABLE usage_events RENAME TO usage_events_unpartitioned")
+        op.execute("ALTER TABLE usage_events_unpartitioned DROP CONSTRAINT IF EXISTS uq_usage_idempotency")
+        op.execute("ALTER TABLE usage_events_unpartitioned RENAME CONSTRAINT usage_events_pkey TO usage_events_unpartitioned_pkey")
+        for index in ("ix_usage_events_tenant_id", "ix_usage_events_ts", "ix_usage_events_subscription_ts"):
+            op.execute(f"DROP INDEX IF EXISTS {index}")
+        Base.metadata.tables["usage_events"].create(bind)
+
+        lo, hi = bind.execute(sa.text("SELECT min(ts), max(ts) FROM usage_events_unpartitioned")).one()
+        if lo is not None:
+            months, month = [], month_start(lo)
+            while month <= hi:
+                months.append(month)
+                month = add_months(month, 1)
+            create_usage_partitions(session, months)
+        op.execute(backfill_keys.format(table="usage_events_unpartitioned"))
+        op.execute(
+            f"INSERT INTO usage_events ({COLUMNS}) "
+            "SELECT id, tenant_id, subscription_id, metric, quantity, coalesce(ts, CURRENT_TIMESTAMP), idempotency_key "
+            "FROM usage_events_unpartitioned"
+        )
+        op.execute("DROP TABLE usage_events_unpartitioned")
+    ensure_usage_partitions(session, get_settings().usage_partition_months_ahead)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql" and _is_partitioned(bind):
+        op.execute("CREATE TABLE usage_events_flat (LIKE usage_events INCLUDING DEFAULTS)")
+        op.execute(f"INSERT INTO usage_events_flat ({COLUMNS}) SELECT {COLUMNS} FROM usage_events")
+        op.execute("DROP TABLE usage_events")
+        op.execute("ALTER TABLE usage_events_flat RENAME TO usage_events")
+        op.create_primary_key("usage_events_pkey", "usage_events", ["id"])
+        op.create_foreign_key(None, "usage_events", "tenants", ["tenant_id"], ["id"], ondelete="CASCADE")
+        op.create_foreign_key(None, "usage_events", "subscriptions", ["subscription_id"], ["id"], ondelete="CASCADE")
+        op.create_index("ix_usage_events_tenant_id", "usage_events", ["tenant_id"])
+        op.create_index("ix_usage_events_ts", "usage_events", ["ts"])
+        op.create_index("ix_usage_events_subscription_ts", "usage_events", ["subscription_id", "ts"])
+    if "uq_usage_idempotency" not in _unique_constraints(bind):
+        with op.batch_alter_table("usage_events") as batch:
+            batch.create_unique_constraint("uq_usage_idempotency", ["idempotency_key"])
+    op.drop_table("usage_idempotency_keys")
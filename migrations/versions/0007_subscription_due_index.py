@@ -0,0 +1,22 @@
+"""partial index for subscriptions due at period close"""
+
+from alembic import op
+
+from app.database import Base
+
+# revision identifiers, used by Alembic.
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    for index in Base.metadata.tables["subscriptions"].indexes:
+        if index.name == "ix_subscriptions_due":
+            index.create(bind, checkfirst=True)
+
+
+def downgrade():
+    op.drop_index("ix_subscriptions_due", table_name="subscriptions")
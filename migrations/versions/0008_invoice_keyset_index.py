@@ -0,0 +1,27 @@
+"""keyset index for invoice listing, invoice_items lookup index"""
+
+from alembic import op
+
+from app.database import Base
+
+# revision identifiers, used by Alembic.
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    for table, name in [("invoices", "ix_invoices_tenant_created"), ("invoice_items", "ix_invoice_items_invoice_id")]:
+        for index in Base.metadata.tables[table].indexes:
+            if index.name == name:
+                index.create(bind, checkfirst=True)
+    # Superseded by the leading column of ix_invoices_tenant_created.
+    op.drop_index("ix_invoices_tenant_id", table_name="invoices", if_exists=True)
+
+
+def downgrade():
+    op.create_index("ix_invoices_tenant_id", "invoices", ["tenant_id"])
+    op.drop_index("ix_invoice_items_invoice_id", table_name="invoice_items")
+    op.drop_index("ix_invoices_tenant_created", table_name="invoices")
@@ -0,0 +1,25 @@
+"""daily revenue snapshots"""
+
+from alembic import op
+
+from app.database import Base
+
+# revision identifiers, used by Alembic.
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+TABLES = ("revenue_snapshots", "subscription_revenue_state")
+
+
+def upgrade():
+    bind = op.get_bind()
+    for name in TABLES:
+        Base.metadata.tables[name].create(bind, checkfirst=True)
+
+
+def downgrade():
+    bind = op.get_bind()
+    for name in reversed(TABLES):
+        Base.metadata.tables[name].drop(bind, checkfirst=True)
@@ -0,0 +1,85 @@
+"""monthly partitions for usage_idempotency_keys"""
+
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.database import Base
+from app.services.usage_partitions import (
+    KEYS_TABLE,
+    add_months,
+    create_usage_partitions,
+    ensure_usage_partitions,
+    idempotency_window_start,
+    month_start,
+)
+
+# revision identifiers, used by Alembic.
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+OLD_TABLE = "usage_idempotency_keys_flat"
+
+
+def _month_of(bind, column: str) -> str:
+    if bind.dialect.name == "postgresql":
+        return f"(date_trunc('month', {column} AT TIME ZONE 'UTC'))::date"
+    return f"date({column}, 'start of month')"
+
+
+def _columns(bind) -> set[str]:
+    return {column["name"] for column in sa.inspect(bind).get_columns(KEYS_TABLE)}
+
+
+def upgrade():
+    bind = op.get_bind()
+    settings = get_settings()
+    session = Session(bind=bind)
+    # 0001 builds the schema from current metadata, so fresh databases already have created_month.
+    if "created_month" not in _columns(bind):
+        op.execute(f"ALTER TABLE {KEYS_TABLE} RENAME TO {OLD_TABLE}")
+        if bind.dialect.name == "postgresql":
+            op.execute(f"ALTER TABLE {OLD_TABLE} RENAME CONSTRAINT {KEYS_TABLE}_pkey TO {OLD_TABLE}_pkey")
+        op.execute(f"DROP INDEX IF EXISTS ix_{KEYS_TABLE}_created_at")
+        Base.metadata.tables[KEYS_TABLE].create(bind)
+
+        since = idempotency_window_start(settings.usage_idempotency_window_months)
+        current = month_start(datetime.now(timezone.utc))
+        months, month = [], month_start(since)
+        while month <= current:
+            months.append(month)
+            month = add_months(month, 1)
+        create_usage_partitions(session, months, KEYS_TABLE)
+        # Keys that already left the idempotency window are not carried over.
+        op.execute(
+            sa.text(
+                f"INSERT INTO {KEYS_TABLE} (tenant_id, idempotency_key, created_month, created_at) "
+                f"SELECT tenant_id, idempotency_key, {_month_of(bind, 'created_at')}, created_at FROM {OLD_TABLE} "
+                "WHERE created_at >= :since"
+            ).bindparams(since=month_start(since))
+        )
+        op.execute(f"DROP TABLE {OLD_TABLE}")
+    ensure_usage_partitions(session, settings.usage_partition_months_ahead, parent=KEYS_TABLE)
+
+
+def downgrade():
+    op.create_table(
+        OLD_TABLE,
+        sa.Column("tenant_id", sa.Uuid(), sa.ForeignKey("tenants.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("idempotency_key", sa.String(255), primary_key=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.execute(
+        f"INSERT INTO {OLD_TABLE} (tenant_id, idempotency_key, created_at) "
+        f"SELECT tenant_id, idempotency_key, min(created_at) FROM {KEYS_TABLE} GROUP BY tenant_id, idempotency_key"
+    )
+    op.execute(f"DROP TABLE {KEYS_TABLE}")
+    op.rename_table(OLD_TABLE, KEYS_TABLE)
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute(f"ALTER TABLE {KEYS_TABLE} RENAME CONSTRAINT {OLD_TABLE}_pkey TO {KEYS_TABLE}_pkey")
+    op.create_index(f"ix_{KEYS_TABLE}_created_at", KEYS_TABLE, ["created_at"])
@@ -1,5 +1,7 @@
 import os
 import sys
+import uuid
+from datetime import datetime, timedelta, timezone
 
 import pytest
 from sqlalchemy import create_engine
@@ -10,7 +12,7 @@ if BASE_DIR not in sys.path:
     sys.path.append(BASE_DIR)
 
 from app.database import Base  # noqa: E402
-import app.domain.models  # noqa: E402,F401
+from app.domain.models import Plan, PricingModel, Product, Subscription, SubscriptionStatus, Tenant  # noqa: E402
 
 
 @pytest.fixture()
@@ -24,3 +26,73 @@ def db_session():
         session.commit()
     finally:
         session.close()
+
+
+@pytest.fixture()
+def make_plan():
+    """Adds a plan to ``session``, with a new tenant and product unless ``product`` is given. Does not commit."""
+
+    def make(
+        session,
+        *,
+        product: Product | None = None,
+        name: str = "Pro",
+        pricing_model: PricingModel = PricingModel.flat,
+        price=10,
+        tiers: list[dict] | None = None,
+        created_at: datetime | None = None,
+    ) -> Plan:
+        created_at = created_at or datetime.now(timezone.utc)
+        if product is None:
+            tenant = Tenant(id=uuid.uuid4(), name=f"tenant-{uuid.uuid4().hex[:8]}")
+            product = Product(id=uuid.uuid4(), tenant_id=tenant.id, name="API", created_at=created_at)
+            session.add_all([tenant, product])
+        plan = Plan(
+            id=uuid.uuid4(),
+            tenant_id=product.tenant_id,
+            product=product,
+            name=name,
+            pricing_model=pricing_model,
+            currency="USD",
+            price=price,
+            tiers=tiers,
+            created_at=created_at,
+        )
+        session.add(plan)
+        return plan
+
+    return make
+
+
+@pytest.fixture()
+def make_subscription(make_plan):
+    """Adds a subscription to ``plan``, or to a new plan built from ``plan_fields``. Does not commit."""
+
+    def make(
+        session,
+        plan: Plan | None = None,
+        *,
+        quantity: int = 1,
+        status: SubscriptionStatus = SubscriptionStatus.active,
+        period_start: datetime | None = None,
+        period_end: datetime | None = None,
+        created_at: datetime | None = None,
+        **plan_fields,
+    ) -> Subscription:
+        plan = plan or make_plan(session, created_at=created_at, **plan_fields)
+        period_start = period_start or datetime.now(timezone.utc)
+        subscription = Subscription(
+            id=uuid.uuid4(),
+            tenant_id=plan.tenant_id,
+            plan=plan,
+            quantity=quantity,
+            status=status,
+            current_period_start=period_start,
+            current_period_end=period_end or period_start + timedelta(days=30),
+        )
+        if created_at is not None:
+            subscription.created_at = created_at
+        session.add(subscription)
+        return subscription
+
+    return make
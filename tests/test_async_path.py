@@ -0,0 +1,74 @@
+import asyncio
+import uuid
+
+from fastapi import HTTPException
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base, async_database_url
+from app.domain.models import Tenant, UsageEvent, UsageRollup, User
+from app.security import decode_token, get_password_hash
+from app.services.auth import authenticate_user_async
+from app.services.usage import ingest_usage_event_async
+
+
+async def _sessionmaker():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    return async_sessionmaker(engine, expire_on_commit=False)
+
+
+def test_async_ingestion_is_idempotent_and_rolls_up(make_subscription):
+    async def scenario():
+        Session = await _sessionmaker()
+        async with Session() as db:
+            subscription = make_subscription(db)
+            await db.commit()
+            ingest = dict(
+                tenant_id=str(subscription.tenant_id),
+                subscription_id=str(subscription.id),
+                metric="api_calls",
+                quantity=5,
+                ts=None,
+                idempotency_key="async-1",
+            )
+            event, duplicate = await ingest_usage_event_async(db, **ingest)
+            await db.commit()
+            assert event is not None and duplicate is False
+
+            event, duplicate = await ingest_usage_event_async(db, **ingest)
+            assert event is None and duplicate is True
+
+            with pytest.raises(HTTPException) as exc:
+                await ingest_usage_event_async(db, **{**ingest, "subscription_id": str(uuid.uuid4())})
+            assert exc.value.status_code == 404
+
+            assert await db.scalar(select(func.count()).select_from(UsageEvent)) == 1
+            assert await db.scalar(select(func.sum(UsageRollup.quantity))) == 5
+
+    asyncio.run(scenario())
+
+
+def test_async_login_issues_token():
+    async def scenario():
+        Session = await _sessionmaker()
+        async with Session() as db:
+            tenant = Tenant(id=uuid.uuid4(), name="T1")
+            user = User(tenant_id=tenant.id, email="a@example.com", hashed_password=get_password_hash("secret"))
+            db.add_all([tenant, user])
+            await db.commit()
+
+            token = await authenticate_user_async(db, str(tenant.id), "a@example.com", "secret")
+            assert decode_token(token)["tenant_id"] == str(tenant.id)
+            with pytest.raises(HTTPException):
+                await authenticate_user_async(db, str(tenant.id), "a@example.com", "wrong")
+
+    asyncio.run(scenario())
+
+
+def test_async_database_url_swaps_driver():
+    assert async_database_url("postgresql+psycopg2://u@db/billing").drivername == "postgresql+asyncpg"
+    assert async_database_url("sqlite+pysqlite:///:memory:").drivername == "sqlite+aiosqlite"
@@ -0,0 +1,106 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.domain.models import Invoice, PricingModel, Subscription, TenantRevenueMV
+from app.schemas.usage import UsageEventBatchItem
+from app.services.invoices import generate_invoice_for_subscription, run_invoicing_bulk
+from app.services.usage import ingest_usage_batch
+
+TIERS = [
+    {"up_to": 100, "unit_amount": 0.1},
+    {"up_to": 200, "unit_amount": 0.05},
+    {"up_to": None, "unit_amount": 0.03},
+]
+
+
+def _seed_tenant(db_session, make_subscription) -> uuid.UUID:
+    start = datetime(2025, 1, 1, 0, 13, tzinfo=timezone.utc)
+    period = dict(period_start=start, period_end=start + timedelta(days=30))
+    product = None
+    for model, price in [(PricingModel.flat, 49), (PricingModel.tiered, 0), (PricingModel.volume, 0)]:
+        plan = make_subscription(
+            db_session,
+            product=product,
+            name=model.value,
+            pricing_model=model,
+            price=price,
+            tiers=None if model == PricingModel.flat else TIERS,
+            created_at=start,
+            **period,
+        ).plan
+        product = plan.product
+        make_subscription(db_session, plan, quantity=3, **period)
+    db_session.commit()
+    tenant_id = product.tenant_id
+
+    subscriptions = db_session.query(Subscription).filter(Subscription.tenant_id == tenant_id).all()
+    events = [
+        UsageEventBatchItem(
+            subscription_id=str(sub.id),
+            metric="api_calls",
+            quantity=7 * (n + 1),
+            ts=start + timedelta(hours=5 * n, minutes=n),
+            idempotency_key=f"{sub.id}-{n}",
+        )
+        for n, sub in enumerate(subscriptions * 4)
+    ]
+    ingest_usage_batch(db_session, tenant_id=str(tenant_id), events=events)
+    db_session.commit()
+    return tenant_id
+
+
+def _summary(db_session, tenant_id: uuid.UUID) -> list[tuple]:
+    rows = []
+    for sub in db_session.query(Subscription).filter(Subscription.tenant_id == tenant_id).all():
+        invoice = db_session.query(Invoice).filter(Invoice.subscription_id == sub.id).one()
+        item = invoice.items[0]
+        rows.append(
+            (
+                sub.plan.name,
+                sub.quantity,
+                invoice.total,
+                invoice.period_start,
+                invoice.period_end,
+                item.description,
+                item.quantity,
+                item.unit_amount,
+                item.amount,
+                sub.current_period_start,
+                sub.current_period_end,
+            )
+        )
+    return sorted(rows)
+
+
+def test_bulk_invoicing_matches_per_subscription_path(db_session, make_subscription):
+    legacy = _seed_tenant(db_session, make_subscription)
+    bulk = _seed_tenant(db_session, make_subscription)
+
+    for sub in db_session.query(Subscription).filter(Subscription.tenant_id == legacy).all():
+        generate_invoice_for_subscription(db_session, sub)
+    invoice_ids = run_invoicing_bulk(db_session, str(bulk), chunk_size=4)
+    db_session.commit()
+    db_session.expire_all()
+
+    assert len(invoice_ids) == 6
+    assert _summary(db_session, legacy) == _summary(db_session, bulk)
+    legacy_mv = db_session.get(TenantRevenueMV, legacy)
+    bulk_mv = db_session.get(TenantRevenueMV, bulk)
+    assert legacy_mv.monthly_recurring_revenue == bulk_mv.monthly_recurring_revenue
+
+
+def test_subscriptions_whose_plan_is_gone_are_left_due(db_session, make_subscription):
+    billed = make_subscription(db_session)
+    orphan = make_subscription(db_session, billed.plan)
+    db_session.commit()
+    period_start = orphan.current_period_start
+    # The test database does not enforce foreign keys, so the plan can simply vanish.
+    orphan.plan_id = uuid.uuid4()
+    db_session.commit()
+
+    assert len(run_invoicing_bulk(db_session, str(billed.tenant_id))) == 1
+    assert orphan.current_period_start == period_start
+    with pytest.raises(ValueError, match="Plan not found"):
+        generate_invoice_for_subscription(db_session, orphan)
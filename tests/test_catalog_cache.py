@@ -0,0 +1,71 @@
+from decimal import Decimal
+import uuid
+
+from sqlalchemy import event
+
+from app.services.catalog import CatalogCache, catalog_cache
+from app.services.subscriptions import create_subscription
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values: dict[str, int] = {}
+        self.gets = 0
+
+    def get(self, key):
+        self.gets += 1
+        return self.values.get(key)
+
+    def incr(self, key):
+        self.values[key] = self.values.get(key, 0) + 1
+        return self.values[key]
+
+
+def test_version_bump_reaches_other_processes(db_session, make_plan):
+    plan = make_plan(db_session, name="Seats")
+    db_session.commit()
+    redis_client, now = FakeRedis(), [0.0]
+    writer = CatalogCache(max_tenants=10, check_seconds=5, redis_client=redis_client, clock=lambda: now[0])
+    reader = CatalogCache(max_tenants=10, check_seconds=5, redis_client=redis_client, clock=lambda: now[0])
+
+    assert reader.plan(db_session, plan.tenant_id, plan.id).schedule.price(3) == Decimal("30.00")
+    plan.price = Decimal("12")
+    db_session.commit()
+    writer.invalidate(plan.tenant_id)
+
+    # Within the check interval the reader neither asks Redis nor reloads.
+    gets = redis_client.gets
+    assert reader.plan(db_session, plan.tenant_id, plan.id).price == Decimal("10")
+    assert redis_client.gets == gets
+    now[0] = 6
+    assert reader.plan(db_session, plan.tenant_id, plan.id).schedule.price(3) == Decimal("36.00")
+    assert reader.product_by_name(db_session, plan.tenant_id, "API").id == plan.product_id
+
+
+def test_unknown_ids_reload_once(db_session, make_plan):
+    plan = make_plan(db_session, name="Seats")
+    db_session.commit()
+    cache = CatalogCache(max_tenants=10, check_seconds=60)
+    cache.get(db_session, plan.tenant_id)
+    added = make_plan(db_session, product=plan.product, name="Pro", price=Decimal("50"))
+    db_session.commit()
+
+    assert cache.plan(db_session, plan.tenant_id, added.id).name == "Pro"
+    assert cache.plan(db_session, plan.tenant_id, uuid.uuid4()) is None
+    assert cache.plan(db_session, plan.tenant_id, "not-a-uuid") is None
+
+
+def test_commits_invalidate_and_writes_skip_catalog_queries(db_session, make_plan):
+    plan = make_plan(db_session, name="Seats")
+    db_session.commit()
+    catalog_cache.get(db_session, plan.tenant_id)
+    statements = []
+    event.listen(db_session.get_bind(), "before_cursor_execute", lambda *args, **kwargs: statements.append(args[2]))
+
+    create_subscription(db_session, tenant_id=plan.tenant_id, plan_id=plan.id, quantity=1)
+    assert not any("FROM plans" in sql for sql in statements)
+
+    plan.price = Decimal("15")
+    db_session.commit()
+    assert catalog_cache.plan(db_session, plan.tenant_id, plan.id).price == Decimal("15")
+    assert catalog_cache.warm(db_session) >= 1
@@ -0,0 +1,70 @@
+import uuid
+
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, select
+from sqlalchemy.pool import QueuePool, StaticPool
+
+from app.database import Base, RoutingSession, _export_pool_usage, _timed_pool, engine_options
+from app.dependencies import get_current_user
+from app.domain.models import Role, Tenant, User
+from app.security import create_access_token
+from app.services.principals import principal_cache
+
+
+def _engine():
+    db_engine = create_engine("sqlite+pysqlite:///:memory:", poolclass=StaticPool)
+    Base.metadata.create_all(db_engine)
+    return db_engine
+
+
+def test_read_only_session_reads_replica_and_writes_primary():
+    primary, replica = _engine(), _engine()
+    tenant_id = uuid.uuid4()
+    for db_engine, name in ((primary, "primary"), (replica, "replica")):
+        with RoutingSession(bind=db_engine) as db:
+            db.add(Tenant(id=tenant_id, name=name))
+            db.commit()
+
+    with RoutingSession(bind=primary, info={"replica": replica}) as db:
+        assert db.get(Tenant, tenant_id).name == "replica"
+        db.add(Tenant(id=uuid.uuid4(), name="new"))
+        db.commit()
+    with RoutingSession(bind=primary) as db:
+        assert db.get(Tenant, tenant_id).name == "primary"
+        assert db.scalar(select(Tenant.id).where(Tenant.name == "new")) is not None
+
+
+def test_user_missing_on_lagging_replica_is_loaded_from_primary():
+    primary, replica = _engine(), _engine()
+    tenant_id, user_id = uuid.uuid4(), uuid.uuid4()
+    with RoutingSession(bind=primary) as db:
+        db.add(Tenant(id=tenant_id, name="primary"))
+        db.add(User(id=user_id, tenant_id=tenant_id, email="new@example.com", hashed_password="x", role=Role.admin))
+        db.commit()
+    principal_cache.clear()
+
+    with RoutingSession(bind=primary, info={"replica": replica}) as db:
+        principal = get_current_user(db, create_access_token(str(user_id), str(tenant_id)))
+        assert db.info["replica"] is replica
+
+    assert (principal.id, principal.role) == (user_id, Role.admin)
+
+
+def test_engine_options_per_driver():
+    sync = engine_options("postgresql+psycopg2://u@db/billing")
+    assert sync["pool_size"] > 0 and sync["pool_pre_ping"] is True
+    assert sync["connect_args"]["options"].startswith("-c statement_timeout=")
+    assert "statement_timeout" in engine_options("postgresql+asyncpg://u@db/billing")["connect_args"]["server_settings"]
+    assert "pool_size" not in engine_options("sqlite+pysqlite:///:memory:")
+
+
+def test_pool_checkout_is_measured():
+    db_engine = create_engine("sqlite+pysqlite:///:memory:", poolclass=_timed_pool(QueuePool, "test"))
+    _export_pool_usage(db_engine, "test")
+    before = REGISTRY.get_sample_value("db_pool_checkout_wait_seconds_count", {"engine": "test"}) or 0
+
+    with db_engine.connect():
+        assert REGISTRY.get_sample_value("db_pool_checked_out_connections", {"engine": "test"}) == 1
+
+    assert REGISTRY.get_sample_value("db_pool_checkout_wait_seconds_count", {"engine": "test"}) == before + 1
+    assert REGISTRY.get_sample_value("db_pool_checked_out_connections", {"engine": "test"}) == 0
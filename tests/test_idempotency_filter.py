@@ -0,0 +1,121 @@
+import uuid
+
+from prometheus_client import REGISTRY
+
+from app.domain.models import UsageEvent
+from app.services import usage as usage_service
+from app.services.idempotency import IdempotencyFilter, bloom_parameters
+
+
+class FakeBitmapRedis:
+    """Just the BITFIELD/counter subset the filter uses, executed through a pipeline."""
+
+    def __init__(self):
+        self.bitmaps: dict[str, set[int]] = {}
+        self.counts: dict[str, int] = {}
+
+    def pipeline(self, transaction=False):
+        return FakePipeline(self)
+
+    def mget(self, *keys):
+        return [self.counts.get(key) for key in keys]
+
+    def run(self, command, key, *args):
+        bits = self.bitmaps.setdefault(key, set())
+        replies = []
+        i = 0
+        while i < len(args):
+            offset = args[i + 2]
+            replies.append(int(offset in bits))
+            if args[i] == "SET":
+                bits.add(offset)
+                i += 4
+            else:
+                i += 3
+        return replies
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def execute_command(self, *args):
+        self.commands.append(lambda: self.client.run(*args))
+
+    def incrby(self, key, amount):
+        def incr():
+            self.client.counts[key] = self.client.counts.get(key, 0) + amount
+            return self.client.counts[key]
+
+        self.commands.append(incr)
+
+    def expire(self, key, seconds):
+        self.commands.append(lambda: True)
+
+    def execute(self):
+        return [command() for command in self.commands]
+
+
+def test_filter_size_depends_on_error_rate_not_volume():
+    bits, hashes = bloom_parameters(100_000, 0.001)
+    assert hashes == 10
+    assert bits < bloom_parameters(100_000, 0.0001)[0]
+    assert bits / 8 < 200 * 1024
+
+
+def test_keys_are_remembered_for_a_full_window_per_tenant():
+    now = [0.0]
+    bloom = IdempotencyFilter(capacity=1000, error_rate=0.01, window_seconds=100, clock=lambda: now[0])
+    redis_client, tenant = FakeBitmapRedis(), uuid.uuid4()
+
+    assert bloom.check_and_add(redis_client, tenant, ["a", "b"]) == [False, False]
+    assert bloom.check_and_add(redis_client, uuid.uuid4(), ["a"]) == [False]
+    now[0] = 150.0
+    assert bloom.check_and_add(redis_client, tenant, ["a"]) == [True]
+    now[0] = 320.0
+    assert bloom.check_and_add(redis_client, tenant, ["b"]) == [False]
+
+
+def test_false_positive_rate_stays_near_target():
+    bloom = IdempotencyFilter(capacity=2000, error_rate=0.01, window_seconds=100, clock=lambda: 0.0)
+    redis_client, tenant = FakeBitmapRedis(), uuid.uuid4()
+    bloom.check_and_add(redis_client, tenant, [f"seen-{i}" for i in range(2000)])
+
+    # Probing also adds keys, so keep the sample small next to the filter's capacity.
+    hits = bloom.check_and_add(redis_client, tenant, [f"new-{i}" for i in range(200)])
+    assert sum(hits) / len(hits) < 0.03
+
+
+def test_busy_tenants_grow_the_filter_instead_of_saturating_it():
+    bloom = IdempotencyFilter(capacity=100, error_rate=0.01, window_seconds=100, clock=lambda: 0.0)
+    redis_client, tenant = FakeBitmapRedis(), uuid.uuid4()
+    for start in range(0, 3000, 250):
+        bloom.check_and_add(redis_client, tenant, [f"seen-{i}" for i in range(start, start + 250)])
+
+    assert bloom.generation(3000) == 4
+    assert bloom.check_and_add(redis_client, tenant, ["seen-7", "seen-2999"]) == [True, True]
+    hits = bloom.check_and_add(redis_client, tenant, [f"new-{i}" for i in range(300)])
+    assert sum(hits) / len(hits) < 0.03
+    assert REGISTRY.get_sample_value("idempotency_filter_fill_ratio_count") > 0
+
+
+def test_possible_hits_are_settled_by_the_database(db_session, monkeypatch, make_subscription):
+    bloom = IdempotencyFilter(capacity=1000, error_rate=0.01, window_seconds=100, clock=lambda: 0.0)
+    monkeypatch.setattr(usage_service, "idempotency_filter", bloom)
+    redis_client = FakeBitmapRedis()
+    sub = make_subscription(db_session)
+    db_session.commit()
+    # Simulate a false positive: the filter has the key but no event was stored.
+    bloom.check_and_add(redis_client, sub.tenant_id, ["k1"])
+
+    def ingest():
+        event, duplicate = usage_service.ingest_usage_event(
+            db_session, str(sub.tenant_id), str(sub.id), "api_calls", 1, None, "k1", redis_client=redis_client
+        )
+        db_session.commit()
+        return duplicate
+
+    assert ingest() is False
+    assert ingest() is True
+    assert db_session.query(UsageEvent).count() == 1
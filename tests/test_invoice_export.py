@@ -0,0 +1,77 @@
+import csv
+import io
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from app.domain.models import Invoice, InvoiceItem, InvoiceStatus, Tenant
+from app.schemas.invoice import InvoiceExportFormat
+from app.services.invoice_export import CSV_COLUMNS, encode_invoices, iter_invoices_by_id, iter_tenant_invoices
+
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def _seed(db_session, count: int) -> tuple[Tenant, list[uuid.UUID]]:
+    tenant = Tenant(id=uuid.uuid4(), name="T1")
+    db_session.add(tenant)
+    ids = []
+    for i in range(count):
+        invoice = Invoice(
+            id=uuid.uuid4(),
+            tenant_id=tenant.id,
+            total=3,
+            period_start=START,
+            period_end=START + timedelta(days=30),
+            status=InvoiceStatus.paid if i % 3 == 0 else InvoiceStatus.sent,
+            created_at=START + timedelta(minutes=i),
+        )
+        # Every third invoice has no line items.
+        for n in range(i % 3):
+            invoice.items.append(InvoiceItem(description=f"line {n}", quantity=1, unit_amount=1.5, amount=1.5))
+        db_session.add(invoice)
+        ids.append(invoice.id)
+    db_session.commit()
+    db_session.expunge_all()
+    return tenant, ids
+
+
+def test_export_holds_one_batch_in_the_session(db_session):
+    tenant, ids = _seed(db_session, 25)
+
+    peak, seen = 0, []
+    for inv in iter_tenant_invoices(db_session, str(tenant.id), batch_size=4):
+        seen.append(inv.id)
+        peak = max(peak, len(db_session.identity_map))
+
+    assert seen == list(reversed(ids))
+    # 4 invoices plus at most 2 items each.
+    assert peak <= 12
+    paid = list(iter_tenant_invoices(db_session, str(tenant.id), status=InvoiceStatus.paid, batch_size=4))
+    assert len(paid) == 9
+
+
+def test_run_stream_keeps_generation_order(db_session):
+    _, ids = _seed(db_session, 7)
+    order = ids[3:] + ids[:3]
+
+    assert [inv.id for inv in iter_invoices_by_id(db_session, order, batch_size=2)] == order
+
+
+def test_encoders_write_every_invoice(db_session):
+    tenant, ids = _seed(db_session, 6)
+
+    def render(fmt: InvoiceExportFormat) -> str:
+        return b"".join(encode_invoices(iter_tenant_invoices(db_session, str(tenant.id)), fmt)).decode()
+
+    array = json.loads(render(InvoiceExportFormat.json))
+    assert [row["id"] for row in array] == [str(i) for i in reversed(ids)]
+    assert array[0]["total"] == "3.00" and array[0]["items"][0]["amount"] == "1.50"
+
+    lines = render(InvoiceExportFormat.ndjson).splitlines()
+    assert [json.loads(line)["id"] for line in lines] == [row["id"] for row in array]
+
+    rows = list(csv.DictReader(io.StringIO(render(InvoiceExportFormat.csv))))
+    assert tuple(rows[0]) == CSV_COLUMNS
+    # One row per line item, one for each invoice without items.
+    assert len(rows) == sum(max(1, len(row["items"])) for row in array)
+    assert json.loads(b"".join(encode_invoices(iter([]), InvoiceExportFormat.json))) == []
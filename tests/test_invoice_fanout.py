@@ -0,0 +1,149 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from app.domain.models import Invoice, TenantRevenueMV
+from app.services.invoice_runs import run_progress
+from app.services.invoices import due_subscription_ranges, invoice_due_range
+from app.workers import jobs
+
+CUTOFF = datetime(2025, 2, 1, tzinfo=timezone.utc)
+
+
+class FakeRunRedis:
+    """Hashes and sets for run progress; pipelines execute immediately and collect replies."""
+
+    def __init__(self):
+        self.hashes: dict[str, dict[str, str]] = {}
+        self.sets: dict[str, set[str]] = {}
+        self.replies: list = []
+
+    def pipeline(self, transaction=True):
+        self.replies = []
+        return self
+
+    def execute(self):
+        return self.replies
+
+    def _reply(self, value):
+        self.replies.append(value)
+        return value
+
+    def hset(self, key, mapping):
+        self.hashes.setdefault(key, {}).update({k: str(v) for k, v in mapping.items()})
+        return self._reply(len(mapping))
+
+    def hincrby(self, key, field, amount):
+        values = self.hashes.setdefault(key, {})
+        values[field] = str(int(values.get(field, 0)) + amount)
+        return self._reply(int(values[field]))
+
+    def hget(self, key, field):
+        return self._reply(self.hashes.get(key, {}).get(field))
+
+    def hmget(self, key, *fields):
+        return self._reply([self.hashes.get(key, {}).get(field) for field in fields])
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def sadd(self, key, member):
+        members = self.sets.setdefault(key, set())
+        added = member not in members
+        members.add(member)
+        return self._reply(int(added))
+
+    def scard(self, key):
+        return self._reply(len(self.sets.get(key, set())))
+
+    def smembers(self, key):
+        return set(self.sets.get(key, set()))
+
+    def expire(self, key, seconds):
+        return self._reply(True)
+
+
+class FakeQueue:
+    def __init__(self):
+        self.jobs: list = []
+
+    def enqueue_many(self, data):
+        self.jobs.extend((item.func, item.args) for item in data)
+
+    def enqueue(self, func, *args):
+        self.jobs.append((func, args))
+
+    def drain(self):
+        while self.jobs:
+            func, args = self.jobs.pop(0)
+            func(*args)
+
+
+def _seed_tenant(db_session, make_subscription, due: int, not_due: int = 0) -> uuid.UUID:
+    plan = None
+    for i in range(due + not_due):
+        period_end = CUTOFF - timedelta(days=1) if i < due else CUTOFF + timedelta(days=10)
+        plan = make_subscription(db_session, plan, period_start=period_end - timedelta(days=30), period_end=period_end).plan
+    db_session.commit()
+    return plan.tenant_id
+
+
+def test_ranges_are_per_tenant_and_bounded(db_session, make_subscription):
+    big, small = _seed_tenant(db_session, make_subscription, due=5, not_due=2), _seed_tenant(db_session, make_subscription, due=1)
+
+    ranges = due_subscription_ranges(db_session, CUTOFF, chunk_size=2)
+
+    assert sorted(count for tenant_id, *_, count in ranges if tenant_id == big) == [1, 2, 2]
+    assert [count for tenant_id, *_, count in ranges if tenant_id == small] == [1]
+    assert all(end_id is None or first_id < end_id for _, first_id, end_id, _ in ranges)
+
+
+def test_rerunning_a_range_does_not_bill_twice(db_session, make_subscription):
+    tenant_id = _seed_tenant(db_session, make_subscription, due=3)
+    [(_, first_id, _, _)] = due_subscription_ranges(db_session, CUTOFF, chunk_size=10)
+
+    assert len(invoice_due_range(db_session, str(tenant_id), str(first_id), None, CUTOFF)) == 3
+    db_session.commit()
+    assert invoice_due_range(db_session, str(tenant_id), str(first_id), None, CUTOFF) == []
+    assert db_session.query(Invoice).count() == 3
+
+
+def test_fanout_invoices_every_due_subscription_and_reduces(db_session, monkeypatch, make_subscription):
+    big, small = _seed_tenant(db_session, make_subscription, due=5, not_due=1), _seed_tenant(db_session, make_subscription, due=2)
+    redis_client, queue = FakeRunRedis(), FakeQueue()
+    monkeypatch.setattr(jobs, "SessionLocal", lambda: db_session)
+    monkeypatch.setattr(jobs, "get_redis", lambda: redis_client)
+    monkeypatch.setattr(jobs, "get_queue", lambda name="default": queue)
+
+    run_id = jobs.invoice_fanout_job(cutoff=CUTOFF.isoformat(), chunk_size=2)
+    queue.drain()
+
+    progress = run_progress(redis_client, run_id)
+    assert progress["status"] == "finished"
+    assert (progress["chunks_total"], progress["chunks_done"], progress["invoices"]) == ("4", "4", "7")
+    assert db_session.query(Invoice).filter(Invoice.tenant_id == big).count() == 5
+    assert db_session.get(TenantRevenueMV, small).invoiced_revenue == Decimal("20")
+
+
+def test_repeated_chunk_reports_count_once(db_session, monkeypatch, make_subscription):
+    tenant_id = _seed_tenant(db_session, make_subscription, due=3)
+    redis_client, queue = FakeRunRedis(), FakeQueue()
+    monkeypatch.setattr(jobs, "SessionLocal", lambda: db_session)
+    monkeypatch.setattr(jobs, "get_redis", lambda: redis_client)
+    monkeypatch.setattr(jobs, "get_queue", lambda name="default": queue)
+
+    run_id = jobs.invoice_fanout_job(cutoff=CUTOFF.isoformat(), chunk_size=2)
+    first, second = queue.jobs
+    queue.jobs = []
+    # A retried chunk job reports again before the last chunk finishes, and once more after.
+    first[0](*first[1])
+    first[0](*first[1])
+    second[0](*second[1])
+    first[0](*first[1])
+    reducers = [job for job in queue.jobs if job[0] is jobs.invoice_reduce_job]
+    queue.drain()
+
+    progress = run_progress(redis_client, run_id)
+    assert len(reducers) == 1 and progress["status"] == "finished"
+    assert (progress["chunks_done"], progress["chunks_failed"], progress["invoices"]) == ("2", "0", "3")
+    assert db_session.query(Invoice).filter(Invoice.tenant_id == tenant_id).count() == 3
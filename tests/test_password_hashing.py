@@ -0,0 +1,52 @@
+import asyncio
+import uuid
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.domain.models import Role, Tenant, User
+from app.security import build_password_context, pwd_context
+from app.services import passwords
+from app.services.auth import authenticate_user_async
+
+
+def test_login_rehashes_outdated_hash():
+    async def scenario():
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+            tenant = Tenant(id=uuid.uuid4(), name=f"tenant-{uuid.uuid4().hex[:8]}")
+            outdated = build_password_context("pbkdf2_sha256", 1000).hash("secret123")
+            user = User(tenant_id=tenant.id, email="ops@example.com", hashed_password=outdated, role=Role.admin)
+            db.add_all([tenant, user])
+            await db.commit()
+
+            await authenticate_user_async(db, str(tenant.id), "ops@example.com", "secret123")
+            rehashed = user.hashed_password
+            assert "$1000$" not in rehashed and pwd_context.verify("secret123", rehashed)
+            # Current parameters are left alone.
+            await authenticate_user_async(db, str(tenant.id), "ops@example.com", "secret123")
+            assert user.hashed_password == rehashed
+        await engine.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_scheme_change_keeps_old_hashes_valid():
+    old = build_password_context("pbkdf2_sha256").hash("secret123")
+    context = build_password_context("pbkdf2_sha512", 30000)
+
+    valid, new_hash = context.verify_and_update("secret123", old)
+    assert valid and new_hash.startswith("$pbkdf2-sha512$30000$")
+    assert context.verify_and_update("wrong", old) == (False, None)
+
+
+def test_pool_hashes_in_worker_processes():
+    hashed = asyncio.run(passwords.hash_password_async("secret123"))
+
+    assert passwords.get_password_pool() is not None
+    assert asyncio.run(passwords.verify_password_async("secret123", hashed)) == (True, None)
+    assert asyncio.run(passwords.verify_password_async("wrong", hashed)) == (False, None)
+    passwords.shutdown_password_pool()
@@ -1,4 +1,19 @@
-from app.services.pricing import calculate_flat, calculate_tiered, calculate_volume
+from decimal import Decimal
+import random
+import uuid
+
+import pytest
+
+from app.domain.models import Plan, PricingModel
+from app.services.pricing import (
+    PriceSchedule,
+    calculate_flat,
+    calculate_tiered,
+    calculate_volume,
+    clear_schedule_cache,
+    compile_schedule,
+    schedule_for_plan,
+)
 
 
 def test_calculate_flat():
@@ -21,3 +36,51 @@ def test_calculate_volume():
         {"up_to": None, "unit_amount": 0.03},
     ]
     assert float(calculate_volume(tiers, 150)) == 7.5
+
+
+def test_compiled_schedules_match_reference_functions():
+    rng = random.Random(7)
+    tier_sets = [
+        [],
+        [{"up_to": None, "unit_amount": 0.02}],
+        [{"up_to": 200, "unit_amount": 0.05}, {"up_to": None, "unit_amount": 0.03}, {"up_to": 100, "unit_amount": 0.1}],
+        [{"up_to": 100, "unit_amount": 0.1}, {"up_to": 100, "unit_amount": 0.2}, {"up_to": 250.5, "unit_amount": 0.07}],
+        [{"up_to": 0, "unit_amount": 1}, {"up_to": 50, "unit_amount": 0.5}, {"up_to": None, "unit_amount": 0.25}],
+        [{"up_to": -10, "unit_amount": 3}, {"up_to": 40, "unit_amount": 0.4}],
+    ]
+    for _ in range(20):
+        caps = rng.sample(range(1, 1000), rng.randint(1, 6))
+        tiers = [{"up_to": cap, "unit_amount": round(rng.uniform(0, 2), 4)} for cap in caps]
+        if rng.random() < 0.5:
+            tiers.insert(rng.randrange(len(tiers) + 1), {"up_to": None, "unit_amount": round(rng.uniform(0, 1), 4)})
+        tier_sets.append(tiers)
+    quantities = [0, -5, 1, 0.5, 40, 50, 100, 100.25, 250.5, 999, 10_000] + [rng.uniform(0, 1500) for _ in range(50)]
+
+    for tiers in tier_sets:
+        tiered = compile_schedule(PricingModel.tiered, tiers=tiers)
+        assert tiered.price_many(quantities) == [calculate_tiered(tiers, q) for q in quantities]
+        if tiers:
+            volume = compile_schedule(PricingModel.volume, tiers=tiers)
+            assert volume.price_many(quantities) == [calculate_volume(tiers, q) for q in quantities]
+    flat = compile_schedule(PricingModel.flat, price=Decimal("19.99"))
+    assert flat.price_many(quantities) == [calculate_flat(Decimal("19.99"), q) for q in quantities]
+
+
+def test_schedule_cache_follows_plan_version():
+    clear_schedule_cache()
+    plan = Plan(id=uuid.uuid4(), pricing_model=PricingModel.tiered, price=0, tiers=[{"up_to": None, "unit_amount": 1}])
+    plan.version = 1
+    assert schedule_for_plan(plan) is schedule_for_plan(plan)
+    assert schedule_for_plan(plan).price(3) == Decimal("3.00")
+
+    plan.tiers = [{"up_to": None, "unit_amount": 2}]
+    plan.version = 2
+    assert schedule_for_plan(plan).price(3) == Decimal("6.00")
+
+
+def test_schedule_without_price_fails_at_construction():
+    class Unpriced(PriceSchedule):
+        __slots__ = ()
+
+    with pytest.raises(TypeError):
+        Unpriced()
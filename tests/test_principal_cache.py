@@ -0,0 +1,127 @@
+import uuid
+
+from sqlalchemy import event
+
+from app.api.v1.tenants import update_tenant_user
+from app.domain.models import Role, Tenant, User
+from app.schemas.tenant import TenantUserUpdate
+from app.services.auth import update_user_role
+from app.services.principals import Principal, PrincipalCache, load_principal, principal_cache
+
+
+def _seed_user(db_session, role: Role = Role.admin) -> User:
+    tenant = Tenant(id=uuid.uuid4(), name=f"tenant-{uuid.uuid4().hex[:8]}")
+    user = User(id=uuid.uuid4(), tenant_id=tenant.id, email="ops@example.com", hashed_password="x", role=role)
+    db_session.add_all([tenant, user])
+    db_session.commit()
+    return user
+
+
+def _count_statements(db_session) -> list:
+    statements = []
+    event.listen(db_session.get_bind(), "before_cursor_execute", lambda *args, **kwargs: statements.append(args[2]))
+    return statements
+
+
+def test_cached_principal_skips_users_query(db_session):
+    principal_cache.clear()
+    user = _seed_user(db_session)
+    statements = _count_statements(db_session)
+
+    first = load_principal(db_session, str(user.id), str(user.tenant_id))
+    second = load_principal(db_session, str(user.id), str(user.tenant_id))
+
+    assert first == second == Principal(id=user.id, tenant_id=user.tenant_id, role=Role.admin)
+    assert len(statements) == 1
+    assert load_principal(db_session, str(user.id), str(uuid.uuid4())) is None
+
+
+def test_role_change_is_visible_after_invalidation(db_session):
+    principal_cache.clear()
+    user = _seed_user(db_session)
+    load_principal(db_session, str(user.id), str(user.tenant_id))
+
+    update_user_role(db_session, str(user.tenant_id), str(user.id), Role.read_only)
+    db_session.commit()
+    principal_cache.invalidate(user.id)
+
+    assert load_principal(db_session, str(user.id), str(user.tenant_id)).role == Role.read_only
+
+
+def test_role_change_endpoint_evicts_cached_principal(db_session):
+    principal_cache.clear()
+    user = _seed_user(db_session)
+    load_principal(db_session, str(user.id), str(user.tenant_id))
+
+    update_tenant_user(TenantUserUpdate(role=Role.read_only), str(user.tenant_id), str(user.id), db_session, user)
+
+    assert principal_cache.get(str(user.id)) is None
+    assert load_principal(db_session, str(user.id), str(user.tenant_id)).role == Role.read_only
+
+
+def test_entries_expire_and_evict():
+    now = [0.0]
+    cache = PrincipalCache(ttl_seconds=10, max_size=2, check_seconds=5, clock=lambda: now[0])
+    principals = [Principal(id=uuid.uuid4(), tenant_id=uuid.uuid4(), role=Role.finance) for _ in range(3)]
+    for principal in principals:
+        cache.put(principal)
+
+    assert cache.get(principals[0].id) is None
+    assert cache.get(principals[2].id) == principals[2]
+    now[0] = 6.0
+    # Past the check interval an entry whose version cannot be confirmed is reloaded.
+    assert cache.get(principals[2].id) is None
+    cache.put(principals[2])
+    now[0] = 11.0
+    assert cache.get(principals[2].id) is None
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def mget(self, *keys):
+        return [self.data.get(key) for key in keys]
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def incr(self, key):
+        self.commands.append(lambda: self.redis.data.__setitem__(key, int(self.redis.data.get(key) or 0) + 1))
+
+    def delete(self, key):
+        self.commands.append(lambda: self.redis.data.pop(key, None))
+
+    def execute(self):
+        for command in self.commands:
+            command()
+
+
+def test_invalidation_reaches_other_processes():
+    now, redis = [0.0], FakeRedis()
+    api, worker = (
+        PrincipalCache(ttl_seconds=60, max_size=10, check_seconds=1, redis_client=redis, shared=True, clock=lambda: now[0])
+        for _ in range(2)
+    )
+    principal = Principal(id=uuid.uuid4(), tenant_id=uuid.uuid4(), role=Role.admin)
+    api.put(principal, api.version(principal.id))
+    assert worker.get(principal.id) == principal
+
+    api.invalidate(principal.id)
+    # A copy stored by a load that started before the invalidation is ignored.
+    api.put(principal, 0)
+    assert worker.get(principal.id) == principal
+    now[0] = 1.5
+    assert worker.get(principal.id) is None
@@ -0,0 +1,128 @@
+import pstats
+import threading
+import time
+
+from fastapi import APIRouter, FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+import pytest
+
+from app.api.v1.debug import require_profiling_enabled
+from app.instrumentation import begin_request
+from app.profiling import (
+    ProfiledRoute,
+    SamplingProfiler,
+    begin_request_profile,
+    collapsed,
+    profile_worker_job,
+    request_profile_lock,
+)
+
+
+def busy_loop(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        sum(range(100))
+
+
+class FakePipeline:
+    def __init__(self, store: dict):
+        self.store = store
+        self.ops = []
+
+    def hincrby(self, key, field, amount):
+        self.ops.append((key, field, amount))
+
+    def expire(self, key, seconds):
+        pass
+
+    def execute(self):
+        for key, field, amount in self.ops:
+            stacks = self.store.setdefault(key, {})
+            stacks[field] = stacks.get(field, 0) + amount
+
+
+class FakeRedis:
+    def __init__(self):
+        self.store: dict = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self.store)
+
+
+def test_sampler_writes_collapsed_stacks_of_other_threads():
+    worker = threading.Thread(target=busy_loop, args=(0.3,), name="busy worker")
+    worker.start()
+    counts = SamplingProfiler(interval=0.005, thread_ids={worker.ident}).run(0.2)
+    worker.join()
+
+    lines = collapsed(counts).splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(" ", 1)
+    assert stack.startswith("busy_worker;") and int(count) > 0
+    assert any(f"{__name__}:busy_loop" in line for line in lines)
+
+
+def test_worker_job_stacks_are_merged_into_redis():
+    redis_client = FakeRedis()
+    session = {"id": "s1", "until": time.time() + 5, "interval_ms": 5}
+
+    for _ in range(2):
+        with profile_worker_job(redis_client, session):
+            busy_loop(0.05)
+
+    [stacks] = redis_client.store.values()
+    assert sum(count for stack, count in stacks.items() if "busy_loop" in stack) >= 2
+
+
+def test_profiled_route_profiles_admin_requests_on_their_thread(monkeypatch):
+    monkeypatch.setattr("app.profiling.settings.profiling_enabled", True)
+    router = APIRouter(route_class=ProfiledRoute)
+
+    @router.get("/items/{item_id}")
+    def read_item(item_id: int, q: str | None = None):
+        busy_loop(0.01)
+        return {"item_id": item_id, "q": q}
+
+    @router.get("/async-items")
+    async def read_items():
+        busy_loop(0.01)
+        return []
+
+    app = FastAPI()
+    app.include_router(router)
+    requested = []
+
+    @app.middleware("http")
+    async def profile_requests(request: Request, call_next):
+        # Stands in for authentication tagging the request with the caller's role.
+        begin_request(request.url.path).role = request.headers.get("X-Role")
+        requested.append(begin_request_profile(request.headers))
+        return await call_next(request)
+
+    client = TestClient(app)
+    admin = {"X-Debug-Profile": "1", "X-Role": "admin"}
+    assert client.get("/items/3?q=x").json() == {"item_id": 3, "q": "x"}
+    assert client.get("/items/3", headers={"X-Debug-Profile": "1", "X-Role": "viewer"}).status_code == 200
+    assert client.get("/items/3", headers=admin).status_code == 200
+    assert client.get("/async-items", headers=admin).status_code == 200
+    with request_profile_lock:
+        # Another request already holds the profiler: this one runs unprofiled.
+        assert client.get("/items/3", headers=admin).status_code == 200
+
+    anonymous, viewer, sync_admin, async_admin, busy = requested
+    assert anonymous is None and viewer.profile is None and busy.profile is None
+    for profile, endpoint in ((sync_admin.profile, "read_item"), (async_admin.profile, "read_items")):
+        functions = {name for _, _, name in pstats.Stats(profile).stats}
+        assert {endpoint, "busy_loop"} <= functions
+    params = app.openapi()["paths"]["/items/{item_id}"]["get"]["parameters"]
+    assert [p["name"] for p in params] == ["item_id", "q"]
+
+
+def test_profiling_endpoints_are_hidden_unless_enabled(monkeypatch):
+    monkeypatch.setattr("app.api.v1.debug.settings.profiling_enabled", False)
+    with pytest.raises(HTTPException) as exc:
+        require_profiling_enabled()
+    assert exc.value.status_code == 404
+
+    monkeypatch.setattr("app.api.v1.debug.settings.profiling_enabled", True)
+    require_profiling_enabled()
@@ -0,0 +1,41 @@
+import pytest
+from redis import BlockingConnectionPool
+from redis.connection import Connection
+from redis.exceptions import ConnectionError
+
+from app.dependencies import get_redis_client
+from app.redis_client import _pool_stats, init_redis_pool
+from app.workers.queue import get_queue
+
+
+class IdleConnection(Connection):
+    def connect(self):
+        pass
+
+    def can_read(self, timeout=0):
+        return False
+
+
+def test_clients_share_one_pool():
+    pool = init_redis_pool()
+
+    assert get_redis_client().connection_pool is pool
+    assert get_redis_client().connection_pool is pool
+    assert get_queue("billing").connection.connection_pool is pool
+
+
+def test_exhausted_pool_waits_then_fails():
+    pool = BlockingConnectionPool(connection_class=IdleConnection, max_connections=2, timeout=0.05)
+    first, second = pool.get_connection(), pool.get_connection()
+    assert first is not second
+    assert _pool_stats(pool) == (2, 0)
+
+    with pytest.raises(ConnectionError, match="No connection available"):
+        pool.get_connection()
+    pool.release(first)
+
+    assert _pool_stats(pool) == (1, 1)
+    assert pool.get_connection() is first
+    pool.release(first)
+    pool.release(second)
+    assert _pool_stats(pool) == (0, 2)
@@ -0,0 +1,85 @@
+import asyncio
+from types import SimpleNamespace
+import uuid
+
+from prometheus_client import REGISTRY
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.domain.models import Role, Tenant
+from app.instrumentation import (
+    OTHER_TENANTS,
+    TopTenants,
+    begin_request,
+    current_request,
+    record_request,
+    tag_principal,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_only_the_busiest_tenants_keep_a_label():
+    clock, evicted = FakeClock(), []
+    tenants = TopTenants(k=2, window_seconds=60, clock=clock, on_evict=evicted.append)
+
+    assert [tenants.label(t) for t in ("a", "b", "c")] == ["a", "b", OTHER_TENANTS]
+    for _ in range(3):
+        tenants.label("c")
+    tenants.label("a")
+
+    clock.now = 61
+    # "b" had one request last window; "c" took its place.
+    assert tenants.label("c") == "c"
+    assert tenants.labelled() == {"a", "c"}
+    assert evicted == ["b"]
+    assert tenants.label("b") == OTHER_TENANTS
+    assert tenants.label(None) == "none"
+
+
+def test_queries_are_attributed_to_the_current_request(db_session):
+    tenant = Tenant(id=uuid.uuid4(), name="T1")
+    db_session.add(tenant)
+    db_session.commit()
+
+    stats = begin_request("/v1/tenants/x", "not-a-uuid")
+    try:
+        tag_principal(SimpleNamespace(tenant_id=tenant.id, role=Role.admin))
+        db_session.scalars(select(Tenant)).all()
+        db_session.get(Tenant, uuid.uuid4())
+    finally:
+        current_request.set(None)
+
+    assert stats.db_queries == 2
+    assert stats.db_seconds > 0
+    assert (stats.tenant_id, stats.role) == (str(tenant.id), "admin")
+
+    route = f"/v1/tenants/{{tenant_id}}/{uuid.uuid4()}"
+    record_request(stats, {"route": SimpleNamespace(path=route)}, "GET", 404)
+    labels = {"method": "GET", "route": route, "status_class": "4xx"}
+    assert REGISTRY.get_sample_value("http_request_duration_seconds_count", labels) == 1
+    assert REGISTRY.get_sample_value("http_request_db_queries_sum", {"route": route}) == 2
+    assert REGISTRY.get_sample_value("http_request_duration_seconds_count", {**labels, "route": "unmatched"}) is None
+
+
+def test_async_queries_reach_the_request_from_the_greenlet():
+    async def scenario():
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        stats = begin_request("/v1/usage")
+        async with engine.connect() as conn:
+            await conn.execute(select(Tenant))
+        await engine.dispose()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert stats.db_queries == 1
@@ -0,0 +1,40 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+import uuid
+
+import orjson
+
+from app.api.responses import ORJSONResponse, dumps
+from app.domain.models import InvoiceStatus
+
+
+class DriverUUID(uuid.UUID):
+    """Stands in for asyncpg's UUID subclass."""
+
+
+def test_money_stays_exact_and_domain_values_render():
+    invoice_id = uuid.uuid4()
+    body = orjson.loads(
+        dumps(
+            {
+                "id": DriverUUID(str(invoice_id)),
+                "total": Decimal("0.10") + Decimal("0.20"),
+                "large": Decimal("12345678901.99"),
+                "status": InvoiceStatus.paid,
+                "period_start": datetime(2025, 1, 1, tzinfo=timezone.utc),
+            }
+        )
+    )
+    assert body == {
+        "id": str(invoice_id),
+        "total": "0.30",
+        "large": "12345678901.99",
+        "status": "paid",
+        "period_start": "2025-01-01T00:00:00Z",
+    }
+
+
+def test_response_renders_with_the_same_encoder():
+    response = ORJSONResponse([{"amount": Decimal("1.50")}], status_code=201)
+    assert response.status_code == 201
+    assert response.body == b'[{"amount":"1.50"}]'
@@ -0,0 +1,50 @@
+from decimal import Decimal
+
+from app.domain.models import InvoiceStatus, PricingModel, TenantRevenueMV
+from app.services.invoices import load_invoices, run_invoicing_bulk, update_invoice_status
+from app.services.revenue import rebuild_revenue_mv
+from app.services.subscriptions import create_subscription
+
+
+def _revenue(db_session, tenant_id) -> tuple[Decimal, Decimal, Decimal]:
+    db_session.expire_all()
+    mv = db_session.get(TenantRevenueMV, tenant_id)
+    return (
+        Decimal(str(mv.monthly_recurring_revenue)),
+        Decimal(str(mv.annual_run_rate)),
+        Decimal(str(mv.invoiced_revenue)),
+    )
+
+
+def test_revenue_deltas_match_full_rebuild(db_session, make_plan):
+    seats = make_plan(db_session, name="Seats", price=Decimal("12.50"))
+    metered = make_plan(
+        db_session,
+        product=seats.product,
+        name="Metered",
+        pricing_model=PricingModel.volume,
+        price=Decimal("5"),
+        tiers=[{"up_to": None, "unit_amount": 1}],
+    )
+    db_session.commit()
+    tenant_id = seats.tenant_id
+
+    create_subscription(db_session, tenant_id=tenant_id, plan_id=seats.id, quantity=4)
+    create_subscription(db_session, tenant_id=tenant_id, plan_id=metered.id, quantity=1)
+    create_subscription(db_session, tenant_id=tenant_id, plan_id=seats.id, quantity=10, trial_days=14)
+    db_session.commit()
+    assert _revenue(db_session, tenant_id) == (Decimal("55.00"), Decimal("660.00"), Decimal("0"))
+
+    invoices = load_invoices(db_session, run_invoicing_bulk(db_session, str(tenant_id)))
+    db_session.commit()
+    assert _revenue(db_session, tenant_id)[2] == Decimal("50.00")
+
+    update_invoice_status(db_session, invoices[0], InvoiceStatus.paid)
+    update_invoice_status(db_session, invoices[1], InvoiceStatus.failed)
+    db_session.commit()
+    incremental = _revenue(db_session, tenant_id)
+    assert incremental[2] == Decimal("50.00") - Decimal(str(invoices[1].total))
+
+    rebuild_revenue_mv(db_session, tenant_id)
+    db_session.commit()
+    assert _revenue(db_session, tenant_id) == incremental
@@ -0,0 +1,110 @@
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.domain.models import Invoice, InvoiceStatus, RevenueSnapshot, SubscriptionStatus
+from app.services.revenue_snapshots import (
+    mrr_by_plan_async,
+    mrr_series_async,
+    revenue_by_product_async,
+    take_revenue_snapshot,
+)
+from app.workers import jobs
+
+DAY = date(2025, 3, 1)
+EARLIER = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def test_snapshots_track_mrr_movement(make_plan, make_subscription):
+    async def scenario():
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        Session = async_sessionmaker(engine, expire_on_commit=False)
+        async with Session() as db:
+            basic = make_plan(db, name="Basic", price=Decimal("10"), created_at=EARLIER)
+            pro = make_plan(db, product=basic.product, name="Pro", price=Decimal("50"), created_at=EARLIER)
+            tenant_id = basic.tenant_id
+            grows, upgrades, cancels, deleted = (
+                make_subscription(db, basic, quantity=2, period_start=EARLIER, created_at=EARLIER) for _ in range(4)
+            )
+            await db.commit()
+            # First snapshot: existing subscriptions are the baseline.
+            await db.run_sync(take_revenue_snapshot, tenant_id, DAY)
+            await db.commit()
+
+            grows.quantity = 5
+            upgrades.plan_id = pro.id
+            cancels.status = SubscriptionStatus.canceled
+            await db.delete(deleted)
+            created = datetime(2025, 3, 2, 9, tzinfo=timezone.utc)
+            make_subscription(db, pro, period_start=created, created_at=created)
+            db.add(
+                Invoice(
+                    tenant_id=tenant_id,
+                    subscription_id=grows.id,
+                    total=Decimal("7.50"),
+                    period_start=EARLIER,
+                    period_end=created,
+                    status=InvoiceStatus.sent,
+                    created_at=created,
+                )
+            )
+            await db.commit()
+            await db.run_sync(take_revenue_snapshot, tenant_id, DAY + timedelta(days=1))
+            await db.commit()
+            # Re-running a day adds no movement.
+            await db.run_sync(take_revenue_snapshot, tenant_id, DAY + timedelta(days=1))
+            await db.commit()
+
+            series = await mrr_series_async(db, tenant_id, DAY, DAY + timedelta(days=30))
+            assert [point["mrr"] for point in series] == [Decimal("80"), Decimal("200")]
+            assert series[0]["new_mrr"] == series[0]["churned_mrr"] == 0
+            second = series[1]
+            assert second["annual_run_rate"] == Decimal("2400") and second["active_subscriptions"] == 3
+            # +30 quantity, +100 plan change in, +50 new; -20 plan change out, -40 churned.
+            assert (second["new_mrr"], second["expansion_mrr"]) == (Decimal("50"), Decimal("130"))
+            assert (second["contraction_mrr"], second["churned_mrr"]) == (Decimal("20"), Decimal("40"))
+            assert second["net_new_mrr"] == second["mrr"] - series[0]["mrr"]
+
+            plans = await mrr_by_plan_async(db, tenant_id, DAY, DAY + timedelta(days=1))
+            by_plan = {row["plan_name"]: row for row in plans}
+            assert by_plan["Basic"]["mrr"] == Decimal("50") and by_plan["Basic"]["churned_mrr"] == Decimal("40")
+            assert by_plan["Pro"]["mrr"] == Decimal("150") and by_plan["Pro"]["active_subscriptions"] == 2
+
+            products = await revenue_by_product_async(db, tenant_id, DAY, DAY + timedelta(days=1))
+            assert [(row["product_name"], row["mrr"], row["invoiced_revenue"]) for row in products] == [
+                ("API", Decimal("200"), Decimal("7.50"))
+            ]
+        await engine.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_daily_job_snapshots_the_day_that_just_ended(db_session, monkeypatch, make_subscription):
+    sub = make_subscription(
+        db_session, name="Basic", price=Decimal("10"), quantity=2, period_start=EARLIER, created_at=EARLIER
+    )
+    yesterday = datetime.now(timezone.utc).date() - timedelta(days=1)
+    evening = datetime.combine(yesterday, datetime.min.time(), tzinfo=timezone.utc) + timedelta(hours=22)
+    invoice = Invoice(
+        tenant_id=sub.tenant_id,
+        subscription_id=sub.id,
+        total=Decimal("20"),
+        period_start=EARLIER,
+        period_end=evening,
+        status=InvoiceStatus.sent,
+        created_at=evening,
+    )
+    db_session.add(invoice)
+    db_session.commit()
+    monkeypatch.setattr(jobs, "SessionLocal", lambda: db_session)
+
+    assert jobs.revenue_snapshot_job(str(sub.tenant_id)) == 1
+    [row] = db_session.query(RevenueSnapshot).all()
+    assert row.snapshot_date == yesterday
+    assert (row.mrr, row.invoiced_revenue) == (Decimal("20"), Decimal("20"))
@@ -1,20 +1,39 @@
+import asyncio
 import uuid
 
 import pytest
 from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
 
+from app.database import Base
 from app.domain.models import Role, Tenant
-from app.services.auth import authenticate_user, create_user
+from app.security import get_password_hash
+from app.services.auth import authenticate_user_async, create_user
 
 
-def test_authentication_respects_tenant(db_session):
-    tenant_a = Tenant(id=uuid.uuid4(), name="TenantA")
-    tenant_b = Tenant(id=uuid.uuid4(), name="TenantB")
-    db_session.add_all([tenant_a, tenant_b])
-    db_session.flush()
+def test_authentication_respects_tenant():
+    async def scenario():
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+            tenant_a = Tenant(id=uuid.uuid4(), name="TenantA")
+            tenant_b = Tenant(id=uuid.uuid4(), name="TenantB")
+            db.add_all([tenant_a, tenant_b])
+            await db.flush()
 
-    create_user(db_session, tenant_id=str(tenant_a.id), email="user@example.com", password="secret123", role=Role.admin)
-    db_session.commit()
+            await db.run_sync(
+                create_user,
+                tenant_id=str(tenant_a.id),
+                email="user@example.com",
+                password_hash=get_password_hash("secret123"),
+                role=Role.admin,
+            )
+            await db.commit()
 
-    with pytest.raises(HTTPException):
-        authenticate_user(db_session, tenant_id=str(tenant_b.id), email="user@example.com", password="secret123")
+            with pytest.raises(HTTPException):
+                await authenticate_user_async(db, tenant_id=str(tenant_b.id), email="user@example.com", password="secret123")
+        await engine.dispose()
+
+    asyncio.run(scenario())
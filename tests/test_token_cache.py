@@ -0,0 +1,65 @@
+from datetime import timedelta
+import time
+
+from jose import jwt
+import pytest
+
+from app import security
+from app.security import TokenClaimsCache, _decode_hmac, _decode_jose, create_access_token, decode_token, token_cache
+
+
+def test_cached_claims_skip_verification(monkeypatch):
+    token_cache.clear()
+    token = create_access_token("user-1", "tenant-1")
+    calls = []
+    monkeypatch.setattr(security, "_decode", lambda value: calls.append(value) or _decode_jose(value))
+
+    assert decode_token(token)["sub"] == "user-1"
+    assert decode_token(token)["tenant_id"] == "tenant-1"
+    assert len(calls) == 1
+    # Invalid tokens are verified (and rejected) every time.
+    assert decode_token(token + "x") is None
+    assert decode_token(token + "x") is None
+    assert len(calls) == 3
+
+
+def test_entries_expire_with_the_token():
+    now = [1000.0]
+    cache = TokenClaimsCache(ttl_seconds=300, max_size=2, clock=lambda: now[0])
+    cache.put("short", {"sub": "a", "exp": 1010})
+    cache.put("long", {"sub": "b", "exp": 5000})
+    cache.put("gone", {"sub": "c", "exp": 900})
+
+    assert cache.get("gone") is None
+    now[0] = 1011
+    assert cache.get("short") is None
+    assert cache.get("long")["sub"] == "b"
+    # The cache TTL caps tokens that live longer.
+    now[0] = 1301
+    assert cache.get("long") is None
+
+
+def test_lru_bound():
+    cache = TokenClaimsCache(ttl_seconds=300, max_size=2)
+    for name in ("a", "b", "c"):
+        cache.put(name, {"sub": name})
+
+    assert cache.get("a") is None
+    assert cache.get("c") == {"sub": "c"}
+
+
+@pytest.mark.parametrize(
+    "token",
+    [
+        create_access_token("user-1", "tenant-1"),
+        create_access_token("user-1", "tenant-1", expires_delta=timedelta(seconds=-5)),
+        jwt.encode({"sub": "user-1", "exp": int(time.time()) + 60}, "other-secret", algorithm="HS256"),
+        jwt.encode({"sub": "user-1", "nbf": int(time.time()) + 60}, security.settings.jwt_secret_key, algorithm="HS256"),
+        jwt.encode({"sub": "user-1"}, security.settings.jwt_secret_key, algorithm="HS512"),
+        create_access_token("user-1", "tenant-1")[:-4] + "AAAA",
+        "not.a.token",
+        "garbage",
+    ],
+)
+def test_hmac_backend_agrees_with_jose(token):
+    assert _decode_hmac(token) == _decode_jose(token)
@@ -0,0 +1,49 @@
+from app.domain.models import UsageEvent
+from app.schemas.usage import UsageEventBatchItem, UsageIngestStatus
+from app.services.usage import ingest_usage_batch
+
+
+def _event(subscription_id, key: str) -> UsageEventBatchItem:
+    return UsageEventBatchItem(subscription_id=str(subscription_id), metric="api_calls", quantity=1, idempotency_key=key)
+
+
+def test_batch_reports_status_per_event(db_session, make_subscription):
+    sub, foreign = make_subscription(db_session), make_subscription(db_session)
+    db_session.commit()
+
+    results = ingest_usage_batch(
+        db_session,
+        tenant_id=str(sub.tenant_id),
+        events=[
+            _event(sub.id, "k1"),
+            _event(sub.id, "k2"),
+            _event(sub.id, "k1"),
+            _event(foreign.id, "k3"),
+            _event("not-a-uuid", "k4"),
+        ],
+    )
+    db_session.commit()
+
+    assert [r["status"] for r in results] == [
+        UsageIngestStatus.accepted,
+        UsageIngestStatus.accepted,
+        UsageIngestStatus.duplicate,
+        UsageIngestStatus.rejected,
+        UsageIngestStatus.rejected,
+    ]
+    assert results[0]["id"] is not None
+    assert db_session.query(UsageEvent).count() == 2
+
+
+def test_batch_is_idempotent_across_calls(db_session, make_subscription):
+    sub = make_subscription(db_session)
+    db_session.commit()
+    events = [_event(sub.id, f"key-{i}") for i in range(3)]
+
+    ingest_usage_batch(db_session, tenant_id=str(sub.tenant_id), events=events)
+    db_session.commit()
+    results = ingest_usage_batch(db_session, tenant_id=str(sub.tenant_id), events=events + [_event(sub.id, "key-3")])
+    db_session.commit()
+
+    assert [r["status"] for r in results] == [UsageIngestStatus.duplicate] * 3 + [UsageIngestStatus.accepted]
+    assert db_session.query(UsageEvent).count() == 4
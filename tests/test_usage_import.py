@@ -0,0 +1,55 @@
+import json
+import uuid
+from app.domain.models import UsageEvent
+from app.schemas.usage import UsageImportFormat
+from app.services.usage_import import import_usage
+
+
+def test_ndjson_import_reports_progress_and_resumes(db_session, make_subscription):
+    sub = make_subscription(db_session)
+    db_session.commit()
+    lines = [
+        json.dumps({"subscription_id": str(sub.id), "metric": "api_calls", "quantity": i, "idempotency_key": f"k{i}"})
+        for i in range(5)
+    ]
+    lines.insert(2, "{not json")
+    checkpoints = []
+
+    progress = import_usage(
+        db_session,
+        tenant_id=str(sub.tenant_id),
+        lines=iter(lines[:4]),
+        fmt=UsageImportFormat.ndjson,
+        chunk_size=2,
+        on_progress=lambda p: checkpoints.append(p.offset),
+    )
+    assert checkpoints == [2, 4]
+    assert (progress.accepted, progress.rejected) == (3, 1)
+
+    resumed = import_usage(
+        db_session,
+        tenant_id=str(sub.tenant_id),
+        lines=iter(lines),
+        fmt=UsageImportFormat.ndjson,
+        chunk_size=2,
+        start_offset=progress.offset,
+    )
+    assert (resumed.offset, resumed.accepted, resumed.duplicates) == (6, 2, 0)
+    assert db_session.query(UsageEvent).count() == 5
+
+
+def test_csv_import_dedupes_and_rejects_unknown_subscriptions(db_session, make_subscription):
+    sub = make_subscription(db_session)
+    db_session.commit()
+    lines = [
+        "subscription_id,metric,quantity,ts,idempotency_key\n",
+        f"{sub.id},api_calls,3,2025-01-01T00:00:00Z,a\n",
+        f"{sub.id},api_calls,3,,a\n",
+        f"{uuid.uuid4()},api_calls,3,,b\n",
+    ]
+
+    progress = import_usage(
+        db_session, tenant_id=str(sub.tenant_id), lines=iter(lines), fmt=UsageImportFormat.csv, chunk_size=10
+    )
+
+    assert (progress.offset, progress.accepted, progress.duplicates, progress.rejected) == (3, 1, 1, 1)
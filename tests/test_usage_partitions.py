@@ -0,0 +1,77 @@
+from datetime import date, datetime, timezone
+
+from app.domain.models import SubscriptionStatus, UsageIdempotencyKey
+from app.schemas.usage import UsageEventBatchItem, UsageIngestStatus
+from app.services.usage import ingest_usage_batch, ingest_usage_event
+from app.services.usage_partitions import (
+    add_months,
+    ensure_usage_partitions,
+    idempotency_window_start,
+    month_start,
+    partition_month,
+    partition_name,
+    retention_cutoff,
+)
+
+
+def test_idempotency_keys_are_scoped_per_tenant(db_session, make_subscription):
+    first, second = make_subscription(db_session), make_subscription(db_session)
+    db_session.commit()
+
+    for sub in (first, second):
+        event, duplicate = ingest_usage_event(db_session, str(sub.tenant_id), str(sub.id), "api_calls", 1, None, "shared")
+        db_session.commit()
+        assert event is not None and duplicate is False
+
+    item = UsageEventBatchItem(subscription_id=str(first.id), metric="api_calls", quantity=1, idempotency_key="shared")
+    [result] = ingest_usage_batch(db_session, str(first.tenant_id), [item])
+    assert result["status"] == UsageIngestStatus.duplicate
+
+
+def test_idempotency_keys_span_the_window_across_months(db_session, make_subscription):
+    now = datetime.now(timezone.utc)
+    sub = make_subscription(db_session)
+    db_session.commit()
+    month = month_start(now).date()
+    for key, months_ago in (("last-month", 1), ("expired", 2)):
+        created_month = add_months(month_start(now), -months_ago).date()
+        db_session.add(UsageIdempotencyKey(tenant_id=sub.tenant_id, idempotency_key=key, created_month=created_month))
+    db_session.commit()
+
+    items = [
+        UsageEventBatchItem(subscription_id=str(sub.id), metric="api_calls", quantity=1, idempotency_key=key)
+        for key in ("last-month", "expired")
+    ]
+    results = ingest_usage_batch(db_session, str(sub.tenant_id), items)
+    _, duplicate = ingest_usage_event(db_session, str(sub.tenant_id), str(sub.id), "api_calls", 1, None, "last-month")
+
+    assert [r["status"] for r in results] == [UsageIngestStatus.duplicate, UsageIngestStatus.accepted]
+    assert duplicate is True
+    assert db_session.get(UsageIdempotencyKey, (sub.tenant_id, "expired", month)) is not None
+
+
+def test_month_helpers():
+    month = month_start(datetime(2025, 12, 31, 23, 59, tzinfo=timezone.utc))
+
+    assert month == datetime(2025, 12, 1, tzinfo=timezone.utc)
+    assert add_months(month, 1) == datetime(2026, 1, 1, tzinfo=timezone.utc)
+    assert add_months(month, -12) == datetime(2024, 12, 1, tzinfo=timezone.utc)
+    assert partition_name(month) == "usage_events_2025_12"
+    assert partition_month("usage_events_2025_12") == month
+    assert partition_month("usage_events_default") is None
+    assert partition_name(month, "usage_idempotency_keys") == "usage_idempotency_keys_2025_12"
+    assert partition_month("usage_idempotency_keys_2025_12", "usage_idempotency_keys") == month
+    assert partition_month("usage_idempotency_keys_2025_12") is None
+    assert idempotency_window_start(1, month) == date(2025, 11, 1)
+
+
+def test_retention_waits_for_open_billing_periods(db_session, make_subscription):
+    now = datetime(2026, 6, 15, tzinfo=timezone.utc)
+    make_subscription(db_session, period_start=datetime(2024, 1, 20, tzinfo=timezone.utc), status=SubscriptionStatus.canceled)
+    db_session.commit()
+    assert retention_cutoff(db_session, 12, now) == datetime(2025, 6, 1, tzinfo=timezone.utc)
+
+    make_subscription(db_session, period_start=datetime(2025, 2, 10, tzinfo=timezone.utc))
+    db_session.commit()
+    assert retention_cutoff(db_session, 12, now) == datetime(2025, 2, 1, tzinfo=timezone.utc)
+    assert ensure_usage_partitions(db_session, 3, now) == []
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from sqlalchemy import func
+
+from app.domain.models import Subscription, UsageEvent, UsageRollup
+from app.schemas.usage import UsageEventBatchItem
+from app.services.rollups import reconcile_rollups, usage_totals
+from app.services.usage import ingest_usage_batch
+
+BASE = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def _ingest_spread(db_session, sub: Subscription) -> None:
+    events = [
+        UsageEventBatchItem(
+            subscription_id=str(sub.id),
+            metric="api_calls" if i % 2 else "storage",
+            quantity=i + 0.5,
+            ts=BASE + timedelta(minutes=17 * i),
+            idempotency_key=f"k{i}",
+        )
+        for i in range(40)
+    ]
+    ingest_usage_batch(db_session, tenant_id=str(sub.tenant_id), events=events)
+    db_session.commit()
+
+
+def test_usage_totals_match_raw_sum_for_unaligned_periods(db_session, make_subscription):
+    sub = make_subscription(db_session, period_start=BASE, period_end=BASE + timedelta(days=1))
+    db_session.commit()
+    _ingest_spread(db_session, sub)
+
+    for start, end in [
+        (BASE + timedelta(minutes=25), BASE + timedelta(hours=9, minutes=5)),
+        (BASE + timedelta(hours=2), BASE + timedelta(hours=6)),
+        (BASE + timedelta(minutes=10), BASE + timedelta(minutes=50)),
+    ]:
+        raw = (
+            db_session.query(func.coalesce(func.sum(UsageEvent.quantity), 0))
+            .filter(UsageEvent.subscription_id == sub.id, UsageEvent.ts >= start, UsageEvent.ts < end)
+            .scalar()
+        )
+        totals = usage_totals(db_session, sub.tenant_id, [(sub.id, start, end)])
+        assert totals.get(sub.id, Decimal("0")) == Decimal(str(raw))
+
+
+def test_reconcile_detects_and_repairs_drift(db_session, make_subscription):
+    sub = make_subscription(db_session, period_start=BASE, period_end=BASE + timedelta(days=1))
+    db_session.commit()
+    _ingest_spread(db_session, sub)
+    window = (BASE, BASE + timedelta(hours=12))
+    assert reconcile_rollups(db_session, sub.tenant_id, *window) == []
+
+    rollup = db_session.query(UsageRollup).first()
+    rollup.quantity = Decimal("999")
+    db_session.commit()
+
+    mismatches = reconcile_rollups(db_session, sub.tenant_id, *window, repair=True)
+    db_session.commit()
+    assert len(mismatches) == 1
+    assert reconcile_rollups(db_session, sub.tenant_id, *window) == []
@@ -0,0 +1,94 @@
+import uuid
+from datetime import datetime, timezone
+
+from app.domain.models import Subscription, UsageEvent
+from app.services.usage_stream import USAGE_DEAD_LETTER_KEY, decode_event, encode_event
+from app.workers.usage_writer import process_entries
+
+
+class FakeStreamRedis:
+    """Records what the writer acknowledges, deletes and dead-letters."""
+
+    def __init__(self):
+        self.acked: list = []
+        self.deleted: list = []
+        self.dead: list[dict] = []
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def xadd(self, key, fields):
+        assert key == USAGE_DEAD_LETTER_KEY
+        self.dead.append(fields)
+
+    def xack(self, key, group, *ids):
+        self.acked.extend(ids)
+
+    def xdel(self, key, *ids):
+        self.deleted.extend(ids)
+
+    def execute(self):
+        return []
+
+
+def _entry(sub: Subscription, key: str, subscription_id=None) -> dict:
+    fields = encode_event(
+        {
+            "id": uuid.uuid4(),
+            "tenant_id": sub.tenant_id,
+            "subscription_id": subscription_id or sub.id,
+            "metric": "api_calls",
+            "quantity": 2,
+            "ts": datetime.now(timezone.utc),
+            "idempotency_key": key,
+        }
+    )
+    return {name.encode(): value.encode() for name, value in fields.items()}
+
+
+def test_encoded_events_round_trip():
+    event = {
+        "id": uuid.uuid4(),
+        "tenant_id": uuid.uuid4(),
+        "subscription_id": uuid.uuid4(),
+        "metric": "api_calls",
+        "quantity": 1.5,
+        "ts": datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+        "idempotency_key": "k1",
+    }
+    decoded = decode_event({k.encode(): v.encode() for k, v in encode_event(event).items()})
+    assert decoded["ts"] == event["ts"]
+    assert float(decoded["quantity"]) == 1.5
+    assert decoded["subscription_id"] == event["subscription_id"]
+
+
+def test_redelivered_entries_are_written_once(db_session, make_subscription):
+    sub = make_subscription(db_session)
+    db_session.commit()
+    redis_client = FakeStreamRedis()
+    batch = [(b"1-0", _entry(sub, "k1")), (b"2-0", _entry(sub, "k2")), (b"3-0", _entry(sub, "k1"))]
+
+    assert process_entries(redis_client, batch, lambda: db_session) == 2
+    # A consumer crashed before XACK: the same entries come back through XAUTOCLAIM.
+    assert process_entries(redis_client, batch[:2], lambda: db_session) == 0
+
+    assert db_session.query(UsageEvent).count() == 2
+    assert redis_client.acked == [b"1-0", b"2-0", b"3-0", b"1-0", b"2-0"]
+    assert redis_client.deleted == redis_client.acked
+    assert redis_client.dead == []
+
+
+def test_bad_entries_are_dead_lettered(db_session, make_subscription):
+    sub = make_subscription(db_session)
+    db_session.commit()
+    redis_client = FakeStreamRedis()
+    batch = [
+        (b"1-0", _entry(sub, "k1")),
+        (b"2-0", _entry(sub, "k2", subscription_id=uuid.uuid4())),
+        (b"3-0", {b"metric": b"api_calls"}),
+        (b"4-0", None),
+    ]
+
+    assert process_entries(redis_client, batch, lambda: db_session) == 1
+    assert redis_client.acked == [b"1-0", b"2-0", b"3-0"]
+    assert sorted(fields["error"] for fields in redis_client.dead) == ["malformed: 'id'", "subscription not found"]
@@ -0,0 +1,141 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+import uuid
+
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.domain.models import Tenant, WebhookDelivery, WebhookDeliveryStatus
+from app.services.webhooks import create_webhook_event
+from app.workers.webhook_engine import WebhookDispatcher
+
+
+def _session_factory(tmp_path):
+    # A file database, so each of the dispatcher's worker threads gets its own connection
+    # (threads sharing one connection can commit each other's transactions).
+    engine = create_engine(f"sqlite+pysqlite:///{tmp_path / 'webhooks.db'}")
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine, expire_on_commit=False)
+
+
+def _seed_deliveries(Session, count: int) -> list[str]:
+    with Session() as db:
+        tenant = Tenant(id=uuid.uuid4(), name="Acme", webhook_url="https://hooks.example.com/billing")
+        db.add(tenant)
+        db.flush()
+        ids = [str(create_webhook_event(db, tenant.id, "payment.succeeded", {"n": i}).id) for i in range(count)]
+        db.commit()
+    return ids
+
+
+def test_dispatcher_limits_concurrency_per_host(tmp_path):
+    Session = _session_factory(tmp_path)
+    ids = _seed_deliveries(Session, 12)
+    inflight = 0
+    peak = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal inflight, peak
+        inflight += 1
+        peak = max(peak, inflight)
+        await asyncio.sleep(0.05)
+        inflight -= 1
+        return httpx.Response(200)
+
+    async def run():
+        dispatcher = WebhookDispatcher(
+            max_concurrency=10, per_host_concurrency=3, session_factory=Session, transport=httpx.MockTransport(handler)
+        )
+        accepted = [await dispatcher.submit(delivery_id, "https://hooks.example.com/billing") for delivery_id in ids]
+        await dispatcher.aclose()
+        return accepted, dispatcher._hosts
+
+    accepted, hosts = asyncio.run(run())
+
+    assert peak == 3
+    # Beyond twice its concurrency, a host's deliveries are left to the retry scheduler.
+    assert accepted == [True] * 6 + [False] * 6
+    assert hosts == {}
+    with Session() as db:
+        statuses = [db.get(WebhookDelivery, uuid.UUID(delivery_id)).status for delivery_id in ids]
+    assert statuses == [WebhookDeliveryStatus.delivered] * 6 + [WebhookDeliveryStatus.pending] * 6
+
+
+def test_slow_host_does_not_hold_back_other_hosts(tmp_path):
+    Session = _session_factory(tmp_path)
+    ids = _seed_deliveries(Session, 8)
+    slow_host_released = None
+    fast_done = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "slow.example.com":
+            await slow_host_released.wait()
+        else:
+            fast_done.append(request.url.host)
+        return httpx.Response(200)
+
+    async def run():
+        nonlocal slow_host_released
+        slow_host_released = asyncio.Event()
+        dispatcher = WebhookDispatcher(
+            max_concurrency=6, per_host_concurrency=2, session_factory=Session, transport=httpx.MockTransport(handler)
+        )
+        slow = [await dispatcher.submit(delivery_id, "https://slow.example.com/hook") for delivery_id in ids[:6]]
+        assert slow == [True] * 4 + [False] * 2
+        for delivery_id in ids[6:]:
+            assert await asyncio.wait_for(dispatcher.submit(delivery_id, "https://fast.example.com/hook"), 1)
+        while len(fast_done) < 2:
+            await asyncio.sleep(0.01)
+        slow_host_released.set()
+        await dispatcher.aclose()
+        return dispatcher._hosts
+
+    assert asyncio.run(run()) == {}
+    assert fast_done == ["fast.example.com"] * 2
+
+
+def test_dispatcher_schedules_retry_on_failure(tmp_path):
+    Session = _session_factory(tmp_path)
+    [delivery_id] = _seed_deliveries(Session, 1)
+
+    async def run():
+        dispatcher = WebhookDispatcher(
+            session_factory=Session, transport=httpx.MockTransport(lambda request: httpx.Response(503))
+        )
+        status = await dispatcher.deliver(delivery_id, "https://hooks.example.com/billing")
+        await dispatcher.aclose()
+        return status
+
+    assert asyncio.run(run()) == WebhookDeliveryStatus.failed
+
+
+def test_deliveries_handed_out_again_post_once(tmp_path):
+    Session = _session_factory(tmp_path)
+    [delivery_id] = _seed_deliveries(Session, 1)
+    now = datetime.now(timezone.utc)
+    stale, current = now - timedelta(minutes=10), now
+    # The scheduler re-claimed the row after the stale lease ran out.
+    with Session() as db:
+        db.get(WebhookDelivery, uuid.UUID(delivery_id)).next_attempt_at = current
+        db.commit()
+    posts = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        posts.append(request.url.host)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200)
+
+    async def run():
+        dispatcher = WebhookDispatcher(session_factory=Session, transport=httpx.MockTransport(handler))
+        for lease in (stale, current, current):
+            await dispatcher.submit(delivery_id, "https://hooks.example.com/billing", lease)
+        await dispatcher.aclose()
+
+    asyncio.run(run())
+
+    assert len(posts) == 1
+    with Session() as db:
+        delivery = db.get(WebhookDelivery, uuid.UUID(delivery_id))
+        assert (delivery.status, delivery.attempts) == (WebhookDeliveryStatus.delivered, 1)
@@ -0,0 +1,85 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from app.domain.models import Tenant, WebhookDelivery, WebhookDeliveryStatus
+from app.services.webhooks import (
+    BASE_DELAY_SECONDS,
+    RETRY_JITTER,
+    claim_due_deliveries,
+    create_webhook_event,
+    record_delivery_attempt,
+    replay_dead_letters,
+)
+
+
+def _seed_tenant(db_session, name: str, webhook_url: str | None = "https://hooks.example.com") -> Tenant:
+    tenant = Tenant(id=uuid.uuid4(), name=name, webhook_url=webhook_url)
+    db_session.add(tenant)
+    db_session.commit()
+    return tenant
+
+
+def _delivery(db_session, tenant: Tenant, **fields) -> WebhookDelivery:
+    delivery = create_webhook_event(db_session, tenant.id, "payment.failed", {"tenant": tenant.name})
+    for key, value in fields.items():
+        setattr(delivery, key, value)
+    db_session.commit()
+    return delivery
+
+
+def _as_utc(ts: datetime) -> datetime:
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def test_claim_takes_due_rows_and_leases_them(db_session):
+    tenant = _seed_tenant(db_session, "Acme")
+    now = datetime.now(timezone.utc)
+    due = _delivery(db_session, tenant, status=WebhookDeliveryStatus.failed, next_attempt_at=now - timedelta(seconds=1))
+    _delivery(db_session, tenant, status=WebhookDeliveryStatus.failed, next_attempt_at=now + timedelta(minutes=5))
+    _delivery(db_session, tenant, status=WebhookDeliveryStatus.dead_lettered, next_attempt_at=now - timedelta(seconds=1))
+
+    claimed = claim_due_deliveries(db_session, limit=10, lease_seconds=60)
+    db_session.commit()
+
+    [(delivery_id, url, lease)] = claimed
+    assert (delivery_id, url) == (str(due.id), "https://hooks.example.com")
+    assert lease > now + timedelta(seconds=30)
+    db_session.expire_all()
+    assert _as_utc(db_session.get(WebhookDelivery, due.id).next_attempt_at) == lease
+    assert claim_due_deliveries(db_session, limit=10, lease_seconds=60) == []
+
+
+def test_claim_dead_letters_tenants_without_webhook_url(db_session):
+    tenant = _seed_tenant(db_session, "NoHook", webhook_url=None)
+    delivery = _delivery(db_session, tenant, next_attempt_at=datetime.now(timezone.utc) - timedelta(seconds=1))
+
+    assert claim_due_deliveries(db_session, limit=10, lease_seconds=60) == []
+    assert delivery.status == WebhookDeliveryStatus.dead_lettered
+
+
+def test_retry_delay_is_jittered_backoff(db_session):
+    tenant = _seed_tenant(db_session, "Acme")
+    delivery = _delivery(db_session, tenant)
+
+    before = datetime.now(timezone.utc)
+    record_delivery_attempt(delivery, "503 Service Unavailable")
+
+    delay = (_as_utc(delivery.next_attempt_at) - before).total_seconds()
+    assert delivery.status == WebhookDeliveryStatus.failed
+    assert BASE_DELAY_SECONDS * (1 - RETRY_JITTER) - 1 <= delay <= BASE_DELAY_SECONDS * (1 + RETRY_JITTER) + 1
+
+
+def test_replay_resets_only_own_dead_letters(db_session):
+    acme = _seed_tenant(db_session, "Acme")
+    other = _seed_tenant(db_session, "Other")
+    mine = _delivery(db_session, acme, status=WebhookDeliveryStatus.dead_lettered, attempts=5, last_error="timeout")
+    theirs = _delivery(db_session, other, status=WebhookDeliveryStatus.dead_lettered, attempts=5)
+
+    assert replay_dead_letters(db_session, str(acme.id)) == 1
+    db_session.commit()
+    db_session.expire_all()
+
+    mine = db_session.get(WebhookDelivery, mine.id)
+    assert (mine.status, mine.attempts, mine.last_error) == (WebhookDeliveryStatus.pending, 0, None)
+    assert db_session.get(WebhookDelivery, theirs.id).status == WebhookDeliveryStatus.dead_lettered
+    assert len(claim_due_deliveries(db_session, limit=10, lease_seconds=60)) == 1